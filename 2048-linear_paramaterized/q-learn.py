@@ -1,265 +1,184 @@
-import random
-from copy import deepcopy
-from datetime import datetime
-from math import inf
+import argparse
+import os
+import sys
+import time
 
 import numpy as np
 
-# Learning rate
-ALPHA = 0.001
-# Size of the gameboard
-SIZE = 4
-# Value vectors used for q-learning
-THETA = np.array([np.random.random((16,)), np.random.random((16,)), np.random.random((16,)), np.random.random((16,))])
-
-
-def is_terminal(state) -> bool:
-	"""
-	Checks if game has ended. Pure function.
-	Returns: bool indicating whether or not game has ended.
-	"""
-	end = True
-	for i in range(SIZE ** 2):
-		end = not ((state[i] == 0) or (
-				(i + 1) % SIZE != 0 and state[i] == state[i + 1]) or (
-				           i + SIZE < SIZE ** 2 and state[i] == state[i + SIZE]))
-		if end is False:
-			break
-	return end
-
-
-def spawn_piece(state):
-	"""
-	Spawns a piece in the state. A 2 with probability 0.9 and 4 with probability 0.1. Pure function.
-	Returns: State with new piece spawned in it.
-	"""
-	arange = range(len(state))
-	n_state = deepcopy(state)
-	avail = [x for x in arange if state[x] == 0]
-	if not avail:
-		return state
-	n_state[random.choice(avail)] = np.random.choice([1, 2], p=[0.9, 0.1])
-	return n_state
-
+# The batched game engine is shared with src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+import stats
+from row_tables import afterstates_batch
+from vec_board import VecBoard
 
-def combiner(arange, state):
-	"""
-	Combines numbers along range, propagates out from start. This is a support method for actions. Non-pure function.
+# Learning rate
+ALPHA = 0.0025
+# Trace decay (lambda)
+LAMBDA = 0.5
+# Afterstates a TD error is propagated back to. Traces are truncated after this many steps, LAMBDA ** TRACE_LENGTH
+# is small enough to ignore.
+TRACE_LENGTH = 6
+# Games played in parallel
+PARALLEL = 256
+# Games to train for
+GAMES = 20000
+# Games between score statistics reports
+REPORT_EVERY = 1000
+# Where the weights are saved
+WEIGHTS_FILE = "linear_weights.npz"
+# Tile exponents above this share the weights of this one
+MAX_EXPONENT = 15
+# Cells of each n-tuple: rows, columns and 2x2 squares
+TUPLES = np.array([[r * 4 + c for c in range(4)] for r in range(4)] +
+                  [[r * 4 + c for r in range(4)] for c in range(4)] +
+                  [[r * 4 + c, r * 4 + c + 1, r * 4 + c + 4, r * 4 + c + 5] for r in range(3) for c in range(3)])
+# Every tuple has a block of 16 ** 4 weights, one per combination of tile exponents
+TUPLE_WEIGHTS = 16 ** np.arange(TUPLES.shape[1], dtype=np.int64)
+TUPLE_SIZE = 16 ** TUPLES.shape[1]
+OFFSETS = np.arange(len(TUPLES), dtype=np.int64) * TUPLE_SIZE
+# Weights of the linear afterstate value function. Its features are one-hot tuple patterns, so a value is the sum of
+# one weight per tuple.
+THETA = np.zeros(len(TUPLES) * TUPLE_SIZE, np.float32)
+
+
+def features(boards):
+	"""
+	Computes the active features of boards. Pure function.
 	Args:
-		arange: Range to combine along
-		state: list
+		boards: (..., 16) array of tile exponents
 
-	Returns: Reward from combining tiles
+	Returns: (..., len(TUPLES)) array of indices into THETA
 
 	"""
-	prev = 0
-	reward = 0
-	moved = False
-	for i in range(1, len(arange)):
-		cur_val = state[arange[i]]
-		if cur_val != 0:
-			prev_val = state[arange[prev]]
-			# Can combine in direction of swipe
-			if prev_val == state[arange[i]]:
-				state[arange[prev]] += 1
-				reward += 2 ** prev_val
-				state[arange[i]] = 0
-				prev += 1
-				moved = True
-			# Can't combine (or zero)
-			elif prev_val != cur_val:
-				# Zero
-				if prev_val != 0:
-					prev += 1
-					if prev == i:
-						continue
-				state[arange[prev]] = cur_val
-				state[arange[i]] = 0
-				moved = True
-	# Penalize moves that don't do anything
-	if not moved:
-		reward -= 1
-	return reward
-
-
-def swipe_left(state):
-	"""
-	Moves pieces to the left. Non-pure function.
-	Returns: reward
-	"""
-	reward = 0
-	moved = False
-	for i in range(0, SIZE ** 2, SIZE):
-		arange = range(i, SIZE + i)
-		r = combiner(arange, state)
-		if r > 0:
-			moved = True
-			reward += r
-	if not moved:
-		return -1
-	return reward
+	cells = np.minimum(np.asarray(boards), MAX_EXPONENT).astype(np.int64)[..., TUPLES]
+	return cells @ TUPLE_WEIGHTS + OFFSETS
 
 
-def swipe_right(state):
+def evaluate(boards):
 	"""
-	Moves pieces to the right. Non-pure function.
-	Returns: reward
-	"""
-	reward = 0
-	moved = False
-	for i in range(SIZE - 1, SIZE ** 2, SIZE):
-		arange = range(i, i - SIZE, -1)
-		r = combiner(arange, state)
-		if r > 0:
-			moved = True
-			reward += r
-	if not moved:
-		return -1
-	return reward
-
-
-def swipe_up(state):
-	"""
-	Moves pieces up. Non-pure function.
-	Returns: reward
-	"""
-	reward = 0
-	moved = False
-	for i in range(0, SIZE, 1):
-		arange = range(i, SIZE ** 2, SIZE)
-		r = combiner(arange, state)
-		if r > 0:
-			moved = True
-			reward += r
-	if not moved:
-		return -1
-	return reward
+	Returns the estimated values of afterstates
+	Args:
+		boards: (..., 16) array of tile exponents
 
+	Returns: (...) array of values
 
-def swipe_down(state):
 	"""
-	Moves pieces down. Non-pure function.
-	Returns: reward
-	"""
-	reward = 0
-	moved = False
-	for i in range((SIZE - 1) * SIZE, SIZE ** 2, 1):
-		arange = range(i, -1, -SIZE)
-		r = combiner(arange, state)
-		if r > 0:
-			moved = True
-			reward += r
-	if not moved:
-		return -1
-	return reward
+	return THETA[features(boards)].sum(axis=-1)
 
 
-def evaluate(state, action):
+def choose_moves(boards):
 	"""
-	Returns the estimated value of a state
+	Picks the greedy move of every game: the legal action with the highest reward plus afterstate value
 	Args:
-		state:
-		action:
+		boards: (N, 16) array of tile exponents, none of them terminal
 
-	Returns:
+	Returns: Tuple of the (N,) actions, (N,) rewards, (N, len(TUPLES)) features and (N,) values of the afterstates
 
 	"""
-	garb, reward = compute_afterstate(state, action)
-	if reward < 0:
-		return -1
-	return np.matmul(THETA[action], state)
+	s_primes, rewards, legal = afterstates_batch(boards)
+	feats = features(s_primes)
+	values = THETA[feats].sum(axis=2)
+	actions = np.argmax(np.where(legal, rewards + values, -np.inf), axis=1)
+	idx = np.arange(len(boards))
+	return actions, rewards[idx, actions], feats[idx, actions], values[idx, actions]
 
 
-def compute_afterstate(state, action):
+def learn(history, valid, deltas, alpha=ALPHA, lam=LAMBDA):
 	"""
-	Computes the afterstate (before random piece spawn). Pure function.
+	Applies TD errors through accumulating eligibility traces. The trace of a game is kept implicitly as the
+	features of its last TRACE_LENGTH afterstates, the newest weighted 1, the one before lam, and so on.
 	Args:
-		state: Game state
-		action: Action to execute (integer)
+		history: (TRACE_LENGTH, N, len(TUPLES)) features of the latest afterstates of each game, newest first
+		valid: (TRACE_LENGTH, N) mask of the history entries that belong to the current game
+		deltas: (N,) TD errors
+		alpha: Learning rate
+		lam: Trace decay
 
-	Returns: State after executing action and reward gained by action
-	"""
-	s_prime = deepcopy(state)
-	if action == 0:
-		reward = swipe_left(s_prime)
-	elif action == 1:
-		reward = swipe_right(s_prime)
-	elif action == 2:
-		reward = swipe_up(s_prime)
-	elif action == 3:
-		reward = swipe_down(s_prime)
-	else:
-		raise ValueError("Incorrect move")
-	return s_prime, reward
+	Returns: None
 
-
-def make_move(state, action):
 	"""
-	Makes a move.
-	Args:
-		state: State of the game
-		action: Action [0-3]
+	steps = alpha * lam ** np.arange(len(history))[:, None] * deltas[None, :] * valid
+	steps = np.broadcast_to(steps[:, :, None], history.shape)
+	# Duplicate features (e.g. one pattern in several games) all add up
+	np.add.at(THETA, history.ravel(), steps.ravel().astype(np.float32))
 
-	Returns: Reward, state after action, state after action and generating tile
 
+def train(games=GAMES, parallel=PARALLEL, alpha=ALPHA, lam=LAMBDA, seed=None, report_every=REPORT_EVERY):
 	"""
-	s_prime, reward = compute_afterstate(state, action)
-	s_dprime = spawn_piece(s_prime)
-	return reward, s_prime, s_dprime
-
-
-def learn_evaluation(state, action, reward, s_prime, s_dprime):
-	v_next = np.max([np.matmul(THETA[i], s_dprime) for i in range(3)])
-	temp = np.matmul(THETA[action], state)
-	THETA[action] = temp + ALPHA * (reward + v_next - temp)
-	THETA[action] = np.interp(THETA[action], (np.min(THETA[action]), np.max(THETA[action])), (0, 65536))
-
-
-def play_game():
-	learning_enabled = True
-	score = 0
-	# Init
-	state = np.zeros(16)
-	spawn_piece(state)
-	# While not terminal
-	while not is_terminal(state):
-		# argmax
-		max_val = -inf
-		action = -1
-		for i in range(3):
-			ret = evaluate(state, i)
-			if ret > max_val:
-				max_val = ret
-				action = i
-		# Make move
-		assert action != -1
-		reward, s_prime, s_dprime = make_move(state, action)
-		if learning_enabled:
-			learn_evaluation(state, action, reward, s_prime, s_dprime)
-		score += reward
-		state = s_dprime
-	return score
+	Learns the afterstate value function with TD(lambda), playing a batch of games in parallel. After each move of a
+	game, the TD error of its previous afterstate is r + V(s') - V(s'_prev), and 0 - V(s') when the game ends.
+	Args:
+		games: Number of games to play
+		parallel: Games played at once
+		alpha: Learning rate
+		lam: Trace decay
+		seed: Seed for the spawns
+		report_every: Games between score reports (0 to disable)
+
+	Returns: ScoreStats of the finished games
+
+	"""
+	board = VecBoard(parallel, seed)
+	history = np.zeros((TRACE_LENGTH, parallel, len(TUPLES)), np.int64)
+	valid = np.zeros((TRACE_LENGTH, parallel), bool)
+	scores = stats.ScoreStats()
+	start = time.perf_counter()
+	moves = 0
+	while scores.count < games:
+		actions, rewards, feats, values = choose_moves(board.get_boards())
+		# Previous afterstates are valued with the current weights; fresh games have no history and get no update
+		deltas = np.where(valid[0], rewards + values - THETA[history[0]].sum(axis=1), 0)
+		learn(history, valid, deltas, alpha, lam)
+		history[1:] = history[:-1]
+		valid[1:] = valid[:-1]
+		history[0] = feats
+		valid[0] = True
+		_, _, dones = board.step(actions)
+		moves += parallel
+		done_idx = np.flatnonzero(dones)
+		if len(done_idx):
+			# Nothing follows the last afterstate of a finished game
+			learn(history[:, done_idx], valid[:, done_idx], -THETA[history[0, done_idx]].sum(axis=1), alpha, lam)
+			valid[:, done_idx] = False
+			for i in done_idx:
+				if scores.count == games:
+					break
+				scores.add(int(board.final_scores[i]), 2 ** int(board.final_max_tiles[i]))
+				if report_every and scores.count % report_every == 0:
+					elapsed = time.perf_counter() - start
+					print(scores, " Games/s: ", round(scores.count / elapsed, 1), " Moves/s: ",
+					      round(moves / elapsed))
+	return scores
+
+
+def load_weights(path=WEIGHTS_FILE):
+	global THETA
+	THETA = np.load(path)["theta"].astype(np.float32)
+
+
+def save_weights(path=WEIGHTS_FILE):
+	np.savez(path, theta=THETA)
 
 
 def main():
-	score = None
+	parser = argparse.ArgumentParser(description="Linear TD(lambda) learning of the 2048 afterstate value function")
+	parser.add_argument("--games", type=int, default=GAMES)
+	parser.add_argument("--parallel", type=int, default=PARALLEL, help="games played at once")
+	parser.add_argument("--alpha", type=float, default=ALPHA)
+	parser.add_argument("--lam", type=float, default=LAMBDA)
+	parser.add_argument("--seed", type=int)
+	parser.add_argument("--weights", default=WEIGHTS_FILE)
+	parser.add_argument("--resume", action="store_true", help="continue from the saved weights")
+	args = parser.parse_args()
+	if args.resume and os.path.exists(args.weights):
+		load_weights(args.weights)
 	try:
-		weight_file = open("weight_file.txt", 'a+')
-		dt = datetime.now()
-		weight_file.write("Cur time: " + str(dt.microsecond) + "\n")
-	except IOError as e:
-		print("Failed to open file for weights")
-		return
-	for x in range(1000):
-		try:
-			score = play_game()
-			print("Game: ", x, " Score: ", score)
-		except BaseException as e:
-			print(e)
-			break
-	if not weight_file.closed:
-		weight_file.write(str(THETA) + '\n')
-		weight_file.close()
+		scores = train(args.games, args.parallel, args.alpha, args.lam, args.seed)
+		print(scores)
+		print("Reached: ", scores.reached())
+	except KeyboardInterrupt:
+		pass
+	save_weights(args.weights)
 
 
 if __name__ == "__main__":
@@ -1,30 +1,56 @@
-from tensorforce import Agent
+import os
+import sys
+
+from tensorforce import Agent, Environment
 from tensorforce.execution import Runner
 
-from board import Board
-from random_agent import RandomAgent
+# The game engine is shared with src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+import env
+
+
+class BoardEnvironment(Environment):
+	"""
+	Tensorforce adapter for src/env.BoardEnv. Moves that don't change the board are masked out.
+	"""
+	def __init__(self, size=4):
+		super().__init__()
+		self._env = env.BoardEnv(size)
+
+	def states(self):
+		return dict(type='int', shape=self._env.observation_shape, num_values=16)
+
+	def actions(self):
+		return dict(type='int', num_values=self._env.num_actions)
+
+	def reset(self):
+		obs, info = self._env.reset()
+		return dict(state=obs, action_mask=info["action_mask"])
+
+	def execute(self, actions):
+		obs, reward, terminated, truncated, info = self._env.step(int(actions))
+		return dict(state=obs, action_mask=info["action_mask"]), terminated, reward
 
 
 def main():
 	# Setup
 	interactive = 0
 	size = 4
-	brd = Board(size, graphics=0)
-	rand_ag = RandomAgent()
 
 	if interactive == 1:
-		brd.start_interactive()
+		from controller import Controller
+		Controller().run_interactive()
+		return
+
+	environment = Environment.create(environment=BoardEnvironment, size=size, max_episode_timesteps=500)
 
-	agent = Agent.create(agent='tensorforce', environment=Board, update=64, objective='policy_gradient',
+	agent = Agent.create(agent='tensorforce', environment=environment, update=64, objective='policy_gradient',
 	                     reward_estimation=dict(horizon=20))
 
-	runner = Runner(agent=agent, environment=Board, max_episode_timesteps=500)
+	runner = Runner(agent=agent, environment=environment)
 
 	runner.run(num_episodes=200)
 
 
-# brd.update_graphics()
-
-
 if __name__ == "__main__":
 	main()
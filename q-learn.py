@@ -1,43 +1,109 @@
+import argparse
+import os
 import random
-from copy import deepcopy, copy
-from math import inf
-import tensorflow as tf
-from tensorflow import keras
+import sys
+from copy import deepcopy
 
 import numpy as np
 
+# The game engine is shared with src/. TensorFlow is only imported once a keras backend is loaded (see setup)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+import checkpoint
+import game_record
+import hot_reload
+import numpy_net
+import replay
+import row_tables
+import stats
+import throughput
+import trajectory_dataset
+
 # Learning rate
 ALPHA = 0.001
 # Size of the gameboard
 SIZE = 4
-# Value function approximaters
-try:
-	# Load models from disk if possible
-	THETA = [keras.models.load_model("tf_model0.h5"), keras.models.load_model("tf_model1.h5"),
-	         keras.models.load_model("tf_model2.h5"), keras.models.load_model("tf_model3.h5")]
-except BaseException as e:
-	print("\n\n!======== UNABLE TO LOAD MODELS - CREATING MODELS... ==========!\n\n")
-	model1 = keras.Sequential([
-		keras.layers.Dense(4, activation='relu', input_shape=(16,)),
-		keras.layers.Dense(1)
-	])
-	model2 = keras.Sequential([
-		keras.layers.Dense(4, activation='relu', input_shape=(16,)),
-		keras.layers.Dense(1)
-	])
-	model3 = keras.Sequential([
-		keras.layers.Dense(4, activation='relu', input_shape=(16,)),
-		keras.layers.Dense(1)
-	])
-	model4 = keras.Sequential([
-		keras.layers.Dense(4, activation='relu', input_shape=(16,)),
-		keras.layers.Dense(1)
-	])
-
-	THETA = np.array([model1, model2, model3, model4])
-
-	for model in THETA:
-		model.compile(optimizer='SGD', loss=tf.keras.losses.Hinge(), metrics=['accuracy'])
+# Value function approximaters to use: "keras" (one network per action), "multihead" (all four actions in one
+# network, tf_model.h5) or "numpy" (NumPy inference of the same networks, no TensorFlow but no training either)
+BACKENDS = ("keras", "multihead", "numpy")
+BACKEND = "keras"
+# Train on minibatches sampled from a replay buffer instead of fitting after every move
+REPLAY = False
+# Maximum number of transitions kept for replay
+REPLAY_CAPACITY = 1000000
+# Sample transitions by TD error instead of uniformly (needs REPLAY)
+PRIORITIZED = False
+# Transitions per minibatch
+BATCH_SIZE = 64
+# Moves between minibatch fits
+FIT_EVERY = 16
+# Replay buffer, created on first use
+REPLAY_BUFFER = None
+# Moves stored in the replay buffer so far
+REPLAY_STEPS = 0
+# Directory for periodic training checkpoints
+CHECKPOINT_DIR = "checkpoints"
+# Games between checkpoints
+CHECKPOINT_GAMES = 100
+# Seconds between checkpoints
+CHECKPOINT_SECONDS = 600
+# Games to train for (0 trains until interrupted)
+GAMES = 10000
+# Games between score statistics reports
+REPORT_EVERY = 100
+# Seconds between throughput records
+STATS_INTERVAL = 60
+# Time spent in each phase of play_game (see src/throughput.py)
+TIMER = throughput.PhaseTimer(STATS_INTERVAL)
+# Writer the played games are recorded with (see src/game_record.py), None to not record
+RECORDER = None
+# Value function approximaters, loaded on first use by get_theta()
+THETA = None
+# Follows a training run's checkpoints (see src/hot_reload.py), None to keep THETA fixed
+WATCHER = None
+
+
+def setup(backend=None):
+	"""
+	Loads the value function approximaters of a backend into THETA
+	Args:
+		backend: One of BACKENDS (default None keeps BACKEND)
+
+	Returns: None
+
+	"""
+	global BACKEND, THETA
+	if backend is not None:
+		if backend not in BACKENDS:
+			raise ValueError("Unknown backend " + str(backend))
+		BACKEND = backend
+	if BACKEND == "numpy":
+		THETA = numpy_net.load_value_net()
+		return
+	import value_net
+	if BACKEND == "multihead":
+		THETA = value_net.load_multihead_model()
+	else:
+		THETA = value_net.load_models()
+
+
+def get_theta():
+	"""
+	Returns: The value function approximaters, loading them the first time they're needed
+	"""
+	if THETA is None:
+		setup()
+	return THETA
+
+
+def refresh_theta():
+	"""
+	Swaps in the newest weights loaded by WATCHER. Only called between moves, so a move is always evaluated with one
+	set of weights.
+	Returns: None
+	"""
+	global THETA
+	if WATCHER is not None and WATCHER.current() is not None:
+		THETA = WATCHER.current()
 
 
 def is_terminal(state) -> bool:
@@ -45,14 +111,8 @@ def is_terminal(state) -> bool:
 	Checks if game has ended. Pure function.
 	Returns: bool indicating whether or not game has ended.
 	"""
-	end = True
-	for i in range(SIZE ** 2):
-		end = not ((state[i] == 0) or (
-				(i + 1) % SIZE != 0 and state[i] == state[i + 1]) or (
-				           i + SIZE < SIZE ** 2 and state[i] == state[i + SIZE]))
-		if end is False:
-			break
-	return end
+	# Same rule as the table swipes, which don't merge past row_tables.MAX_EXPONENT
+	return not row_tables.legal_batch(np.asarray(state)[None]).any()
 
 
 def spawn_piece(state):
@@ -62,6 +122,7 @@ def spawn_piece(state):
 	"""
 	arange = range(len(state))
 	n_state = deepcopy(state)
+	TIMER.mark("deepcopy")
 	avail = [x for x in arange if state[x] == 0]
 	if not avail:
 		return state
@@ -69,40 +130,28 @@ def spawn_piece(state):
 	return n_state
 
 
-def combiner(arange, state):
+def table_swipe(state, action):
 	"""
-	Combines numbers along range, propagates out from start. This is a support method for actions. Non-pure function.
+	Moves pieces using the precomputed row tables (see src/row_tables.py). Pure function.
 	Args:
-		arange: Range to combine along
 		state: Game state
+		action: Action [0-3]
 
-	Returns: Tuple of reward and whether or not any tiles moved
+	Returns: Tuple of state after the move, reward and whether or not any tiles moved
 
 	"""
-	prev = 0
-	reward = 0
-	moved = False
-	for i in range(1, len(arange)):
-		cur_val = state[arange[i]]
-		if cur_val != 0:
-			prev_val = state[arange[prev]]
-			# Can combine in direction of swipe
-			if prev_val == state[arange[i]]:
-				state[arange[prev]] += 1
-				reward += 2 ** prev_val
-				state[arange[i]] = 0
-				prev += 1
-				moved = True
-			# Can't combine (or zero)
-			elif prev_val != cur_val:
-				# Zero
-				if prev_val != 0:
-					prev += 1
-					if prev == i:
-						continue
-				state[arange[prev]] = cur_val
-				state[arange[i]] = 0
-				moved = True
+	s_prime, reward, moved = row_tables.swipe(state, action)
+	# Merges are rewarded with the value of the tiles that combined, which is half of the game score
+	return s_prime.astype(state.dtype), reward // 2, moved
+
+
+def swipe(state, action):
+	"""
+	Moves pieces in the direction of action. Non-pure function.
+	Returns: Tuple of reward and whether or not any tiles moved
+	"""
+	s_prime, reward, moved = table_swipe(state, action)
+	state[:] = s_prime
 	return reward, moved
 
 
@@ -111,14 +160,7 @@ def swipe_left(state):
 	Moves pieces to the left. Non-pure function.
 	Returns: Tuple of reward and whether or not any tiles moved
 	"""
-	reward = 0
-	moved = False
-	for i in range(0, SIZE ** 2, SIZE):
-		arange = range(i, SIZE + i)
-		r, m = combiner(arange, state)
-		reward += r
-		moved = m or moved
-	return reward, moved
+	return swipe(state, 0)
 
 
 def swipe_right(state):
@@ -126,14 +168,7 @@ def swipe_right(state):
 	Moves pieces to the right. Non-pure function.
 	Returns: Tuple of reward and whether or not any tiles moved
 	"""
-	reward = 0
-	moved = False
-	for i in range(SIZE - 1, SIZE ** 2, SIZE):
-		arange = range(i, i - SIZE, -1)
-		r, m = combiner(arange, state)
-		reward += r
-		moved = m or moved
-	return reward, moved
+	return swipe(state, 1)
 
 
 def swipe_up(state):
@@ -141,14 +176,7 @@ def swipe_up(state):
 	Moves pieces up. Non-pure function.
 	Returns: Tuple of reward and whether or not any tiles moved
 	"""
-	reward = 0
-	moved = False
-	for i in range(0, SIZE, 1):
-		arange = range(i, SIZE ** 2, SIZE)
-		r, m = combiner(arange, state)
-		reward += r
-		moved = m or moved
-	return reward, moved
+	return swipe(state, 2)
 
 
 def swipe_down(state):
@@ -156,14 +184,7 @@ def swipe_down(state):
 	Moves pieces down. Non-pure function.
 	Returns: Tuple of reward and whether or not any tiles moved
 	"""
-	reward = 0
-	moved = False
-	for i in range((SIZE - 1) * SIZE, SIZE ** 2, 1):
-		arange = range(i, -1, -SIZE)
-		r, m = combiner(arange, state)
-		reward += r
-		moved = m or moved
-	return reward, moved
+	return swipe(state, 3)
 
 
 def evaluate(state, action):
@@ -176,8 +197,28 @@ def evaluate(state, action):
 	Returns: Estimated value
 
 	"""
+	theta = get_theta()
+	if BACKEND == "numpy":
+		return theta.predict([state], action)[0]
+	if BACKEND == "multihead":
+		return predict_batch([state])[0][action]
 	# Prediction is nested list
-	return THETA[action].predict(tf.convert_to_tensor([state]))[0][0]
+	return theta[action].predict(np.asarray([state], np.float32), verbose=0)[0][0]
+
+
+def evaluate_moves(state, moves):
+	"""
+	Returns the estimated values of several actions from the same state
+	Args:
+		state: Game state
+		moves: Actions to evaluate
+
+	Returns: Array of estimated values, one per action in moves
+
+	"""
+	if BACKEND != "keras":
+		return predict_batch([state])[0][moves]
+	return np.array([evaluate(state, i) for i in moves])
 
 
 def compute_afterstate(state, action):
@@ -190,17 +231,9 @@ def compute_afterstate(state, action):
 	Returns: Tuple of state after executing action and reward gained by action
 
 	"""
-	s_prime = deepcopy(state)
-	if action == 0:
-		reward, m = swipe_left(s_prime)
-	elif action == 1:
-		reward, m = swipe_right(s_prime)
-	elif action == 2:
-		reward, m = swipe_up(s_prime)
-	elif action == 3:
-		reward, m = swipe_down(s_prime)
-	else:
+	if action not in (0, 1, 2, 3):
 		raise ValueError("Incorrect move")
+	s_prime, reward, m = table_swipe(state, action)
 	return s_prime, reward
 
 
@@ -232,8 +265,143 @@ def learn_evaluation(state, action, reward, s_prime, s_dprime):
 	Returns: None
 
 	"""
+	theta = get_theta()
+	if BACKEND == "numpy":
+		raise ValueError("The numpy backend can't be trained")
+	if BACKEND == "multihead":
+		import value_net
+		v_next = np.max(value_net.predict_all(theta, [s_dprime])[0])
+		value_net.fit_actions(theta, [s_prime], [action], [reward + v_next])
+		return
 	v_next = np.max([evaluate(s_dprime, i) for i in range(3)])
-	THETA[action].fit(tf.convert_to_tensor([s_prime]), tf.convert_to_tensor([reward + v_next]), verbose=0)
+	theta[action].fit(np.asarray([s_prime], np.float32), np.asarray([reward + v_next], np.float32), verbose=0)
+
+
+def predict_batch(states):
+	"""
+	Returns the estimated values of every action for a batch of states
+	Args:
+		states: Batch of game states
+
+	Returns: (N, 4) array of estimated values
+
+	"""
+	theta = get_theta()
+	if BACKEND == "numpy":
+		return theta.predict_all(states)
+	if BACKEND == "multihead":
+		import value_net
+		return value_net.predict_all(theta, states)
+	states = np.asarray(states, np.float32)
+	return np.hstack([np.asarray(theta[i].predict_on_batch(states)) for i in range(len(theta))])
+
+
+def learn_replay(batch_size=BATCH_SIZE):
+	"""
+	Trains the value approximation function on a minibatch sampled from the replay buffer
+	Args:
+		batch_size: Number of transitions to train on
+
+	Returns: None
+
+	"""
+	if BACKEND == "numpy":
+		raise ValueError("The numpy backend can't be trained")
+	weights = None
+	if PRIORITIZED:
+		states, actions, rewards, s_primes, s_dprimes, idx, weights = REPLAY_BUFFER.sample(batch_size)
+		# Next states and afterstates share one prediction, the afterstate values give the TD errors
+		values = predict_batch(np.concatenate([s_dprimes, s_primes]))
+		targets = rewards + np.max(values[:batch_size], axis=1)
+		REPLAY_BUFFER.update_priorities(idx, targets - values[batch_size:][np.arange(batch_size), actions])
+	else:
+		states, actions, rewards, s_primes, s_dprimes = REPLAY_BUFFER.sample(batch_size)
+		targets = rewards + np.max(predict_batch(s_dprimes), axis=1)
+	fit_targets(s_primes, actions, targets, weights)
+
+
+def fit_targets(s_primes, actions, targets, weights=None):
+	"""
+	Trains the networks of the taken actions towards their targets
+	Args:
+		s_primes: Batch of afterstates
+		actions: Action taken for each afterstate
+		targets: Target value for each afterstate
+		weights: Optional weight of each sample
+
+	Returns: None
+
+	"""
+	if BACKEND == "multihead":
+		import value_net
+		value_net.fit_actions(THETA, s_primes, actions, targets, weights)
+		return
+	for i in range(len(THETA)):
+		mask = actions == i
+		if mask.any():
+			THETA[i].train_on_batch(s_primes[mask].astype(np.float32), targets[mask].reshape(-1, 1),
+			                        sample_weight=None if weights is None else weights[mask])
+
+
+def learn_offline(path, epochs=1, batch_size=BATCH_SIZE, contiguous=True):
+	"""
+	Trains the value approximation functions on a recorded trajectory dataset instead of playing
+	Args:
+		path: Dataset directory (see src/trajectory_dataset.py)
+		epochs: Passes over the dataset
+		batch_size: Transitions per minibatch
+		contiguous: Train on shuffled runs of consecutive transitions (zero-copy) instead of random samples
+
+	Returns: None
+
+	"""
+	if BACKEND == "numpy":
+		raise ValueError("The numpy backend can't be trained")
+	get_theta()
+	dataset = trajectory_dataset.TrajectoryDataset(path)
+	for epoch in range(epochs):
+		for states, actions, rewards, s_primes, s_dprimes in dataset.batches(batch_size, contiguous=contiguous):
+			targets = rewards + np.max(predict_batch(s_dprimes), axis=1)
+			fit_targets(s_primes, actions, targets)
+		print("Epoch: ", epoch, " Transitions: ", len(dataset))
+
+
+def remember(state, action, reward, s_prime, s_dprime):
+	"""
+	Stores a transition for replay and trains on a minibatch every FIT_EVERY moves
+	Args:
+		state: Game state
+		action: Action
+		reward: Reward for taking action from state
+		s_prime: State after action but before random tile generation
+		s_dprime: Final state after action
+
+	Returns: None
+
+	"""
+	global REPLAY_BUFFER, REPLAY_STEPS
+	if REPLAY_BUFFER is None and PRIORITIZED:
+		REPLAY_BUFFER = replay.PrioritizedReplayBuffer(REPLAY_CAPACITY)
+	elif REPLAY_BUFFER is None:
+		REPLAY_BUFFER = replay.ReplayBuffer(REPLAY_CAPACITY)
+	REPLAY_BUFFER.add(state, action, reward, s_prime, s_dprime)
+	REPLAY_STEPS += 1
+	if REPLAY_STEPS % FIT_EVERY == 0 and len(REPLAY_BUFFER) >= BATCH_SIZE:
+		learn_replay()
+
+
+def legal_moves(state):
+	"""
+	Computes the afterstate, reward and legality of all four actions in one pass. Pure function.
+	Args:
+		state: Game state
+
+	Returns: Tuple of the 4 afterstates, 4 rewards and a boolean mask of legal actions
+
+	"""
+	s_primes, rewards, legal = row_tables.afterstates(state)
+	# Merges are rewarded with the value of the tiles that combined, which is half of the game score
+	return s_primes.astype(state.dtype), rewards // 2, legal
 
 
 def get_moves(state):
@@ -245,55 +413,118 @@ def get_moves(state):
 	Returns: List of legal moves
 
 	"""
-	s1 = copy(state)
-	s2 = copy(state)
-	s3 = copy(state)
-	s4 = copy(state)
-	actions = []
-	if swipe_left(s1)[1] * 1 == 1:
-		actions.append(0)
-	if swipe_right(s2)[1] * 1 == 1:
-		actions.append(1)
-	if swipe_up(s3)[1] * 1 == 1:
-		actions.append(2)
-	if swipe_down(s4)[1] * 1 == 1:
-		actions.append(3)
-	return actions
+	return list(np.flatnonzero(legal_moves(state)[2]))
 
 
-def play_game():
+def play_game(learning_enabled=True):
 	"""
 	Plays the game. Can optionally enable training of the value function approximater
-	Returns: Final score
+	Args:
+		learning_enabled: Train the value function approximater (not possible with the numpy backend)
+
+	Returns: Tuple of the final score and the final state
 
 	"""
-	learning_enabled = True
+	TIMER.start()
 	score = 0
 	# Init
 	state = np.zeros(16)
 	state = spawn_piece(state)
+	TIMER.mark("spawn_piece")
+	if RECORDER is not None:
+		# Spawns come from the global random module, so the record stores them instead of a seed
+		actions = []
+		spawns = [(np.flatnonzero(state)[0], np.max(state))]
 	# While not terminal
 	while not is_terminal(state):
+		TIMER.mark("is_terminal")
+		refresh_theta()
 		# argmax
-		max_val = -inf
-		action = -1
-		moves = get_moves(state)
-		assert moves != []
-		for i in moves:
-			ret = evaluate(state, i)
-			if ret > max_val:
-				max_val = ret
-				action = i
-		# Make move
-		assert action != -1
-		reward, s_prime, s_dprime = make_move(state, action)
+		s_primes, rewards, legal = legal_moves(state)
+		moves = np.flatnonzero(legal)
+		assert len(moves) != 0
+		TIMER.mark("get_moves")
+		action = moves[np.argmax(evaluate_moves(state, moves))]
+		TIMER.mark("evaluate")
+		# Make move from the precomputed afterstate
+		reward, s_prime = rewards[action], s_primes[action]
+		s_dprime = spawn_piece(s_prime)
+		TIMER.mark("spawn_piece")
+		if RECORDER is not None:
+			cell = np.flatnonzero(s_dprime != s_prime)[0]
+			actions.append(action)
+			spawns.append((cell, s_dprime[cell]))
 		# Train value approximater
-		if learning_enabled:
+		if learning_enabled and REPLAY:
+			remember(state, action, reward, s_prime, s_dprime)
+		elif learning_enabled:
 			learn_evaluation(state, action, reward, s_prime, s_dprime)
+		TIMER.mark("fit")
 		score += reward
 		# Advance state
 		state = s_dprime
-	return score
+		TIMER.end_move()
+	TIMER.mark("is_terminal")
+	TIMER.end_game()
+	if RECORDER is not None:
+		# Rewards are half of the game score
+		RECORDER.write(game_record.GameRecord(SIZE, 0, actions, 2 * score, spawns))
+	return score, state
+
+
+def save_models():
+	"""
+	Saves the value function approximaters to disk
+	Returns: None
+	"""
+	if BACKEND == "numpy":
+		THETA.save(numpy_net.WEIGHTS_FILE)
+	elif BACKEND == "multihead":
+		THETA.save(numpy_net.MULTIHEAD_FILE)
+	else:
+		for i in range(len(THETA)):
+			THETA[i].save(numpy_net.MODEL_FILES[i])
+
+
+def get_weights():
+	"""
+	Copies the weights of the value function approximaters
+	Returns: Keras weight list of the multi-head model, or one weight list per action model
+	"""
+	if BACKEND == "numpy":
+		return THETA.to_flat()
+	if BACKEND == "multihead":
+		return THETA.get_weights()
+	return [THETA[i].get_weights() for i in range(len(THETA))]
+
+
+def set_weights(weights):
+	"""
+	Restores weights copied with get_weights
+	Returns: None
+	"""
+	global THETA
+	if BACKEND == "numpy":
+		THETA = numpy_net.NumpyValueNet.from_flat(weights)
+		return
+	if BACKEND == "multihead":
+		THETA.set_weights(weights)
+		return
+	for i in range(len(THETA)):
+		THETA[i].set_weights(weights[i])
+
+
+def checkpoint_state(scores):
+	"""
+	Snapshot of everything needed to resume training. Taken on the training thread, so the checkpoint writer only
+	sees copies.
+	Args:
+		scores: Score statistics of all games so far
+
+	Returns: Dictionary of checkpoint contents (the number of games is added by the Checkpointer)
+
+	"""
+	return dict(checkpoint.rng_state(), weights=get_weights(), scores=deepcopy(scores))
 
 
 def main():
@@ -303,25 +534,85 @@ def main():
 	Returns: None
 
 	"""
-	learning = True
-	scores = np.zeros(10000)
-	for x in range(10000):
-		try:
-			ret_score = play_game()
-			print("Game: ", x, " Score: ", ret_score)
-			scores[x] = ret_score
-		except BaseException as er:
-			print(er)
-			if learning:
-				for i in range(len(THETA)):
-					THETA[i].save("tf_model" + str(i) + ".h5")
-			return
-	print("Max: ", np.max(scores), " Min: ", np.min(scores), " Avg: ", np.average(scores))
-	print("STDEV: ", np.std(scores), " Median: ", np.median(scores))
+	parser = argparse.ArgumentParser(description="Q-learning of the 2048 value function approximaters")
+	parser.add_argument("--backend", choices=BACKENDS, default=BACKEND)
+	parser.add_argument("--games", type=int, default=GAMES, help="games to play (0 plays until interrupted)")
+	parser.add_argument("--resume", action="store_true", help="continue from the latest good checkpoint")
+	parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+	parser.add_argument("--checkpoint-games", type=int, default=CHECKPOINT_GAMES)
+	parser.add_argument("--checkpoint-seconds", type=float, default=CHECKPOINT_SECONDS)
+	parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL,
+	                    help="seconds between throughput records (JSON lines on stdout)")
+	parser.add_argument("--record", metavar="FILE", help="append every game to a game record file")
+	parser.add_argument("--offline", metavar="DIR", help="train on a trajectory dataset instead of playing")
+	parser.add_argument("--epochs", type=int, default=1, help="passes over the --offline dataset")
+	parser.add_argument("--watch", metavar="DIR",
+	                    help="play with the newest checkpoint in DIR, reloading new ones (numpy backend only)")
+	args = parser.parse_args()
+	if args.watch and args.backend != "numpy":
+		parser.error("--watch needs the numpy backend")
+	global TIMER, RECORDER, WATCHER
+	TIMER = throughput.PhaseTimer(args.stats_interval)
+	if args.record:
+		RECORDER = game_record.RecordWriter(args.record)
+	setup(args.backend)
+	# The numpy backend only evaluates
+	learning = BACKEND != "numpy"
+	if args.watch:
+		WATCHER = hot_reload.WeightWatcher(args.watch,
+		                                   on_swap=lambda state: print("Loaded weights of game ", state["games"]))
+	if args.offline:
+		learn_offline(args.offline, args.epochs)
+		save_models()
+		return
+	scores = stats.ScoreStats()
+	start = 0
+	if args.resume:
+		state = checkpoint.load_latest(args.checkpoint_dir)
+		if state is None:
+			print("No checkpoint found in ", args.checkpoint_dir, ", starting from game 0")
+		else:
+			set_weights(state["weights"])
+			checkpoint.restore_rng_state(state)
+			start = state["games"]
+			scores = state["scores"]
+			print("Resuming from game ", start)
+	checkpointer = checkpoint.Checkpointer(args.checkpoint_dir, args.checkpoint_games, args.checkpoint_seconds,
+	                                     games=start)
+	x = start
+	interrupted = False
+	try:
+		while args.games <= 0 or x < args.games:
+			try:
+				ret_score, final_state = play_game(learning)
+				print("Game: ", x, " Score: ", ret_score)
+				scores.add(ret_score, 2 ** int(np.max(final_state)))
+				if (x + 1) % REPORT_EVERY == 0:
+					print(scores)
+				TIMER.emit()
+				if learning and checkpointer.due(x + 1):
+					checkpointer.save_async(x + 1, checkpoint_state(scores))
+			except BaseException as er:
+				print(er)
+				if learning:
+					save_models()
+					# The interrupted game is dropped, training resumes after the last finished one
+					checkpointer.save(x, checkpoint_state(scores))
+				interrupted = True
+				break
+			x += 1
+	finally:
+		checkpointer.close()
+		if RECORDER is not None:
+			RECORDER.close()
+		TIMER.emit(force=True)
+	print(scores)
+	if interrupted:
+		return
+	print("Reached: ", scores.reached())
 	if learning:
 		# print("Saving model at game "+str(x))
-		for i in range(len(THETA)):
-			THETA[i].save("tf_model" + str(i) + ".h5")
+		save_models()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,245 @@
+"""
+file: actor_learner.py
+copyright: Owen Siljander 2021
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from numpy_net import FLAT_SIZE, NumpyValueNet
+from replay import ReplayBuffer
+from vec_board import VecBoard
+
+# Seconds the learner waits for transitions before checking that the actors are still alive
+POLL_INTERVAL = 1.0
+
+
+class SharedWeights:
+    """
+    Value network weights in a shared memory block that one learner writes and many actors read, so weight updates
+    never go through pickling. The block starts with a version counter used as a sequence lock: the writer makes it
+    odd while writing and even when done, and readers retry if the version was odd or changed during their copy.
+    """
+    def __init__(self, size: int = FLAT_SIZE, name: str = None):
+        """
+        Initializer for the shared weights
+        Args:
+            size: Number of float32 weights
+            name: Name of an existing block to attach to (default None creates a new block)
+        """
+        self._size = size
+        self._owner = name is None
+        self._shm = shared_memory.SharedMemory(name=name, create=self._owner, size=8 + 4 * size)
+        self._version = np.ndarray((1,), np.int64, self._shm.buf, 0)
+        self._data = np.ndarray((size,), np.float32, self._shm.buf, 8)
+
+    def __getstate__(self):
+        # Child processes attach to the same block by name
+        return {"size": self._size, "name": self._shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["size"], state["name"])
+
+    def write(self, flat):
+        """
+        Publishes new weights. Only one process may write.
+        Args:
+            flat: float32 vector of weights
+        """
+        self._version[0] += 1
+        self._data[:] = flat
+        self._version[0] += 1
+
+    def read(self):
+        """
+        Copies the latest complete weights
+        Returns: Tuple of the weight vector and its version
+        """
+        while True:
+            version = int(self._version[0])
+            if version % 2 == 0:
+                flat = self._data.copy()
+                if int(self._version[0]) == version:
+                    return flat, version
+
+    def get_version(self) -> int:
+        return int(self._version[0])
+
+    def close(self):
+        self._version = None
+        self._data = None
+        self._shm.close()
+        # Only the creating process removes the block
+        if self._owner:
+            self._shm.unlink()
+
+
+def actor(weights: SharedWeights, transitions, stop, games: int, epsilon: float, seed):
+    """
+    Actor process. Plays a batch of games greedily with the latest published weights (NumPy inference, no
+    TensorFlow) and streams every step to the learner.
+    Args:
+        weights: Shared value network weights
+        transitions: Queue of (states, actions, rewards, afterstates, next states, final scores) tuples to the learner
+        stop: Event set by the learner when training is over
+        games: Number of games played in parallel
+        epsilon: Probability of a random legal move instead of the greedy one
+        seed: Seed for spawns and exploration
+    """
+    rng = np.random.default_rng(seed)
+    board = VecBoard(games, seed=rng.integers(1 << 32))
+    rows = np.arange(games)
+    version = -1
+    net = None
+    while not stop.is_set():
+        if weights.get_version() != version:
+            flat, version = weights.read()
+            net = NumpyValueNet.from_flat(flat)
+        states = board.get_boards().copy()
+        s_primes, rewards, legal = board.legal_moves()
+        values = net.predict_all(states)
+        values[~legal] = -np.inf
+        actions = np.argmax(values, axis=1)
+        explore = rng.random(games) < epsilon
+        if explore.any():
+            # Random keys with illegal moves pushed below every legal one, so argmax picks a uniform legal move
+            keys = np.where(legal[explore], rng.random((int(explore.sum()), 4)), -1)
+            actions[explore] = np.argmax(keys, axis=1)
+        _, _, dones = board.step(actions)
+        s_dprimes = board.get_boards().copy()
+        s_dprimes[dones] = board.final_boards[dones]
+        # Same reward scale as q-learn.py (half of the game score)
+        item = (states, actions.astype(np.uint8), rewards[rows, actions] // 2, s_primes[rows, actions], s_dprimes,
+                board.final_scores[dones].copy())
+        while not stop.is_set():
+            try:
+                transitions.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+    # Don't block on exit waiting for the learner to drain the queue
+    transitions.cancel_join_thread()
+
+
+def receive(transitions, procs=None, timeout: float = POLL_INTERVAL):
+    """
+    Takes the next item from the actors
+    Args:
+        transitions: Queue filled by the actors
+        procs: Actor processes (default None waits without checking them)
+        timeout: Seconds between checks of the actors
+
+    Returns: The next (states, actions, rewards, afterstates, next states, final scores) tuple
+
+    """
+    while True:
+        try:
+            return transitions.get(timeout=timeout)
+        except queue.Empty:
+            # Items of actors that died are still delivered, only an empty queue means nothing more will come
+            if procs is not None and not any(p.is_alive() for p in procs):
+                raise RuntimeError("All actors exited, exit codes " + str([p.exitcode for p in procs]))
+
+
+def learn(model, weights: SharedWeights, transitions, total_games: int, buffer: ReplayBuffer, batch_size: int,
+          push_every: int, report_every: int, procs=None):
+    """
+    Learner loop. Stores the streamed transitions, fits the multi-head model on minibatches and periodically
+    publishes its weights to the actors.
+    Args:
+        model: Multi-head keras model (see value_net.py)
+        weights: Shared weights read by the actors
+        transitions: Queue filled by the actors
+        total_games: Number of finished games to train on
+        buffer: Replay buffer
+        batch_size: Transitions per minibatch
+        push_every: Fits between weight publications
+        report_every: Finished games between progress reports
+        procs: Actor processes, training stops with a RuntimeError once all of them have exited (default None to not
+            check)
+
+    Returns: Array of the final scores of all games
+
+    """
+    import value_net
+    scores = []
+    finished = 0
+    fits = 0
+    while finished < total_games:
+        states, actions, rewards, s_primes, s_dprimes, final_scores = receive(transitions, procs)
+        buffer.add_batch(states, actions, rewards, s_primes, s_dprimes)
+        scores.append(final_scores)
+        if finished // report_every != (finished + len(final_scores)) // report_every:
+            recent = np.concatenate(scores)[-report_every:]
+            print("Games: ", finished + len(final_scores), " Avg: ", np.average(recent), " Max: ", np.max(recent))
+        finished += len(final_scores)
+        if len(buffer) < batch_size:
+            continue
+        # One minibatch per received step keeps the replay ratio fixed regardless of the number of actors
+        states, actions, rewards, s_primes, s_dprimes = buffer.sample(batch_size)
+        targets = rewards + np.max(value_net.predict_all(model, s_dprimes), axis=1)
+        value_net.fit_actions(model, s_primes, actions, targets)
+        fits += 1
+        if fits % push_every == 0:
+            weights.write(NumpyValueNet.from_keras(model).to_flat())
+    return np.concatenate(scores)[:total_games]
+
+
+def run(actors: int, games_per_actor: int, total_games: int, batch_size: int = 256, push_every: int = 10,
+        report_every: int = 1000, epsilon: float = 0.0, capacity: int = 1000000):
+    """
+    Trains the multi-head value network with actor processes generating games in parallel. Actors only use NumPy
+    and are started with the spawn method, so none of them load TensorFlow.
+    Args:
+        actors: Number of actor processes
+        games_per_actor: Games each actor plays in parallel
+        total_games: Number of finished games to train on
+        batch_size: Transitions per minibatch
+        push_every: Fits between weight publications
+        report_every: Finished games between progress reports
+        epsilon: Exploration rate of the actors
+        capacity: Replay buffer capacity
+
+    Returns: Array of the final scores of all games
+
+    """
+    import value_net
+    model = value_net.load_multihead_model()
+    ctx = mp.get_context("spawn")
+    weights = SharedWeights()
+    weights.write(NumpyValueNet.from_keras(model).to_flat())
+    transitions = ctx.Queue(maxsize=4 * actors)
+    stop = ctx.Event()
+    seeds = np.random.SeedSequence().spawn(actors)
+    procs = [ctx.Process(target=actor, args=(weights, transitions, stop, games_per_actor, epsilon, seeds[i]),
+                         daemon=True) for i in range(actors)]
+    for p in procs:
+        p.start()
+    try:
+        scores = learn(model, weights, transitions, total_games, ReplayBuffer(capacity), batch_size, push_every,
+                       report_every, procs)
+    finally:
+        stop.set()
+        for p in procs:
+            p.join(timeout=5)
+        weights.close()
+        model.save(value_net.MULTIHEAD_FILE)
+    print("Max: ", np.max(scores), " Min: ", np.min(scores), " Avg: ", np.average(scores))
+    return scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process actor/learner training of the value network")
+    parser.add_argument("--actors", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--games-per-actor", type=int, default=64)
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--push-every", type=int, default=10)
+    parser.add_argument("--epsilon", type=float, default=0.0)
+    args = parser.parse_args()
+    run(args.actors, args.games_per_actor, args.games, args.batch_size, args.push_every, epsilon=args.epsilon)
@@ -8,6 +8,14 @@ class Agent(ABC):
         self._moves = 0
         self._board = board
 
+    @abstractmethod
+    def _make_choice(self):
+        """
+        Makes one move
+        Returns: None
+        """
+        pass
+
     @abstractmethod
     def play(self):
         """
@@ -16,6 +24,18 @@ class Agent(ABC):
         """
         pass
 
+    def play_graphics(self, playback):
+        """
+        Plays the game at the pace of a playback (see playback.py), so a viewer can watch
+        Args:
+            playback: Playback of this agent's board
+
+        Returns: None
+
+        """
+        while not self._board.is_terminal() and playback.wait_turn():
+            self._make_choice()
+
     def get_score(self):
         return self._board.get_score()
 
@@ -0,0 +1,314 @@
+"""
+file: benchmark.py
+copyright: Owen Siljander 2021
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import timeit
+
+import numpy as np
+
+import bitboard
+import row_tables
+from board import Board
+from dr_agent import DRAgent
+from random_agent import RandomAgent
+from vec_board import VecBoard
+
+# Bump when benchmarks change meaning so old baselines aren't compared against new numbers
+BASELINE_VERSION = 1
+BASELINE_FILE = "benchmark_baseline.json"
+# Fractional slowdown reported as a regression by compare mode
+THRESHOLD = 0.2
+# Root training script (loaded by path, its name isn't a valid module name)
+Q_LEARN_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "q-learn.py")
+# Mid-game position (tile exponents) with merges and gaps in every direction
+STATE = np.array([1, 1, 2, 0,
+                  3, 0, 3, 1,
+                  0, 2, 2, 4,
+                  5, 0, 1, 1])
+
+# Benchmark name to setup function returning the callable to time
+BENCHMARKS = {}
+# Loaded q-learn modules by backend, so the script runs and its models load once per run
+_Q_LEARN = {}
+
+
+def benchmark(name: str):
+    """
+    Registers a benchmark. The decorated function does any setup and returns a callable with no arguments that runs
+    one iteration.
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def load_q_learn(backend: str = "numpy"):
+    """
+    Imports the root q-learn.py with the given value function backend. Each backend gets its own module, loaded
+    the first time it is asked for.
+    Returns: The q-learn module
+    """
+    if backend not in _Q_LEARN:
+        spec = importlib.util.spec_from_file_location("q_learn", Q_LEARN_FILE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.setup(backend)
+        _Q_LEARN[backend] = module
+    return _Q_LEARN[backend]
+
+
+def board_at(state, size: int = 4) -> Board:
+    board = Board(size)
+    board._board = np.array(state)
+    return board
+
+
+@benchmark("board._combiner")
+def bench_combiner():
+    # Combining all five rows of a 5x5 board, where Board still uses _combiner
+    start = np.resize(STATE, 25)
+    board = board_at(start, 5)
+    rows = [range(i, i + 5) for i in range(0, 25, 5)]
+
+    def run():
+        board._board[:] = start
+        for block in rows:
+            board._combiner(block)
+    return run
+
+
+@benchmark("row_tables.slide_row")
+def bench_slide_row():
+    rows = [int(r) for r in (STATE.reshape(4, 4) @ row_tables.ROW_WEIGHTS)]
+    return lambda: [row_tables.slide_row(r) for r in rows]
+
+
+@benchmark("row_tables.swipe")
+def bench_table_swipe():
+    row_tables.get_tables()
+    return lambda: row_tables.swipe(STATE, 0)
+
+
+@benchmark("bitboard.move_left")
+def bench_bitboard_move():
+    bits = bitboard.pack(STATE)
+    bitboard.move_left(bits)
+    return lambda: bitboard.move_left(bits)
+
+
+def bench_board_swipe(action: int):
+    board = board_at(STATE)
+    swipes = [board.swipe_left, board.swipe_right, board.swipe_up, board.swipe_down]
+
+    def run():
+        board._board = STATE.copy()
+        swipes[action]()
+    return run
+
+
+for _action, _name in enumerate(["left", "right", "up", "down"]):
+    benchmark("board.swipe_" + _name)(lambda action=_action: bench_board_swipe(action))
+
+
+@benchmark("board.is_terminal")
+def bench_is_terminal():
+    # Full board without merges, so every cell is checked
+    return board_at(np.arange(1, 17)).is_terminal
+
+
+@benchmark("q_learn.spawn_piece")
+def bench_spawn_piece():
+    q_learn = load_q_learn()
+    return lambda: q_learn.spawn_piece(STATE)
+
+
+@benchmark("q_learn.get_moves")
+def bench_get_moves():
+    q_learn = load_q_learn()
+    return lambda: q_learn.get_moves(STATE)
+
+
+@benchmark("q_learn.compute_afterstate")
+def bench_compute_afterstate():
+    q_learn = load_q_learn()
+    return lambda: q_learn.compute_afterstate(STATE, 0)
+
+
+@benchmark("q_learn.is_terminal")
+def bench_q_learn_is_terminal():
+    q_learn = load_q_learn()
+    state = np.arange(1, 17)
+    return lambda: q_learn.is_terminal(state)
+
+
+@benchmark("game.random_agent")
+def bench_random_agent():
+    return lambda: RandomAgent(Board()).play()
+
+
+@benchmark("game.dr_agent")
+def bench_dr_agent():
+    return lambda: DRAgent(Board()).play()
+
+
+@benchmark("game.vec_board_1000")
+def bench_vec_board():
+    # One step of 1000 parallel games with random moves
+    board = VecBoard(1000, seed=0)
+    rng = np.random.default_rng(0)
+    return lambda: board.step(rng.integers(0, 4, len(board)))
+
+
+def play_step(q_learn, learning: bool):
+    """
+    One move of q-learn.play_game: legal moves, action selection, spawn and (optionally) the fit
+    """
+    s_primes, rewards, legal = q_learn.legal_moves(STATE)
+    moves = np.flatnonzero(legal)
+    action = moves[np.argmax(q_learn.evaluate_moves(STATE, moves))]
+    s_dprime = q_learn.spawn_piece(s_primes[action])
+    if learning:
+        q_learn.learn_evaluation(STATE, action, rewards[action], s_primes[action], s_dprime)
+
+
+@benchmark("q_learn.play_step_numpy")
+def bench_play_step_numpy():
+    q_learn = load_q_learn("numpy")
+    return lambda: play_step(q_learn, False)
+
+
+@benchmark("q_learn.play_step_keras")
+def bench_play_step_keras():
+    q_learn = load_q_learn("keras")
+    return lambda: play_step(q_learn, True)
+
+
+@benchmark("q_learn.play_step_multihead")
+def bench_play_step_multihead():
+    q_learn = load_q_learn("multihead")
+    return lambda: play_step(q_learn, True)
+
+
+def measure(fn, min_time: float = 0.2, repeat: int = 5) -> float:
+    """
+    Times a callable
+    Args:
+        fn: Callable with no arguments
+        min_time: Minimum seconds per timing run, the number of calls is chosen to reach it
+        repeat: Number of timing runs
+
+    Returns: Best seconds per call over the runs (the least disturbed by other processes)
+
+    """
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+    return min([elapsed] + timer.repeat(repeat - 1, number)) / number
+
+
+def run(names=None, min_time: float = 0.2, repeat: int = 5, verbose: bool = True):
+    """
+    Runs benchmarks
+    Args:
+        names: Benchmark names to run (default None for all)
+        min_time: Minimum seconds per timing run
+        repeat: Number of timing runs per benchmark
+        verbose: Print each result as it's measured
+
+    Returns: Dictionary of benchmark name to seconds per call
+
+    """
+    results = {}
+    for name in names if names is not None else BENCHMARKS:
+        results[name] = measure(BENCHMARKS[name](), min_time, repeat)
+        if verbose:
+            print("{:32s} {:12.3f} us".format(name, results[name] * 1e6))
+    return results
+
+
+def save_baseline(results, path: str = BASELINE_FILE):
+    baseline = {
+        "version": BASELINE_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str = BASELINE_FILE):
+    """
+    Returns: Dictionary of benchmark name to seconds per call from a baseline file
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError("Baseline " + path + " is from a different benchmark version")
+    return baseline["results"]
+
+
+def compare(results, baseline, threshold: float = THRESHOLD):
+    """
+    Compares results against a baseline
+    Args:
+        results: Dictionary of benchmark name to seconds per call
+        baseline: Dictionary of benchmark name to seconds per call
+        threshold: Fractional slowdown that counts as a regression (0.2 is 20% slower)
+
+    Returns: List of (name, baseline seconds, new seconds, ratio) of the regressed benchmarks
+
+    """
+    regressions = []
+    for name, seconds in results.items():
+        if name in baseline and seconds > baseline[name] * (1 + threshold):
+            regressions.append((name, baseline[name], seconds, seconds / baseline[name]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the game engine, agents and learners")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default all but the keras ones)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    parser.add_argument("--keras", action="store_true", help="include the benchmarks that need TensorFlow")
+    parser.add_argument("--save", metavar="FILE", help="write the results to a baseline file")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results against a baseline file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    names = args.names or [n for n in BENCHMARKS if args.keras or not n.endswith(("_keras", "_multihead"))]
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error("Unknown benchmarks: " + ", ".join(unknown))
+    results = run(names, args.min_time, args.repeat)
+    if args.save:
+        save_baseline(results, args.save)
+    if args.compare:
+        regressions = compare(results, load_baseline(args.compare), args.threshold)
+        for name, before, after, ratio in regressions:
+            print("REGRESSION {:32s} {:12.3f} us -> {:12.3f} us ({:.2f}x)".format(name, before * 1e6, after * 1e6,
+                                                                                  ratio))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+file: bitboard.py
+copyright: Owen Siljander 2021
+"""
+
+import random
+
+import numpy as np
+
+from board import Board, BoardSnapshot
+from row_tables import get_tables
+
+# Masks used by the nibble tricks below
+ROW_MASK = 0xFFFF
+NIBBLE_MASK = 0xF
+LOW_NIBBLE_BITS = 0x1111111111111111
+
+
+def pack(state) -> int:
+    """
+    Packs a 16 cell board of tile exponents into a 64-bit integer, 4 bits per cell. Cell i (row major) is stored in
+    bits 4i to 4i + 3, so each board row is one 16-bit chunk with its leftmost cell in the lowest nibble.
+    Args:
+        state: Iterable of 16 tile exponents (0 is an empty cell)
+
+    Returns: Packed board
+
+    """
+    bits = 0
+    for i, val in enumerate(state):
+        bits |= (int(val) & NIBBLE_MASK) << (4 * i)
+    return bits
+
+
+def unpack(bits: int):
+    """
+    Unpacks a 64-bit board into a 1D array of tile exponents. Inverse of pack.
+    Args:
+        bits: Packed board
+
+    Returns: 1D NumPy array of the 16 tile exponents
+
+    """
+    return np.array([(bits >> (4 * i)) & NIBBLE_MASK for i in range(16)], int)
+
+
+def transpose(bits: int) -> int:
+    """
+    Transposes a packed board so that columns become rows. Lets vertical moves reuse the row logic.
+    Args:
+        bits: Packed board
+
+    Returns: Transposed packed board
+
+    """
+    a1 = bits & 0xF0F00F0FF0F00F0F
+    a2 = bits & 0x0000F0F00000F0F0
+    a3 = bits & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def empty_mask(bits: int) -> int:
+    """
+    Flags every empty cell of a packed board with the low bit of its nibble.
+    Args:
+        bits: Packed board
+
+    Returns: Integer with bit 4i set when cell i is empty
+
+    """
+    bits |= (bits >> 2) & 0x3333333333333333
+    bits |= bits >> 1
+    return ~bits & LOW_NIBBLE_BITS
+
+
+def move_rows(bits: int, row_table, reward_table):
+    """
+    Applies a row transition table to all four rows of a packed board.
+    Args:
+        bits: Packed board
+        row_table: Result row of every packed row (see row_tables.RowTables)
+        reward_table: Merge score of every packed row
+
+    Returns: Tuple of the resulting packed board and the score gained by merging
+
+    """
+    row0 = bits & ROW_MASK
+    row1 = (bits >> 16) & ROW_MASK
+    row2 = (bits >> 32) & ROW_MASK
+    row3 = (bits >> 48) & ROW_MASK
+    result = row_table[row0] | (row_table[row1] << 16) | (row_table[row2] << 32) | (row_table[row3] << 48)
+    return result, reward_table[row0] + reward_table[row1] + reward_table[row2] + reward_table[row3]
+
+
+def move_left(bits: int):
+    tables = get_tables()
+    return move_rows(bits, tables.left_row_list, tables.left_reward_list)
+
+
+def move_right(bits: int):
+    tables = get_tables()
+    return move_rows(bits, tables.right_row_list, tables.right_reward_list)
+
+
+def move_up(bits: int):
+    tables = get_tables()
+    result, reward = move_rows(transpose(bits), tables.left_row_list, tables.left_reward_list)
+    return transpose(result), reward
+
+
+def move_down(bits: int):
+    tables = get_tables()
+    result, reward = move_rows(transpose(bits), tables.right_row_list, tables.right_reward_list)
+    return transpose(result), reward
+
+
+class BitBoardSnapshot(BoardSnapshot):
+    """
+    Snapshot of a BitBoard. Holds the packed board and unpacks it when read.
+    """
+    def __init__(self, version: int, bits: int, score: int, moves: int):
+        super().__init__(version, None, score, moves, 4)
+        self._bits = bits
+
+    def get_board_data(self):
+        """
+        Returns: Read-only 1D array of board data
+        """
+        data = unpack(self._bits)
+        data.flags.writeable = False
+        return data
+
+    def get_bits(self) -> int:
+        return self._bits
+
+
+class BitBoard(Board):
+    """
+    4x4 board packed into a single 64-bit integer (4 bits per tile exponent). Drop-in replacement for Board with the
+    same public interface, but every swipe is four row table lookups instead of per cell Python indexing.
+    """
+    def __init__(self, size: int = 4, seed=None):
+        """
+        Initializer for the bitboard
+        Args:
+            size: Must be 4, the only size a 64-bit board can hold.
+            seed: Seed for piece spawns (default None for a fresh seed)
+        """
+        if size != 4:
+            raise ValueError("BitBoard only supports 4x4 boards")
+        self._seed = seed if seed is not None else random.SystemRandom().getrandbits(63)
+        self._random = random.Random(self._seed)
+        self._history = []
+        self._bits = 0
+        self._size = size
+        self._game_ended = False
+        self._score = 0
+        self._moves = 0
+        self._version = 0
+        self._published = None
+        self._spawn_piece()
+        self._publish()
+
+    def _publish(self):
+        # The packed board is an immutable int, so publishing doesn't copy anything
+        self._version += 1
+        self._published = (self._version, self._bits, self._score, self._moves)
+
+    def get_snapshot(self) -> BitBoardSnapshot:
+        """
+        Gets the latest published state of the board (see Board.get_snapshot)
+        Returns: BitBoardSnapshot
+        """
+        return BitBoardSnapshot(*self._published)
+
+    def _spawn_piece(self):
+        """
+        Spawns a piece on the board. A 2 with probability 0.9 and 4 with probability 0.1
+        """
+        empty = empty_mask(self._bits)
+        avail = []
+        while empty:
+            low = empty & -empty
+            avail.append(low)
+            empty ^= low
+        # low is the lowest bit of the chosen nibble, so multiplying places the exponent in that cell
+        self._bits |= (1 if self._random.random() < 0.9 else 2) * self._random.choice(avail)
+
+    def _apply(self, move, action: int) -> bool:
+        """
+        Applies a move function to the board, updating the score and spawning a piece if anything moved.
+        Args:
+            move: One of the module level move_* functions
+            action: Action [0-3] of the move
+
+        Returns: Whether or not any tiles changed position
+
+        """
+        result, reward = move(self._bits)
+        if result == self._bits:
+            return False
+        self._bits = result
+        self._score += reward
+        self._end_move(action)
+        return True
+
+    def swipe_left(self) -> bool:
+        return self._apply(move_left, 0)
+
+    def swipe_right(self) -> bool:
+        return self._apply(move_right, 1)
+
+    def swipe_up(self) -> bool:
+        return self._apply(move_up, 2)
+
+    def swipe_down(self) -> bool:
+        return self._apply(move_down, 3)
+
+    def is_terminal(self) -> bool:
+        """
+        Checks if game has ended. With no empty cells, a board can move horizontally (or vertically) exactly when a
+        left (or up) swipe changes it.
+        Returns: bool
+        """
+        if empty_mask(self._bits):
+            return False
+        return move_left(self._bits)[0] == self._bits and move_up(self._bits)[0] == self._bits
+
+    def reset(self):
+        self._bits = 0
+        self._score = 0
+        self._moves = 0
+        self._history = []
+        # Each game gets its own seed so it can be replayed on its own
+        self._seed = self._random.getrandbits(63)
+        self._random = random.Random(self._seed)
+        self._spawn_piece()
+        self._publish()
+
+    def get_board_data(self):
+        """
+        Gets the entire board data
+        Returns: 1D array of board data
+        """
+        return unpack(self._bits)
+
+    def get_datum(self, pos: int):
+        """
+        Gets single datum from the game board
+        Args:
+            pos: Position of datum (note: board data is 1D)
+        Returns: Datum at the position specified
+        """
+        return (self._bits >> (4 * pos)) & NIBBLE_MASK
+
+    def get_bits(self) -> int:
+        """
+        Returns: The packed 64-bit board.
+        """
+        return self._bits
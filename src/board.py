@@ -7,30 +7,109 @@ import random
 
 import numpy as np
 
+from row_tables import TABLE_SIZE, legal_batch, swipe
+
+
+class BoardSnapshot:
+    """
+    State of a board after one move. Snapshots are never modified once published, so any thread can read one while
+    the game goes on without locks or torn reads.
+    """
+    def __init__(self, version: int, data, score: int, moves: int, size: int):
+        """
+        Initializer for the snapshot
+        Args:
+            version: Number of snapshots the board published before and including this one
+            data: Read-only 1D array of board data
+            score: Score
+            moves: Moves since the game started
+            size: Single side size of the board
+        """
+        self._version = version
+        self._data = data
+        self._score = score
+        self._moves = moves
+        self._size = size
+
+    def get_version(self) -> int:
+        return self._version
+
+    def get_board_data(self):
+        """
+        Returns: Read-only 1D array of board data
+        """
+        return self._data
+
+    def get_score(self):
+        return self._score
+
+    def get_move_count(self):
+        return self._moves
+
+    def get_board_size(self):
+        return self._size
+
 
 class Board:
-    def __init__(self, size: int = 4):
+    def __init__(self, size: int = 4, seed=None):
         """
         Initializer for 2048 game board
         Args:
             size: Integer size of the board, must be greater than 0. Size represents the square size
                 (e.g. 8 would be a chessboard). Default size is 4.
+            seed: Seed for piece spawns (default None for a fresh seed). Each board has its own generator, so games
+                are reproducible from the seed and the moves made (see get_history) no matter what else uses the
+                random module.
         """
         if size <= 0:
             raise ValueError("Board size must be positive")
-        random.seed(None)
+        self._seed = seed if seed is not None else random.SystemRandom().getrandbits(63)
+        self._random = random.Random(self._seed)
+        self._history = []
         self._board = np.zeros(size ** 2, int)
         self._size = size
         self._game_ended = False
         self._score = 0
+        self._moves = 0
+        self._version = 0
+        self._published = None
         self._spawn_piece()
+        self._publish()
+
+    def _publish(self):
+        """
+        Publishes a snapshot of the board. The board array itself is frozen and shared with the snapshot, so
+        publishing doesn't copy; every move writes to a new array (see _table_swipe and _thaw).
+        """
+        self._board = np.asarray(self._board)
+        self._board.setflags(write=False)
+        self._version += 1
+        # A plain tuple keeps publishing cheap, the BoardSnapshot is only built when someone reads it
+        self._published = (self._version, self._board, self._score, self._moves)
+
+    def _thaw(self):
+        """
+        Replaces the published (read-only) board array with a writable copy before it is changed in place
+        """
+        self._board = np.array(self._board)
 
     def _spawn_piece(self):
         """
         Spawns a piece on the board. A 2 with probability 0.9 and 4 with probability 0.1
         """
         avail = [x for x in range(len(self._board)) if self._board[x] == 0]
-        self._board[random.choice(avail)] = np.random.choice([1, 2], p=[0.9, 0.1])
+        self._board[self._random.choice(avail)] = 1 if self._random.random() < 0.9 else 2
+
+    def _end_move(self, action: int):
+        """
+        Counts a move that changed the board and spawns the next piece
+        Args:
+            action: Action [0-3] that was made
+        """
+        self._moves += 1
+        self._history.append(action)
+        self._spawn_piece()
+        self._publish()
 
     def _combiner(self, block):
         """
@@ -65,17 +144,36 @@ class Board:
                     moved = True
         return moved
 
+    def _table_swipe(self, action: int) -> bool:
+        """
+        Moves pieces on a 4x4 board with precomputed row tables instead of _combiner
+        Args:
+            action: Action [0-3] (left, right, up, down)
+
+        Returns: Whether or not any tiles changed position (boolean)
+
+        """
+        s_prime, reward, moved = swipe(self._board, action)
+        if moved:
+            self._board = s_prime.astype(int)
+            self._score += reward
+            self._end_move(action)
+        return moved
+
     def swipe_left(self) -> bool:
         """
         Moves pieces to the left
         Returns: 0 on success, 1 otherwise
         """
+        if self._size == TABLE_SIZE:
+            return self._table_swipe(0)
+        self._thaw()
         moved = False
         for i in range(0, self._size ** 2, self._size):
             block = range(i, self._size + i)
             moved = self._combiner(block) or moved
         if moved:
-            self._spawn_piece()
+            self._end_move(0)
         return moved
 
     def swipe_right(self) -> bool:
@@ -83,12 +181,15 @@ class Board:
         Moves pieces to the right
         Returns: 0 on success, 1 otherwise
         """
+        if self._size == TABLE_SIZE:
+            return self._table_swipe(1)
+        self._thaw()
         moved = False
         for i in range(self._size - 1, self._size ** 2, self._size):
             block = range(i, i - self._size, -1)
             moved = self._combiner(block) or moved
         if moved:
-            self._spawn_piece()
+            self._end_move(1)
         return moved
 
     def swipe_up(self) -> bool:
@@ -97,12 +198,15 @@ class Board:
         Returns: 0 on success, 1 otherwise
 
         """
+        if self._size == TABLE_SIZE:
+            return self._table_swipe(2)
+        self._thaw()
         moved = False
         for i in range(0, self._size, 1):
             block = range(i, self._size ** 2, self._size)
             moved = self._combiner(block) or moved
         if moved:
-            self._spawn_piece()
+            self._end_move(2)
         return moved
 
     def swipe_down(self) -> bool:
@@ -111,12 +215,15 @@ class Board:
         Returns: 0 on success, 1 otherwise
 
         """
+        if self._size == TABLE_SIZE:
+            return self._table_swipe(3)
+        self._thaw()
         moved = False
         for i in range((self._size - 1) * self._size, self._size ** 2, 1):
             block = range(i, -1, -self._size)
             moved = self._combiner(block) or moved
         if moved:
-            self._spawn_piece()
+            self._end_move(3)
         return moved
 
     def is_terminal(self) -> bool:
@@ -124,6 +231,9 @@ class Board:
         Checks if game has ended
         Returns: bool
         """
+        if self._size == TABLE_SIZE:
+            # Same rule as the table swipes, which don't merge past MAX_EXPONENT
+            return not legal_batch(np.asarray(self._board)[None]).any()
         end = True
         for i in range(self._size ** 2):
             # Zero tile or tile can combine right or tile can combine below
@@ -136,9 +246,15 @@ class Board:
         return end
 
     def reset(self):
-        self._board = np.zeros((self._size, self._size))
+        self._board = np.zeros(self._size ** 2, int)
         self._score = 0
+        self._moves = 0
+        self._history = []
+        # Each game gets its own seed so it can be replayed on its own
+        self._seed = self._random.getrandbits(63)
+        self._random = random.Random(self._seed)
         self._spawn_piece()
+        self._publish()
 
     def get_board_data(self):
         """
@@ -147,6 +263,15 @@ class Board:
         """
         return self._board
 
+    def get_snapshot(self) -> BoardSnapshot:
+        """
+        Gets the latest published state of the board. Safe to call from other threads while the game is played,
+        unlike get_board_data, which returns the live board.
+        Returns: BoardSnapshot
+        """
+        version, data, score, moves = self._published
+        return BoardSnapshot(version, data, score, moves, self._size)
+
     def get_datum(self, pos: int):
         """
         Gets single datum from the game board
@@ -164,3 +289,22 @@ class Board:
 
     def get_score(self):
         return self._score
+
+    def get_move_count(self):
+        """
+        Returns: Number of moves that changed the board since the game started
+        """
+        return self._moves
+
+    def get_seed(self):
+        """
+        Returns: Seed of the piece spawns
+        """
+        return self._seed
+
+    def get_history(self):
+        """
+        Returns: List of the actions [0-3] that changed the board, in order. Replaying them on a board with the same
+            seed reproduces the game (see game_record.py).
+        """
+        return self._history
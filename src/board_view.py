@@ -11,23 +11,33 @@ from queue import Queue
 
 
 class BoardView:
-    def __init__(self, brd: Board = None, usr_input: bool = False, win_size: int = 900):
+    def __init__(self, brd: Board = None, usr_input: bool = False, win_size: int = 900, snapshot=None):
         """
         Constructor for game visualizer
         Args:
             brd: Game board to display (default None)
             usr_input: Determines if the viewer will listen for user input or not
             win_size: Size of the graphics window (default 900)
+            snapshot: Callable returning the BoardSnapshot to show each frame (default None shows the board's latest
+                snapshot, see Playback.sample)
         """
         self._board = brd
+        self._snapshot = snapshot
         self._win_size = win_size
         self._key_listener = None
         self._win = None
         self._usr_input = usr_input
+        # Tile rectangle and text objects, created by _draw_board on the first frame
+        self._tiles = None
+        self._score_text = None
+        # Tile exponents, score and snapshot version currently on screen
+        self._shown = None
+        self._shown_score = None
+        self._shown_version = None
 
     def _draw_board(self):
         """
-        Draws the board on screen
+        Creates the outline, grid, tiles and score once. Later frames only change the fill and text of these objects.
         Returns: None
 
         """
@@ -44,36 +54,65 @@ class BoardView:
             # Vertical line
             vert = Line(Point(10, 10 + ratio * x), Point(self._win_size - 10, 10 + ratio * x))
             vert.draw(self._win)
-        # Draw background squares and tile numbers
+        # Background squares and tile numbers, filled in by _update_tile
         inside_offset = (self._win_size - 20) / (brd_size * 2)
         scale = (self._win_size - 20) / brd_size
+        self._tiles = []
         for i in range(0, brd_size ** 2, brd_size):
             for j in range(brd_size):
                 r = Rectangle(Point(10 + j * scale, 10 + (i // brd_size) * scale),
                               Point(10 + j * scale + 2 * inside_offset,
                                     10 + (i // brd_size) * scale + 2 * inside_offset))
-                r.setFill(color_rgb(235, (220 - self._board.get_datum(i + j) * 14) % 255, 52))
                 r.draw(self._win)
-                # Don't draw tile numbers if they're zero
-                if 2 ** self._board.get_datum(i + j) == 1:
-                    continue
                 t = Text(Point(10 + j * scale + inside_offset,
-                               10 + (i // brd_size) * scale + inside_offset),
-                         2 ** self._board.get_datum(i + j))
+                               10 + (i // brd_size) * scale + inside_offset), "")
                 t.setSize(20)
                 t.draw(self._win)
-        score = Text(Point(30, 30), self._board.get_score())
-        score.draw(self._win)
+                self._tiles.append((r, t))
+        self._score_text = Text(Point(30, 30), "")
+        self._score_text.draw(self._win)
+        self._shown = [None] * brd_size ** 2
+        self._shown_score = None
+        self._shown_version = None
 
-    def update_graphics(self):
+    def _update_tile(self, pos: int, datum: int):
         """
-        Used for forcing graphic updates
+        Redraws one tile
+        Args:
+            pos: Position of the tile (note: board data is 1D)
+            datum: Tile exponent
+
         Returns: None
+
+        """
+        r, t = self._tiles[pos]
+        r.setFill(color_rgb(235, (220 - datum * 14) % 255, 52))
+        # Don't draw tile numbers if they're zero
+        t.setText("" if datum == 0 else str(2 ** datum))
+        self._shown[pos] = datum
+
+    def update_graphics(self) -> bool:
+        """
+        Used for forcing graphic updates. Only tiles that changed since the last frame are touched, and nothing is
+        flushed if the board didn't change at all.
+        Returns: Whether anything was redrawn
         """
-        for item in self._win.items:
-            item.undraw()
-        self._draw_board()
+        if self._tiles is None:
+            self._draw_board()
+        # Snapshots never change, so the agent or user input can move on while this frame is drawn
+        snapshot = self._snapshot() if self._snapshot is not None else self._board.get_snapshot()
+        if snapshot.get_version() == self._shown_version:
+            return False
+        self._shown_version = snapshot.get_version()
+        score = snapshot.get_score()
+        for pos, datum in enumerate(snapshot.get_board_data().tolist()):
+            if datum != self._shown[pos]:
+                self._update_tile(pos, datum)
+        if score != self._shown_score:
+            self._score_text.setText(score)
+            self._shown_score = score
         self._win.flush()
+        return True
 
     def start(self, ctr):
         """
@@ -85,11 +124,10 @@ class BoardView:
 
         """
         self._win = GraphWin(title="2048 AI", width=self._win_size, height=self._win_size, autoflush=False)
+        self._tiles = None
         if self._usr_input:
             listener = keyboard.Listener(on_press=ctr.consume_key, on_release=None)
             listener.start()
         while self._win.isOpen():
             self.update_graphics()
             update(15)
-            if ctr.event is not None:
-                ctr.event.set()
@@ -0,0 +1,182 @@
+"""
+file: checkpoint.py
+copyright: Owen Siljander 2021
+"""
+
+import glob
+import os
+import pickle
+import queue
+import random
+import tempfile
+import time
+from threading import Thread
+
+import numpy as np
+
+# Checkpoint files are named after the game counter so the latest sorts last
+FILE_PATTERN = "checkpoint-{:010d}.pkl"
+# What reading a partly written or corrupt checkpoint can raise. Unpickling garbage doesn't stop at
+# UnpicklingError, e.g. a bad protocol byte raises ValueError and a mangled class reference ImportError.
+LOAD_ERRORS = (OSError, EOFError, pickle.UnpicklingError, ValueError, KeyError, AttributeError, IndexError,
+               ImportError)
+
+
+def rng_state():
+    """
+    Returns: Dictionary with the state of both RNGs the game engine uses (random and numpy.random)
+    """
+    return {"python_rng": random.getstate(), "numpy_rng": np.random.get_state()}
+
+
+def restore_rng_state(state):
+    """
+    Restores RNG state saved with rng_state
+    """
+    random.setstate(state["python_rng"])
+    np.random.set_state(state["numpy_rng"])
+
+
+def write_atomic(path: str, state):
+    """
+    Writes a checkpoint to a temporary file in the same directory, flushes it to disk and renames it into place, so
+    a crash at any point leaves either the old file or the complete new one.
+    Args:
+        path: Final checkpoint path
+        state: Picklable checkpoint contents
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def list_checkpoints(directory: str):
+    """
+    Returns: Paths of the checkpoints in a directory, newest first
+    """
+    return sorted(glob.glob(os.path.join(directory, "checkpoint-*.pkl")), reverse=True)
+
+
+def load(path: str):
+    """
+    Loads one checkpoint
+    Returns: Checkpoint contents
+    """
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def load_latest(directory: str):
+    """
+    Loads the newest checkpoint that can be read completely. Unreadable files (e.g. from a full disk) are skipped.
+    Args:
+        directory: Checkpoint directory
+
+    Returns: Checkpoint contents, or None if there is no usable checkpoint
+
+    """
+    for path in list_checkpoints(directory):
+        try:
+            return load(path)
+        except LOAD_ERRORS as e:
+            print("Skipping unreadable checkpoint ", path, ": ", e)
+    return None
+
+
+class Checkpointer:
+    """
+    Periodic training checkpoints written on a background thread. The training loop hands over a snapshot of its
+    state and carries on; serialization and disk writes happen on the writer thread. If the previous checkpoint is
+    still being written, the new one is skipped rather than stalling training.
+    """
+    def __init__(self, directory: str = "checkpoints", every_games: int = 100, every_seconds: float = None,
+                 keep: int = 3, games: int = 0):
+        """
+        Initializer for the checkpointer
+        Args:
+            directory: Where checkpoints are written (created if missing)
+            every_games: Games between checkpoints (None to disable)
+            every_seconds: Seconds between checkpoints (None to disable)
+            keep: Number of most recent checkpoints kept on disk
+            games: Games already played (when resuming)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._every_games = every_games
+        self._every_seconds = every_seconds
+        self._keep = keep
+        self._last_games = games
+        self._last_time = time.monotonic()
+        self._pending = queue.Queue(maxsize=1)
+        self._writer = Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def due(self, games: int) -> bool:
+        """
+        Args:
+            games: Games played so far
+
+        Returns: Whether a checkpoint should be taken now
+        """
+        if self._every_games is not None and games - self._last_games >= self._every_games:
+            return True
+        return self._every_seconds is not None and time.monotonic() - self._last_time >= self._every_seconds
+
+    def save_async(self, games: int, state: dict) -> bool:
+        """
+        Queues a checkpoint for the writer thread. The state must not be modified afterwards, so pass copies of
+        anything the training loop keeps mutating (e.g. model.get_weights() rather than the model).
+        Args:
+            games: Games played so far
+            state: Checkpoint contents
+
+        Returns: False if the checkpoint was skipped because the previous one is still being written
+
+        """
+        try:
+            self._pending.put_nowait((games, dict(state, games=games)))
+        except queue.Full:
+            # Stays due, so the next call tries again
+            return False
+        self._last_games = games
+        self._last_time = time.monotonic()
+        return True
+
+    def save(self, games: int, state: dict):
+        """
+        Writes a checkpoint on the calling thread, after any queued one
+        """
+        self._pending.join()
+        self._write(games, dict(state, games=games))
+        self._last_games = games
+        self._last_time = time.monotonic()
+
+    def _write(self, games: int, state: dict):
+        write_atomic(os.path.join(self._directory, FILE_PATTERN.format(games)), state)
+        old = list_checkpoints(self._directory)[self._keep:]
+        for path in old:
+            os.remove(path)
+
+    def _write_loop(self):
+        while True:
+            games, state = self._pending.get()
+            try:
+                self._write(games, state)
+            except OSError as e:
+                print("Unable to write checkpoint: ", e)
+            finally:
+                self._pending.task_done()
+
+    def close(self):
+        """
+        Waits for the queued checkpoint to be written
+        """
+        self._pending.join()
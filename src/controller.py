@@ -7,18 +7,23 @@ from board import Board
 from board_view import BoardView
 from random_agent import RandomAgent
 from dr_agent import DRAgent
+from evaluate import evaluate
+from playback import Playback
 from pynput import keyboard
-from threading import Thread, Event
+from threading import Thread
 
 
 class Controller:
     # ModelView
     def __init__(self):
         self._board = Board()
-        self.event = None
+        self._playback = None
 
     def consume_key(self, key: keyboard.Key):
         # Callback for user input
+        if self._playback is not None:
+            self._consume_playback_key(key)
+            return
         try:
             if key == keyboard.Key.right:
                 # swipe right
@@ -36,30 +41,48 @@ class Controller:
             # Ignore exceptions since they *should* only be caused by a user
             pass
 
-    def run_dl_agent_graphics(self):
-        agent = DRAgent(self._board)
-        self.event = Event()
-        Thread(target=agent.play_graphics, args=[self.event]).start()
-        brd_view = BoardView(brd=self._board)
+    def _consume_playback_key(self, key: keyboard.Key):
+        # Speed controls while watching an agent: + faster, - slower, 1 real time, e skip to end
+        char = getattr(key, "char", None)
+        if char in ("+", "="):
+            self._playback.faster()
+        elif char == "-":
+            self._playback.slower()
+        elif char == "1":
+            self._playback.set_speed(1.0)
+        elif char == "e":
+            self._playback.skip_to_end()
+
+    def _run_agent_graphics(self, agent, speed):
+        # The agent plays at its own pace on a separate thread while the view samples its snapshots
+        self._playback = Playback(self._board, speed)
+        Thread(target=agent.play_graphics, args=[self._playback], daemon=True).start()
+        brd_view = BoardView(brd=self._board, usr_input=True, snapshot=self._playback.sample)
         brd_view.start(self)
+        self._playback.stop()
+        self._playback = None
+
+    def run_dl_agent_graphics(self, speed: float = 1.0):
+        # Runs the down-right agent with graphics, speed is a multiple of real time (None skips to the end)
+        self._run_agent_graphics(DRAgent(self._board), speed)
 
     def run_dl_agent(self):
         agent = DRAgent(self._board)
         agent.play()
 
-    def run_random_agent_graphics(self):
-        # Runs the random agent with graphics
-        agent = RandomAgent(self._board)
-        self.event = Event()
-        Thread(target=agent.play_graphics, args=[self.event]).start()
-        brd_view = BoardView(brd=self._board)
-        brd_view.start(self)
+    def run_random_agent_graphics(self, speed: float = 1.0):
+        # Runs the random agent with graphics, speed is a multiple of real time (None skips to the end)
+        self._run_agent_graphics(RandomAgent(self._board), speed)
 
     def run_random_agent(self):
         # Runs the random agent
         agent = RandomAgent(self._board)
         agent.play()
 
+    def evaluate_agent(self, agent_cls, games: int, workers: int = None, seed=None):
+        # Plays many headless games of an agent over a process pool and returns the aggregated statistics
+        return evaluate(agent_cls, games, workers, seed, report_every=max(games // 10, 1)).report()
+
     def run_interactive(self):
         # Runs the game with user controlled actions
         brd_view = BoardView(self._board, usr_input=True)
@@ -5,7 +5,6 @@ copyright: Owen Siljander 2021
 
 from agent import Agent
 from board import *
-from threading import Event
 
 
 class DRAgent(Agent):
@@ -29,15 +28,3 @@ class DRAgent(Agent):
     def play(self):
         while not self._board.is_terminal():
             self._make_choice()
-
-    def play_graphics(self, event: Event):
-        """
-        Purposely delayed random agent. Just for fun so you can actually
-        watch the agent play using graphics (instead of it just finishing immediately)
-        Returns: Nothing
-
-        """
-        while not self._board.is_terminal():
-            event.wait()
-            self._make_choice()
-            event.clear()
@@ -0,0 +1,193 @@
+"""
+file: env.py
+copyright: Owen Siljander 2021
+"""
+
+import numpy as np
+
+from board import Board
+from vec_board import VecBoard
+
+# Actions (left, right, up, down), same order as everywhere else
+ACTIONS = 4
+
+
+def action_masks(boards, size: int = 4):
+    """
+    Computes which actions change each board, for any board size. A swipe moves something exactly when some tile
+    has an empty or equal neighbour on the side it moves towards.
+    Args:
+        boards: (N, size * size) array of tile exponents
+        size: Board size
+
+    Returns: (N, 4) bool array of legal actions
+
+    """
+    grids = np.asarray(boards).reshape(-1, size, size)
+    masks = np.zeros((len(grids), ACTIONS), bool)
+    for direction, g in enumerate([grids, grids.transpose(0, 2, 1)]):
+        near, far = g[:, :, :-1], g[:, :, 1:]
+        # Left/up: a tile with an empty or equal cell before it, right/down: after it
+        masks[:, 2 * direction] = ((far != 0) & ((near == 0) | (near == far))).any(axis=(1, 2))
+        masks[:, 2 * direction + 1] = ((near != 0) & ((far == 0) | (far == near))).any(axis=(1, 2))
+    return masks
+
+
+class BoardEnv:
+    """
+    Single game environment over Board with the reset/step interface of gym(nasium). Observations are the tile
+    exponents as a uint8 vector, rewards are the score gained by a move. Actions that don't move anything are allowed
+    but leave the board unchanged with zero reward; action_mask() says which actions move.
+    """
+    def __init__(self, size: int = 4, seed=None, board_cls=Board, max_steps: int = None):
+        """
+        Initializer for the environment
+        Args:
+            size: Board size
+            seed: Seed for the first game, later games get seeds drawn from it (default None for a fresh seed)
+            board_cls: Board class to play on (e.g. BitBoard)
+            max_steps: Steps after which a game is truncated (default None for no limit)
+        """
+        self.size = size
+        self.observation_shape = (size * size,)
+        self.num_actions = ACTIONS
+        self._board_cls = board_cls
+        self._max_steps = max_steps
+        self._rng = np.random.default_rng(seed)
+        self._board = None
+        self._swipes = None
+        self._steps = 0
+
+    def _observe(self):
+        return np.asarray(self._board.get_board_data(), np.uint8)
+
+    def _info(self, obs):
+        return {"action_mask": action_masks(obs, self.size)[0], "score": self._board.get_score()}
+
+    def reset(self, seed=None):
+        """
+        Starts a new game
+        Args:
+            seed: Seed for this game (default None draws one from the environment's seed)
+
+        Returns: Tuple of the observation and an info dictionary (action_mask, score)
+
+        """
+        if seed is None:
+            seed = int(self._rng.integers(1 << 63))
+        self._board = self._board_cls(self.size, seed=seed)
+        self._swipes = [self._board.swipe_left, self._board.swipe_right, self._board.swipe_up, self._board.swipe_down]
+        self._steps = 0
+        obs = self._observe()
+        return obs, self._info(obs)
+
+    def step(self, action: int):
+        """
+        Makes one move
+        Args:
+            action: Action [0-3]
+
+        Returns: Tuple of the observation, reward, terminated flag, truncated flag and info dictionary (action_mask,
+            score, moved)
+
+        """
+        if self._board is None:
+            raise ValueError("Call reset before step")
+        score = self._board.get_score()
+        moved = self._swipes[action]()
+        self._steps += 1
+        obs = self._observe()
+        info = self._info(obs)
+        info["moved"] = moved
+        terminated = not info["action_mask"].any()
+        truncated = not terminated and self._max_steps is not None and self._steps >= self._max_steps
+        return obs, self._board.get_score() - score, terminated, truncated, info
+
+    def action_mask(self):
+        """
+        Returns: (4,) bool array of the actions that change the board
+        """
+        return action_masks(self._observe(), self.size)[0]
+
+    def get_board(self) -> Board:
+        return self._board
+
+
+class VecBoardEnv:
+    """
+    N 4x4 games stepped together with one call (see VecBoard), for learners that act on batches. Games that end are
+    restarted automatically; their last observation and score are returned in the info dictionary, like the
+    autoreset of gym(nasium) vector environments.
+    """
+    def __init__(self, n: int, seed=None, max_steps: int = None):
+        """
+        Initializer for the environment
+        Args:
+            n: Number of games
+            seed: Seed for the spawns (default None for a fresh seed)
+            max_steps: Steps after which a game is truncated (default None for no limit)
+        """
+        self.num_envs = n
+        self.observation_shape = (n, 16)
+        self.num_actions = ACTIONS
+        self._seed = seed
+        self._max_steps = max_steps
+        self._board = None
+        self._steps = np.zeros(n, np.int64)
+
+    def reset(self, seed=None):
+        """
+        Starts new games in every environment
+        Args:
+            seed: Seed for the spawns (default None keeps the environment's seed)
+
+        Returns: Tuple of the (N, 16) observations and an info dictionary (action_mask)
+
+        """
+        self._board = VecBoard(self.num_envs, seed=self._seed if seed is None else seed)
+        self._steps[:] = 0
+        obs = self._board.get_boards()
+        return obs, {"action_mask": action_masks(obs)}
+
+    def step(self, actions):
+        """
+        Makes one move in every game
+        Args:
+            actions: (N,) array of actions [0-3]
+
+        Returns: Tuple of the (N, 16) observations, (N,) rewards, (N,) terminated flags, (N,) truncated flags and an
+            info dictionary with the action_mask and moved flags of every game and final_observation and final_score
+            (valid where terminated or truncated, owned by the caller). The observations are the engine's live array,
+            copy them to keep them past the next step.
+
+        """
+        if self._board is None:
+            raise ValueError("Call reset before step")
+        rewards, moved, terminated = self._board.step(actions)
+        self._steps += 1
+        # Copies, so truncation doesn't write into the engine's arrays and the caller's info survives the next step
+        final_observation = self._board.final_boards.copy()
+        final_score = self._board.final_scores.copy()
+        truncated = np.zeros(self.num_envs, bool)
+        if self._max_steps is not None:
+            truncated = ~terminated & (self._steps >= self._max_steps)
+            idx = np.flatnonzero(truncated)
+            if len(idx):
+                final_observation[idx] = self._board.get_boards()[idx]
+                final_score[idx] = self._board.get_scores()[idx]
+                self._board.reset(idx)
+        self._steps[terminated | truncated] = 0
+        obs = self._board.get_boards()
+        info = {
+            "action_mask": action_masks(obs),
+            "moved": moved,
+            "final_observation": final_observation,
+            "final_score": final_score,
+        }
+        return obs, rewards, terminated, truncated, info
+
+    def action_masks(self):
+        """
+        Returns: (N, 4) bool array of the actions that change each board
+        """
+        return action_masks(self._board.get_boards())
@@ -0,0 +1,175 @@
+"""
+file: evaluate.py
+copyright: Owen Siljander 2021
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+from time import perf_counter
+
+import numpy as np
+
+from bitboard import BitBoard
+from board import Board
+from dr_agent import DRAgent
+from game_record import GameRecord, RecordWriter
+from random_agent import RandomAgent
+from stats import ScoreStats
+
+# Agents that can be picked by name on the command line
+AGENTS = {"random": RandomAgent, "dr": DRAgent}
+BOARDS = {"board": Board, "bitboard": BitBoard}
+
+
+def game_seeds(seed, games: int):
+    """
+    Derives one independent seed per game, so results don't depend on how games are spread over workers
+    Args:
+        seed: Seed of the whole evaluation (None for a fresh one)
+        games: Number of games
+
+    Returns: List of integer seeds
+
+    """
+    return [int(s) for s in np.random.SeedSequence(seed).generate_state(games, np.uint64)]
+
+
+def play_one(task):
+    """
+    Plays one headless game
+    Args:
+        task: Tuple of agent class, board class, board size, game index, seed and whether to record the game
+
+    Returns: Dictionary of the game index, seed, final score, max tile, move count, wall time and the encoded game
+        record (None if not recorded)
+
+    """
+    agent_cls, board_cls, size, game, seed, record = task
+    start = perf_counter()
+    board = board_cls(size, seed=seed)
+    # Agents draw their moves from the global random modules. Their state is put back afterwards, so playing in the
+    # caller's process (workers=0, Controller.evaluate_agent) leaves the caller's RNGs untouched.
+    python_state, numpy_state = random.getstate(), np.random.get_state()
+    try:
+        agent = agent_cls(board)
+        # Seeded after the agent so its own reseeding doesn't matter
+        random.seed(seed)
+        np.random.seed(seed % (1 << 32))
+        agent.play()
+    finally:
+        random.setstate(python_state)
+        np.random.set_state(numpy_state)
+    return {
+        "game": game,
+        "seed": seed,
+        "score": int(board.get_score()),
+        "max_tile": 2 ** int(np.max(board.get_board_data())),
+        "moves": board.get_move_count(),
+        "time": perf_counter() - start,
+        "record": GameRecord.from_board(board).encode() if record else None,
+    }
+
+
+class Summary:
+    """
+    Running aggregate of game results, updated as games finish so memory doesn't grow with the number of games
+    """
+    def __init__(self):
+        self.games = 0
+        self.scores = ScoreStats()
+        self.total_moves = 0
+        self.total_time = 0.0
+
+    def add(self, result: dict):
+        """
+        Adds the result of one game (see play_one)
+        """
+        self.games += 1
+        self.scores.add(result["score"], result["max_tile"])
+        self.total_moves += result["moves"]
+        self.total_time += result["time"]
+
+    def report(self) -> dict:
+        """
+        Returns: Dictionary of the aggregated statistics
+        """
+        games = max(self.games, 1)
+        scores = self.scores.summary()
+        return {
+            "games": self.games,
+            "avg_score": scores["avg"],
+            "std_score": scores["std"],
+            "min_score": scores["min"],
+            "max_score": scores["max"],
+            "score_quantiles": scores["quantiles"],
+            "avg_moves": self.total_moves / games,
+            "avg_time": self.total_time / games,
+            # Share of games that reached at least each tile
+            "reached": scores["reached"],
+        }
+
+
+def evaluate(agent_cls, games: int, workers: int = None, seed=None, board_cls=Board, size: int = 4,
+             chunksize: int = 64, report_every: int = 0, on_result=None, record_path: str = None):
+    """
+    Plays games of an agent over a process pool, aggregating results as they stream in
+    Args:
+        agent_cls: Agent subclass, constructed with the board of each game
+        games: Number of games
+        workers: Number of processes (default None for one per CPU, 0 plays in this process)
+        seed: Seed of the whole evaluation, the same seed replays the same games
+        board_cls: Board class to play on
+        size: Board size
+        chunksize: Games handed to a worker at a time
+        report_every: Games between progress prints (0 for none)
+        on_result: Optional callable receiving the result of every game
+        record_path: Optional file the games are appended to (see game_record.py)
+
+    Returns: Summary of all games
+
+    """
+    tasks = [(agent_cls, board_cls, size, i, s, record_path is not None) for i, s in enumerate(game_seeds(seed, games))]
+    summary = Summary()
+    start = perf_counter()
+    writer = None if record_path is None else RecordWriter(record_path)
+
+    def consume(results):
+        for result in results:
+            summary.add(result)
+            if writer is not None:
+                writer.write(result["record"])
+            if on_result is not None:
+                on_result(result)
+            if report_every and summary.games % report_every == 0:
+                report = summary.report()
+                print("Games: ", summary.games, " Avg: ", report["avg_score"], " Max: ", report["max_score"],
+                      " Games/s: ", summary.games / (perf_counter() - start))
+
+    try:
+        if workers == 0:
+            consume(map(play_one, tasks))
+        else:
+            with mp.Pool(workers or os.cpu_count()) as pool:
+                consume(pool.imap_unordered(play_one, tasks, chunksize))
+    finally:
+        if writer is not None:
+            writer.close()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless evaluation of an agent over many games")
+    parser.add_argument("agent", choices=sorted(AGENTS))
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--board", choices=sorted(BOARDS), default="board")
+    parser.add_argument("--report-every", type=int, default=1000)
+    parser.add_argument("--record", metavar="FILE", help="append every game to a game record file")
+    args = parser.parse_args()
+    result = evaluate(AGENTS[args.agent], args.games, args.workers, args.seed, BOARDS[args.board],
+                      report_every=args.report_every, record_path=args.record).report()
+    for key, value in result.items():
+        print(key, ": ", value)
@@ -0,0 +1,243 @@
+"""
+file: game_record.py
+copyright: Owen Siljander 2021
+"""
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from board import Board
+
+# File header: magic and format version
+MAGIC = b"2048REC"
+VERSION = 1
+FILE_HEADER = struct.Struct("<7sB")
+# Record header: board size, flags, seed, number of moves, final score
+RECORD_HEADER = struct.Struct("<BBQII")
+# Flag set when the record holds the position and value of every spawn
+HAS_SPAWNS = 1
+# Spawns are stored as one byte, the cell index in the low 7 bits and the value (2 or 4) in the high bit
+MAX_SPAWN_CELLS = 128
+# Records buffered by RecordWriter before a write
+BUFFER_SIZE = 1 << 20
+
+
+def pack_actions(actions) -> bytes:
+    """
+    Packs actions [0-3] four to a byte, first action in the lowest bits
+    """
+    actions = np.asarray(actions, np.uint8)
+    padded = np.zeros(-(-len(actions) // 4) * 4, np.uint8)
+    padded[:len(actions)] = actions
+    quads = padded.reshape(-1, 4)
+    return (quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6).astype(np.uint8).tobytes()
+
+
+def unpack_actions(data, moves: int):
+    """
+    Inverse of pack_actions
+    Args:
+        data: Packed actions
+        moves: Number of actions
+
+    Returns: uint8 array of actions
+
+    """
+    packed = np.frombuffer(data, np.uint8)
+    return (packed[:, None] >> np.array([0, 2, 4, 6], np.uint8) & 3).ravel()[:moves]
+
+
+class GameRecord:
+    """
+    One game, stored as the seed of its spawns and the moves that changed the board. Games not played on a seeded
+    Board (e.g. q-learn.py, which spawns with the global random module) store every spawn instead, with the seed
+    set to 0.
+    """
+    def __init__(self, size: int, seed: int, actions, score: int, spawns=None):
+        """
+        Initializer for the record
+        Args:
+            size: Board size
+            seed: Seed of the board's spawns
+            actions: Actions [0-3] that changed the board, in order
+            score: Final score
+            spawns: Optional (cell, exponent) of every spawn including the first, one more than there are actions
+        """
+        self.size = size
+        self.seed = seed
+        self.actions = np.asarray(actions, np.uint8)
+        self.score = int(score)
+        self.spawns = None if spawns is None else np.asarray(spawns, np.int64).reshape(-1, 2)
+        if self.spawns is not None and len(self.spawns) != len(self.actions) + 1:
+            raise ValueError("A game has one more spawn than moves")
+
+    @staticmethod
+    def from_board(board: Board):
+        """
+        Records a game played on a Board (or BitBoard)
+        Returns: GameRecord
+        """
+        return GameRecord(board.get_board_size(), board.get_seed(), board.get_history(), board.get_score())
+
+    def encode(self) -> bytes:
+        """
+        Returns: The record in the binary format
+        """
+        flags = 0 if self.spawns is None else HAS_SPAWNS
+        data = RECORD_HEADER.pack(self.size, flags, self.seed, len(self.actions), self.score) + \
+            pack_actions(self.actions)
+        if self.spawns is not None:
+            if self.size ** 2 > MAX_SPAWN_CELLS:
+                raise ValueError("Spawns can only be recorded on boards of up to " + str(MAX_SPAWN_CELLS) + " cells")
+            data += (self.spawns[:, 0] | (self.spawns[:, 1] - 1) << 7).astype(np.uint8).tobytes()
+        return data
+
+    @staticmethod
+    def decode(data, offset: int = 0):
+        """
+        Decodes one record
+        Args:
+            data: Buffer holding records
+            offset: Position of the record in data
+
+        Returns: Tuple of the GameRecord and the position after it
+
+        """
+        size, flags, seed, moves, score = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        packed = -(-moves // 4)
+        actions = unpack_actions(data[offset:offset + packed], moves)
+        offset += packed
+        spawns = None
+        if flags & HAS_SPAWNS:
+            raw = np.frombuffer(data[offset:offset + moves + 1], np.uint8).astype(np.int64)
+            spawns = np.stack([raw & 0x7F, (raw >> 7) + 1], axis=1)
+            offset += moves + 1
+        return GameRecord(size, seed, actions, score, spawns), offset
+
+    def replay_board(self, board_cls=Board):
+        """
+        Creates the board of the game in its starting position. Making the recorded moves on it replays the game.
+        Args:
+            board_cls: Board class to replay on (recorded spawns are only supported on Board)
+
+        Returns: Board
+
+        """
+        return board_cls(self.size, seed=self.seed) if self.spawns is None else _SpawnBoard(self.size, self.spawns)
+
+    def replay(self, board_cls=Board):
+        """
+        Plays the game again through the board engine
+        Args:
+            board_cls: Board class to replay on (recorded spawns are only supported on Board)
+
+        Returns: Board in the final position of the game
+
+        """
+        board = self.replay_board(board_cls)
+        swipes = [board.swipe_left, board.swipe_right, board.swipe_up, board.swipe_down]
+        for action in self.actions:
+            if not swipes[action]():
+                raise ValueError("Recorded move " + str(action) + " doesn't change the board")
+        return board
+
+
+class _SpawnBoard(Board):
+    """
+    Board that places recorded spawns instead of random ones
+    """
+    def __init__(self, size: int, spawns):
+        self._spawns = iter(spawns)
+        super().__init__(size, seed=0)
+
+    def _spawn_piece(self):
+        cell, exponent = next(self._spawns)
+        self._board[cell] = exponent
+
+
+def write_header(f):
+    f.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+
+def check_header(data):
+    magic, version = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a version " + str(VERSION) + " game record file")
+
+
+class RecordWriter:
+    """
+    Appends game records to a file. Encoded records are collected in memory and written in bulk once BUFFER_SIZE
+    bytes have built up, so recording doesn't cost a system call per game.
+    """
+    def __init__(self, path: str, buffer_size: int = BUFFER_SIZE):
+        """
+        Initializer for the writer
+        Args:
+            path: Record file, created with a header if it doesn't exist
+            buffer_size: Bytes collected before a write
+        """
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            with open(path, "rb") as f:
+                check_header(f.read(FILE_HEADER.size))
+        self._file = open(path, "ab")
+        if new:
+            write_header(self._file)
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self._count = 0
+
+    def write(self, record):
+        """
+        Adds a record
+        Args:
+            record: GameRecord or an already encoded record (e.g. from a worker process)
+        """
+        self._buffer += record if isinstance(record, (bytes, bytearray)) else record.encode()
+        self._count += 1
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        self._file.write(self._buffer)
+        self._file.flush()
+        self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def get_count(self) -> int:
+        """
+        Returns: Number of records written by this writer
+        """
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(path: str):
+    """
+    Reads every record of a file
+    Args:
+        path: Record file
+
+    Returns: Generator of GameRecords
+
+    """
+    # Memory mapped so files of millions of games aren't read into memory at once
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        check_header(data)
+        offset = FILE_HEADER.size
+        while offset < len(data):
+            record, offset = GameRecord.decode(data, offset)
+            yield record
@@ -0,0 +1,104 @@
+"""
+file: hot_reload.py
+copyright: Owen Siljander 2021
+"""
+
+from threading import Event, Thread
+
+import checkpoint
+from numpy_net import NumpyValueNet
+
+# Seconds between looks at the checkpoint directory
+POLL_INTERVAL = 5.0
+
+
+def load_weights(state: dict) -> NumpyValueNet:
+    """
+    Builds a network from the weights of a checkpoint written by q-learn.py
+    """
+    return NumpyValueNet.from_weight_list(state["weights"])
+
+
+class WeightWatcher:
+    """
+    Watches a checkpoint directory (see checkpoint.py) and loads new weights as they appear, so a running player
+    or server picks up a training run's progress without restarting. Checkpoints are read and turned into a new model
+    on a background thread; the model is only published once fully built, by replacing a single reference. Callers
+    fetch current() once per move (or per batch) and use that model throughout, so a move never mixes weights.
+    """
+    def __init__(self, directory: str, initial=None, load=load_weights, interval: float = POLL_INTERVAL,
+                 on_swap=None):
+        """
+        Initializer for the watcher
+        Args:
+            directory: Checkpoint directory
+            initial: Model used until a checkpoint is loaded (default None loads the newest checkpoint first)
+            load: Callable building a model from checkpoint contents. The model must not be modified afterwards.
+            interval: Seconds between polls
+            on_swap: Called with the checkpoint contents after each swap (on the watcher thread)
+        """
+        self._directory = directory
+        self._load = load
+        self._interval = interval
+        self._on_swap = on_swap
+        self._model = initial
+        self._path = None
+        self._version = 0
+        self._stop = Event()
+        if initial is None:
+            self.poll()
+        self._thread = Thread(target=self._watch_loop, daemon=True)
+        self._thread.start()
+
+    def current(self):
+        """
+        Returns: The newest fully loaded model
+        """
+        return self._model
+
+    def get_version(self) -> int:
+        """
+        Returns: Number of swaps so far
+        """
+        return self._version
+
+    def poll(self) -> bool:
+        """
+        Loads the newest readable checkpoint if it is newer than the loaded one
+        Returns: Whether the model was swapped
+        """
+        for path in checkpoint.list_checkpoints(self._directory):
+            if path == self._path:
+                return False
+            try:
+                state = checkpoint.load(path)
+                model = self._load(state)
+            except checkpoint.LOAD_ERRORS as e:
+                # Most likely removed by the checkpointer while reading, or weights in an unknown layout
+                print("Skipping checkpoint ", path, ": ", e)
+                continue
+            self._path = path
+            # Publishing is a single reference assignment, readers see the old or the new model, never a mix
+            self._model = model
+            self._version += 1
+            if self._on_swap is not None:
+                self._on_swap(state)
+            return True
+        return False
+
+    def _watch_loop(self):
+        while not self._stop.wait(self._interval):
+            self.poll()
+
+    def close(self):
+        """
+        Stops watching
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,265 @@
+"""
+file: move_server.py
+copyright: Owen Siljander 2021
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from row_tables import afterstates_batch
+
+# Requests evaluated in one forward pass at most
+MAX_BATCH = 256
+# Seconds the first request of a batch waits for more requests
+MAX_WAIT = 0.002
+HOST = "127.0.0.1"
+PORT = 2048
+# Longest request line accepted
+LINE_LIMIT = 1 << 16
+
+
+def load_predictor(backend: str = "numpy"):
+    """
+    Loads the action value functions (tf_model*.h5 in the working directory)
+    Args:
+        backend: "numpy" evaluates them with NumPy (see numpy_net.py), "keras" with TensorFlow
+
+    Returns: Callable mapping (N, 16) boards to (N, 4) action values
+
+    """
+    if backend == "numpy":
+        import numpy_net
+        return numpy_net.load_value_net().predict_all
+    if backend == "keras":
+        import value_net
+        models = value_net.load_models()
+        return lambda states: np.hstack([np.asarray(m.predict_on_batch(np.asarray(states, np.float32)))
+                                         for m in models])
+    raise ValueError("Unknown backend " + str(backend))
+
+
+def watch_predictor(directory: str, interval: float):
+    """
+    Predictor that follows the checkpoints of a training run (see hot_reload.py). Every batch is evaluated by the
+    model that was current when the batch started.
+    Returns: Tuple of the predictor and its WeightWatcher
+    """
+    from hot_reload import WeightWatcher
+    watcher = WeightWatcher(directory, interval=interval)
+    if watcher.current() is None:
+        raise ValueError("No usable checkpoint in " + directory)
+    return (lambda states: watcher.current().predict_all(states)), watcher
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches for one forward pass each. A batch is evaluated once it has max_batch
+    boards or its first board has waited max_wait seconds, whichever comes first. Evaluation runs on a worker thread
+    so the event loop keeps reading requests (and filling the next batch) in the meantime.
+    """
+    def __init__(self, predict, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT):
+        """
+        Initializer for the batcher
+        Args:
+            predict: Callable mapping (N, 16) boards to (N, 4) action values
+            max_batch: Largest batch
+            max_wait: Seconds a request may wait for others to join its batch
+        """
+        self._predict = predict
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = None
+        self.batches = 0
+        self.requests = 0
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def choose(self, board):
+        """
+        Queues a board and waits for its result
+        Args:
+            board: 16 tile exponents
+
+        Returns: Tuple of the chosen action (None if no move is legal), the (4,) action values and the (4,) legal mask
+
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((board, future))
+        return await future
+
+    def _evaluate(self, boards):
+        values = np.asarray(self._predict(boards), np.float64)
+        legal = afterstates_batch(boards)[2]
+        actions = np.argmax(np.where(legal, values, -np.inf), axis=1)
+        return actions, values, legal
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_wait
+            while len(batch) < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            boards = np.array([board for board, _ in batch], np.uint8)
+            try:
+                actions, values, legal = await loop.run_in_executor(self._executor, self._evaluate, boards)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            for i, (_, future) in enumerate(batch):
+                if not future.done():
+                    action = int(actions[i]) if legal[i].any() else None
+                    future.set_result((action, values[i].tolist(), legal[i].tolist()))
+
+
+def parse_board(request: dict):
+    """
+    Reads the board of a request, given either as tile exponents ("board") or as tile values ("tiles")
+    Returns: (16,) uint8 array of tile exponents
+    """
+    if "tiles" in request:
+        # Integers too big for int64 come out as an object array and are rejected with the floats
+        tiles = np.asarray(request["tiles"])
+        if not np.issubdtype(tiles.dtype, np.integer):
+            raise ValueError("Tiles must be integers")
+        if (tiles < 0).any() or (tiles & (tiles - 1))[tiles > 0].any():
+            raise ValueError("Tiles must be 0 or powers of 2")
+        board = np.where(tiles > 0, np.log2(np.maximum(tiles, 1)), 0).astype(np.int64)
+    else:
+        board = np.asarray(request["board"])
+        if not np.issubdtype(board.dtype, np.integer):
+            raise ValueError("Tile exponents must be integers")
+    if board.shape != (16,) or (board < 0).any() or (board > 15).any():
+        raise ValueError("A board is 16 tile exponents between 0 and 15")
+    return board.astype(np.uint8)
+
+
+async def handle_request(batcher: MicroBatcher, line: bytes) -> dict:
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get("id")
+        action, values, legal = await batcher.choose(parse_board(request))
+        return {"id": request_id, "action": action, "values": values, "legal": legal}
+    except (ValueError, KeyError, TypeError, AttributeError, OverflowError) as e:
+        return {"id": request_id, "error": str(e)}
+
+
+async def serve_client(batcher: MicroBatcher, reader, writer):
+    """
+    Serves one connection. Every line is a JSON request answered with one JSON line; requests are handled
+    concurrently, so responses can come back out of order and carry the request's "id".
+    """
+    lock = asyncio.Lock()
+    tasks = set()
+
+    async def respond(line):
+        response = await handle_request(batcher, line)
+        async with lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    except (ConnectionError, ValueError):
+        # Client went away or sent a line over LINE_LIMIT
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(predict, host: str = HOST, port: int = PORT, unix_path: str = None,
+                       max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT):
+    """
+    Starts serving moves
+    Args:
+        predict: Callable mapping (N, 16) boards to (N, 4) action values (see load_predictor)
+        host: TCP host
+        port: TCP port (0 picks a free one)
+        unix_path: Unix socket path, used instead of TCP if given
+        max_batch: Largest batch
+        max_wait: Seconds a request may wait for others to join its batch
+
+    Returns: Tuple of the asyncio server and its MicroBatcher
+
+    """
+    batcher = MicroBatcher(predict, max_batch, max_wait)
+    batcher.start()
+
+    async def client(reader, writer):
+        await serve_client(batcher, reader, writer)
+
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(client, unix_path, limit=LINE_LIMIT)
+    else:
+        server = await asyncio.start_server(client, host, port, limit=LINE_LIMIT)
+    return server, batcher
+
+
+async def main(args):
+    watcher = None
+    if args.watch is not None:
+        predict, watcher = watch_predictor(args.watch, args.watch_interval)
+    else:
+        predict = load_predictor(args.backend)
+    server, batcher = await start_server(predict, args.host, args.port, args.unix, args.max_batch,
+                                         args.max_wait_ms / 1000)
+    print("Serving moves on ", args.unix or "{}:{}".format(*server.sockets[0].getsockname()[:2]))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+        if watcher is not None:
+            watcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves moves of the value networks as line delimited JSON")
+    parser.add_argument("--backend", choices=["numpy", "keras"], default="numpy")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000)
+    parser.add_argument("--watch", metavar="DIR", help="serve the newest checkpoint in DIR and reload new ones")
+    parser.add_argument("--watch-interval", type=float, default=5.0, help="seconds between checkpoint polls")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,235 @@
+"""
+file: numpy_net.py
+copyright: Owen Siljander 2021
+"""
+
+import numpy as np
+
+# Number of actions (left, right, up, down)
+ACTIONS = 4
+# Number of board cells fed to the networks
+INPUTS = 16
+# Hidden units of each action network
+HIDDEN = 4
+# Same files value_net.py reads and writes
+MODEL_FILES = ["tf_model0.h5", "tf_model1.h5", "tf_model2.h5", "tf_model3.h5"]
+MULTIHEAD_FILE = "tf_model.h5"
+# Exported weights of all four networks
+WEIGHTS_FILE = "tf_weights.npz"
+# Number of floats in all four networks (see to_flat)
+FLAT_SIZE = ACTIONS * (INPUTS * HIDDEN + HIDDEN + HIDDEN + 1)
+
+
+def read_h5_weights(path: str):
+    """
+    Reads the layer weights of a model saved by keras in the h5 format, without importing TensorFlow. Follows the
+    layout keras itself uses: a "layer_names" attribute listing the layers in order and a "weight_names" attribute on
+    every layer group.
+    Args:
+        path: Model file
+
+    Returns: Dictionary of layer name to list of weight arrays, in layer order (layers without weights are skipped)
+
+    """
+    # Optional dependency, only needed when reading keras files directly
+    import h5py
+
+    def decode(name):
+        return name.decode("utf8") if isinstance(name, bytes) else name
+
+    layers = {}
+    with h5py.File(path, "r") as f:
+        group = f["model_weights"] if "model_weights" in f else f
+        for layer_name in group.attrs["layer_names"]:
+            layer = group[decode(layer_name)]
+            weights = [np.asarray(layer[decode(w)]) for w in layer.attrs["weight_names"]]
+            if weights:
+                layers[decode(layer_name)] = weights
+    return layers
+
+
+class NumpyValueNet:
+    """
+    The four Dense(4, relu) -> Dense(1) action value networks of q-learn.py evaluated with plain NumPy. The hidden
+    layers of all actions are concatenated into one (16, 16) matrix and the output layers into a block diagonal
+    (16, 4) matrix, so a batch of states is evaluated for every action with two matmuls.
+    """
+    def __init__(self, hidden_kernel, hidden_bias, value_kernel, value_bias):
+        """
+        Initializer for the network
+        Args:
+            hidden_kernel: (4, 16, 4) hidden layer kernel of each action
+            hidden_bias: (4, 4) hidden layer bias of each action
+            value_kernel: (4, 4, 1) output layer kernel of each action
+            value_bias: (4, 1) output layer bias of each action
+        """
+        self.hidden_kernel = np.asarray(hidden_kernel, np.float32).reshape(ACTIONS, INPUTS, HIDDEN)
+        self.hidden_bias = np.asarray(hidden_bias, np.float32).reshape(ACTIONS, HIDDEN)
+        self.value_kernel = np.asarray(value_kernel, np.float32).reshape(ACTIONS, HIDDEN, 1)
+        self.value_bias = np.asarray(value_bias, np.float32).reshape(ACTIONS, 1)
+        self._w1 = np.concatenate(list(self.hidden_kernel), axis=1)
+        self._b1 = self.hidden_bias.reshape(ACTIONS * HIDDEN)
+        self._w2 = np.zeros((ACTIONS * HIDDEN, ACTIONS), np.float32)
+        for a in range(ACTIONS):
+            self._w2[a * HIDDEN:(a + 1) * HIDDEN, a] = self.value_kernel[a, :, 0]
+        self._b2 = self.value_bias.reshape(ACTIONS)
+
+    def predict_all(self, states):
+        """
+        Estimates the value of every action for a batch of states
+        Args:
+            states: (N, 16) batch of game states
+
+        Returns: (N, 4) array of estimated values
+
+        """
+        hidden = np.asarray(states, np.float32) @ self._w1 + self._b1
+        np.maximum(hidden, 0, out=hidden)
+        return hidden @ self._w2 + self._b2
+
+    def predict(self, states, action: int):
+        """
+        Estimates the value of one action for a batch of states
+        Returns: (N,) array of estimated values
+        """
+        states = np.asarray(states, np.float32)
+        hidden = np.maximum(states @ self.hidden_kernel[action] + self.hidden_bias[action], 0)
+        return (hidden @ self.value_kernel[action] + self.value_bias[action])[:, 0]
+
+    def get_weights(self):
+        """
+        Returns: Dictionary of the stacked per action weight arrays (the layout of WEIGHTS_FILE)
+        """
+        return {
+            "hidden_kernel": self.hidden_kernel,
+            "hidden_bias": self.hidden_bias,
+            "value_kernel": self.value_kernel,
+            "value_bias": self.value_bias,
+        }
+
+    def to_flat(self):
+        """
+        Returns: All weights concatenated into one float32 vector of FLAT_SIZE entries (e.g. for shared memory)
+        """
+        return np.concatenate([w.ravel() for w in self.get_weights().values()])
+
+    @staticmethod
+    def from_flat(flat):
+        """
+        Inverse of to_flat
+        Returns: NumpyValueNet
+        """
+        sizes = np.cumsum([ACTIONS * INPUTS * HIDDEN, ACTIONS * HIDDEN, ACTIONS * HIDDEN])
+        return NumpyValueNet(*np.split(np.asarray(flat, np.float32), sizes))
+
+    def save(self, path: str = WEIGHTS_FILE):
+        np.savez(path, **self.get_weights())
+
+    @staticmethod
+    def load(path: str = WEIGHTS_FILE):
+        """
+        Loads weights exported with save
+        Returns: NumpyValueNet
+        """
+        with np.load(path) as data:
+            return NumpyValueNet(data["hidden_kernel"], data["hidden_bias"], data["value_kernel"], data["value_bias"])
+
+    @staticmethod
+    def from_h5(files=MODEL_FILES):
+        """
+        Reads the per action keras models
+        Args:
+            files: One model file per action
+
+        Returns: NumpyValueNet
+
+        """
+        weights = []
+        for f in files:
+            hidden, value = read_h5_weights(f).values()
+            weights.append(hidden + value)
+        return NumpyValueNet(*[np.stack(w) for w in zip(*weights)])
+
+    @staticmethod
+    def from_multihead_h5(path: str = MULTIHEAD_FILE):
+        """
+        Reads a multi-head keras model (see value_net.build_multihead_model)
+        Returns: NumpyValueNet
+        """
+        layers = read_h5_weights(path)
+        weights = [layers["hidden" + str(a)] + layers["value" + str(a)] for a in range(ACTIONS)]
+        return NumpyValueNet(*[np.stack(w) for w in zip(*weights)])
+
+    @staticmethod
+    def from_keras(models):
+        """
+        Copies the weights of live keras models
+        Args:
+            models: List of per action models or a multi-head model
+
+        Returns: NumpyValueNet
+
+        """
+        if isinstance(models, (list, tuple)):
+            weights = [m.get_weights() for m in models]
+        else:
+            weights = [models.get_layer("hidden" + str(a)).get_weights() +
+                       models.get_layer("value" + str(a)).get_weights() for a in range(ACTIONS)]
+        return NumpyValueNet(*[np.stack(w) for w in zip(*weights)])
+
+    @staticmethod
+    def from_weight_list(weights):
+        """
+        Builds the network from weights in any of the layouts q-learn.py checkpoints hold
+        Args:
+            weights: Flat vector (see to_flat), get_weights() of the four per action models, or get_weights() of a
+                multi-head model (all hidden layers, then all value layers)
+
+        Returns: NumpyValueNet
+
+        """
+        if isinstance(weights, np.ndarray):
+            return NumpyValueNet.from_flat(weights)
+        if len(weights) == ACTIONS:
+            return NumpyValueNet(*[np.stack(w) for w in zip(*weights)])
+        if len(weights) == 4 * ACTIONS:
+            hidden, value = weights[:2 * ACTIONS], weights[2 * ACTIONS:]
+            return NumpyValueNet(np.stack(hidden[0::2]), np.stack(hidden[1::2]), np.stack(value[0::2]),
+                                 np.stack(value[1::2]))
+        raise ValueError("Unknown weight layout")
+
+    @staticmethod
+    def random(seed=None):
+        """
+        Creates untrained weights with the same initialization keras uses for Dense layers (Glorot uniform, zero bias)
+        Returns: NumpyValueNet
+        """
+        rng = np.random.default_rng(seed)
+        hidden_limit = np.sqrt(6 / (INPUTS + HIDDEN))
+        value_limit = np.sqrt(6 / (HIDDEN + 1))
+        return NumpyValueNet(rng.uniform(-hidden_limit, hidden_limit, (ACTIONS, INPUTS, HIDDEN)),
+                             np.zeros((ACTIONS, HIDDEN)),
+                             rng.uniform(-value_limit, value_limit, (ACTIONS, HIDDEN, 1)),
+                             np.zeros((ACTIONS, 1)))
+
+
+def load_value_net(weights_file: str = WEIGHTS_FILE, multihead_file: str = MULTIHEAD_FILE, files=MODEL_FILES):
+    """
+    Loads the value networks from the first source that works: exported weights, the multi-head model, then the per
+    action models. Falls back to untrained weights like q-learn.py does.
+    Returns: NumpyValueNet
+    """
+    loaders = [(NumpyValueNet.load, weights_file), (NumpyValueNet.from_multihead_h5, multihead_file),
+               (NumpyValueNet.from_h5, files)]
+    for loader, source in loaders:
+        try:
+            return loader(source)
+        except (OSError, KeyError, ValueError, ImportError):
+            continue
+    print("\n\n!======== UNABLE TO LOAD MODELS - CREATING MODELS... ==========!\n\n")
+    return NumpyValueNet.random()
+
+
+if __name__ == "__main__":
+    # Exports the keras models in the working directory so they can be used without h5py or TensorFlow
+    load_value_net().save(WEIGHTS_FILE)
@@ -0,0 +1,124 @@
+"""
+file: playback.py
+copyright: Owen Siljander 2021
+"""
+
+import time
+from threading import Event
+
+from board import Board
+
+# Moves per second at 1x speed, one move per BoardView frame
+MOVE_RATE = 15.0
+# Speed multipliers the speed keys step through
+SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0, 128.0)
+
+
+class Playback:
+    """
+    Paces an agent playing on a board that is being watched. The agent plays on its own thread at the chosen speed
+    while the board publishes a snapshot after each move; the viewer samples the newest snapshot at its own frame
+    rate, so snapshots published between two frames are dropped instead of slowing the agent down.
+    """
+    def __init__(self, board: Board, speed: float = 1.0, move_rate: float = MOVE_RATE, drop_frames: bool = True):
+        """
+        Initializer for the playback
+        Args:
+            board: Board the agent plays on
+            speed: Multiple of move_rate the agent plays at (None skips to the end at full engine speed)
+            move_rate: Moves per second at 1x speed
+            drop_frames: Let the agent run ahead of the viewer. If False every move is shown, so the agent is held
+                back to the viewer's frame rate.
+        """
+        self._board = board
+        self._speed = speed
+        self._move_rate = move_rate
+        self._drop_frames = drop_frames
+        self._next = None
+        self._wake = Event()
+        self._stopped = Event()
+        # Frames shown and snapshots skipped between them
+        self.sampled = 0
+        self.dropped = 0
+        self._last_sampled = board.get_snapshot().get_version() - 1
+
+    def get_speed(self):
+        return self._speed
+
+    def set_speed(self, speed):
+        """
+        Changes the speed, taking effect from the next move
+        Args:
+            speed: Multiple of the move rate (None skips to the end)
+        """
+        self._speed = speed
+        self._next = None
+        self._wake.set()
+
+    def faster(self):
+        """
+        Steps up to the next speed in SPEEDS
+        """
+        if self._speed is not None:
+            self.set_speed(next((s for s in SPEEDS if s > self._speed), SPEEDS[-1]))
+
+    def slower(self):
+        """
+        Steps down to the previous speed in SPEEDS (from skip to end, to the fastest one)
+        """
+        if self._speed is None:
+            self.set_speed(SPEEDS[-1])
+        else:
+            self.set_speed(next((s for s in reversed(SPEEDS) if s < self._speed), SPEEDS[0]))
+
+    def skip_to_end(self):
+        self.set_speed(None)
+
+    def wait_turn(self) -> bool:
+        """
+        Blocks the agent until its next move is due
+        Returns: False once the playback is stopped
+        """
+        while not self._stopped.is_set():
+            self._wake.clear()
+            speed = self._speed
+            if speed is None:
+                return True
+            if not self._drop_frames and self._last_sampled < self._board.get_snapshot().get_version():
+                # The previous move hasn't been shown yet
+                self._wake.wait()
+                continue
+            now = time.monotonic()
+            interval = 1 / (self._move_rate * speed)
+            if self._next is None or self._next < now - interval:
+                # Started, sped up or fell behind: don't make up for lost moves in a burst
+                self._next = now
+            if now >= self._next:
+                self._next += interval
+                return True
+            self._wake.wait(self._next - now)
+        return False
+
+    def sample(self):
+        """
+        Takes the newest snapshot of the board for a frame
+        Returns: BoardSnapshot
+        """
+        snapshot = self._board.get_snapshot()
+        version = snapshot.get_version()
+        if version > self._last_sampled:
+            self.dropped += version - self._last_sampled - 1
+            self.sampled += 1
+            self._last_sampled = version
+            self._wake.set()
+        return snapshot
+
+    def stop(self):
+        """
+        Stops the agent at its next turn
+        """
+        self._stopped.set()
+        self._wake.set()
+
+    def is_stopped(self) -> bool:
+        return self._stopped.is_set()
@@ -1,52 +1,57 @@
 import random
-from copy import deepcopy, copy
-from math import inf
+from copy import deepcopy
 
 import numpy as np
-import tensorflow as tf
-from tensorflow import keras
+
+import numpy_net
+import row_tables
+import stats
 
 # Learning rate
 ALPHA = 0.001
 # Size of the game board
 SIZE = 4
-# Value vectors for q-learning
+# Value function approximaters: "numpy" evaluates the networks with NumPy (see numpy_net.py) and never imports
+# TensorFlow, "keras" loads the keras models, which is needed for training
+BACKENDS = ("numpy", "keras")
+BACKEND = "numpy"
+# Value function approximaters, loaded on first use by get_theta()
 THETA = None
 
 
-def setup(parametrize=False):
+def setup(parametrize=False, backend=None):
+    """
+    Loads the value function approximaters into THETA
+    Args:
+        parametrize: Use linear value functions instead of networks
+        backend: One of BACKENDS (default None keeps BACKEND)
+
+    Returns: None
+
+    """
+    global BACKEND, THETA
+    if backend is not None:
+        if backend not in BACKENDS:
+            raise ValueError("Unknown backend " + str(backend))
+        BACKEND = backend
     if parametrize:
         THETA = np.array(
             [np.random.random((16,)), np.random.random((16,)), np.random.random((16,)), np.random.random((16,))])
+    elif BACKEND == "numpy":
+        THETA = numpy_net.load_value_net()
     else:
         # Use tf models instead
-        try:
-            # Load models from disk if possible
-            THETA = [keras.models.load_model("tf_model0.h5"), keras.models.load_model("tf_model1.h5"),
-                     keras.models.load_model("tf_model2.h5"), keras.models.load_model("tf_model3.h5")]
-        except BaseException as e:
-            print("\n\n!======== UNABLE TO LOAD MODELS - CREATING MODELS... ==========!\n\n")
-            model1 = keras.Sequential([
-                keras.layers.Dense(4, activation='relu', input_shape=(16,)),
-                keras.layers.Dense(1)
-            ])
-            model2 = keras.Sequential([
-                keras.layers.Dense(4, activation='relu', input_shape=(16,)),
-                keras.layers.Dense(1)
-            ])
-            model3 = keras.Sequential([
-                keras.layers.Dense(4, activation='relu', input_shape=(16,)),
-                keras.layers.Dense(1)
-            ])
-            model4 = keras.Sequential([
-                keras.layers.Dense(4, activation='relu', input_shape=(16,)),
-                keras.layers.Dense(1)
-            ])
-
-            THETA = np.array([model1, model2, model3, model4])
-
-            for model in THETA:
-                model.compile(optimizer='SGD', loss=tf.keras.losses.Hinge(), metrics=['accuracy'])
+        import value_net
+        THETA = value_net.load_models()
+
+
+def get_theta():
+    """
+    Returns: The value function approximaters, loading them the first time they're needed
+    """
+    if THETA is None:
+        setup()
+    return THETA
 
 
 def is_terminal(state) -> bool:
@@ -54,14 +59,22 @@ def is_terminal(state) -> bool:
     Checks if game has ended. Pure function.
     Returns: bool indicating whether or not game has ended.
     """
-    end = True
-    for i in range(SIZE ** 2):
-        end = not ((state[i] == 0) or (
-                (i + 1) % SIZE != 0 and state[i] == state[i + 1]) or (
-                           i + SIZE < SIZE ** 2 and state[i] == state[i + SIZE]))
-        if end is False:
-            break
-    return end
+    # Same rule as the table swipes, which don't merge past row_tables.MAX_EXPONENT
+    return not row_tables.legal_batch(np.asarray(state)[None]).any()
+
+
+def spawn_piece(state):
+    """
+    Spawns a piece in the state. A 2 with probability 0.9 and 4 with probability 0.1. Pure function.
+    Returns: State with new piece spawned in it.
+    """
+    arange = range(len(state))
+    n_state = deepcopy(state)
+    avail = [x for x in arange if state[x] == 0]
+    if not avail:
+        return state
+    n_state[random.choice(avail)] = np.random.choice([1, 2], p=[0.9, 0.1])
+    return n_state
 
 
 def evaluate(state, action):
@@ -74,8 +87,27 @@ def evaluate(state, action):
     Returns: Estimated value
 
     """
+    theta = get_theta()
+    if isinstance(theta, numpy_net.NumpyValueNet):
+        return theta.predict([state], action)[0]
     # Prediction is nested list
-    return THETA[action].predict(tf.convert_to_tensor([state]))[0][0]
+    return theta[action].predict(np.asarray([state], np.float32), verbose=0)[0][0]
+
+
+def evaluate_moves(state, moves):
+    """
+    Returns the estimated values of several actions from the same state
+    Args:
+        state: Game state
+        moves: Actions to evaluate
+
+    Returns: Array of estimated values, one per action in moves
+
+    """
+    theta = get_theta()
+    if isinstance(theta, numpy_net.NumpyValueNet):
+        return theta.predict_all([state])[0][moves]
+    return np.array([evaluate(state, i) for i in moves])
 
 
 def compute_afterstate(state, action):
@@ -88,18 +120,11 @@ def compute_afterstate(state, action):
     Returns: Tuple of state after executing action and reward gained by action
 
     """
-    s_prime = deepcopy(state)
-    if action == 0:
-        reward, m = swipe_left(s_prime)
-    elif action == 1:
-        reward, m = swipe_right(s_prime)
-    elif action == 2:
-        reward, m = swipe_up(s_prime)
-    elif action == 3:
-        reward, m = swipe_down(s_prime)
-    else:
+    if action not in (0, 1, 2, 3):
         raise ValueError("Incorrect move")
-    return s_prime, reward
+    s_prime, reward, m = row_tables.swipe(state, action)
+    # Merges are rewarded with the value of the tiles that combined, which is half of the game score
+    return s_prime.astype(state.dtype), reward // 2
 
 
 def make_move(state, action):
@@ -131,7 +156,21 @@ def learn_evaluation(state, action, reward, s_prime, s_dprime):
 
     """
     v_next = np.max([evaluate(s_dprime, i) for i in range(3)])
-    THETA[action].fit(tf.convert_to_tensor([s_prime]), tf.convert_to_tensor([reward + v_next]), verbose=0)
+    THETA[action].fit(np.asarray([s_prime], np.float32), np.asarray([reward + v_next], np.float32), verbose=0)
+
+
+def legal_moves(state):
+    """
+    Computes the afterstate, reward and legality of all four actions in one pass. Pure function.
+    Args:
+        state: Game state
+
+    Returns: Tuple of the 4 afterstates, 4 rewards and a boolean mask of legal actions
+
+    """
+    s_primes, rewards, legal = row_tables.afterstates(state)
+    # Merges are rewarded with the value of the tiles that combined, which is half of the game score
+    return s_primes.astype(state.dtype), rewards // 2, legal
 
 
 def get_moves(state):
@@ -143,29 +182,18 @@ def get_moves(state):
     Returns: List of legal moves
 
     """
-    s1 = copy(state)
-    s2 = copy(state)
-    s3 = copy(state)
-    s4 = copy(state)
-    actions = []
-    if swipe_left(s1)[1] * 1 == 1:
-        actions.append(0)
-    if swipe_right(s2)[1] * 1 == 1:
-        actions.append(1)
-    if swipe_up(s3)[1] * 1 == 1:
-        actions.append(2)
-    if swipe_down(s4)[1] * 1 == 1:
-        actions.append(3)
-    return actions
+    return list(np.flatnonzero(legal_moves(state)[2]))
 
 
-def play_game():
+def play_game(learning_enabled=False):
     """
     Plays the game. Can optionally enable training of the value function approximater
-    Returns: Final score
+    Args:
+        learning_enabled: Train the value function approximater after every move (needs keras models)
+
+    Returns: Tuple of the final score and the final state
 
     """
-    learning_enabled = False
     score = 0
     # Init
     state = np.zeros(16)
@@ -173,25 +201,20 @@ def play_game():
     # While not terminal
     while not is_terminal(state):
         # argmax
-        max_val = -inf
-        action = -1
-        moves = get_moves(state)
-        assert moves != []
-        for i in moves:
-            ret = evaluate(state, i)
-            if ret > max_val:
-                max_val = ret
-                action = i
-        # Make move
-        assert action != -1
-        reward, s_prime, s_dprime = make_move(state, action)
+        s_primes, rewards, legal = legal_moves(state)
+        moves = np.flatnonzero(legal)
+        assert len(moves) != 0
+        action = moves[np.argmax(evaluate_moves(state, moves))]
+        # Make move from the precomputed afterstate
+        reward, s_prime = rewards[action], s_primes[action]
+        s_dprime = spawn_piece(s_prime)
         # Train value approximater
         if learning_enabled:
             learn_evaluation(state, action, reward, s_prime, s_dprime)
         score += reward
         # Advance state
         state = s_dprime
-    return score
+    return score, state
 
 
 def main():
@@ -202,20 +225,23 @@ def main():
 
     """
     learning = False
-    scores = np.zeros(10000)
+    # Evaluation only runs don't need TensorFlow
+    setup(backend="keras" if learning else "numpy")
+    scores = stats.ScoreStats()
     for x in range(10000):
         try:
-            ret_score = play_game()
+            ret_score, final_state = play_game(learning)
             print("Game: ", x, " Score: ", ret_score)
-            scores[x] = ret_score
+            scores.add(ret_score, 2 ** int(np.max(final_state)))
         except BaseException as er:
             print(er)
+            print(scores)
             if learning:
                 for i in range(len(THETA)):
                     THETA[i].save("tf_model" + str(i) + ".h5")
             return
-    print("Max: ", np.max(scores), " Min: ", np.min(scores), " Avg: ", np.average(scores))
-    print("STDEV: ", np.std(scores), " Median: ", np.median(scores))
+    print(scores)
+    print("Reached: ", scores.reached())
     if learning:
         # print("Saving model at game "+str(x))
         for i in range(len(THETA)):
@@ -0,0 +1,180 @@
+"""
+file: replay.py
+copyright: Owen Siljander 2021
+"""
+
+import numpy as np
+
+from sum_tree import SumTree
+
+# Number of board cells
+CELLS = 16
+
+
+class ReplayBuffer:
+    """
+    Fixed size ring buffer of (state, action, reward, afterstate, next state) transitions. Boards are stored as uint8
+    tile exponents in preallocated arrays, so the memory footprint is fixed (about 50 bytes per transition) and does
+    not grow with the number of games played. Once full, the oldest transitions are overwritten.
+    """
+    def __init__(self, capacity: int, seed=None):
+        """
+        Initializer for the replay buffer
+        Args:
+            capacity: Maximum number of transitions stored, must be greater than 0
+            seed: Seed for minibatch sampling (default None for a fresh seed)
+        """
+        if capacity <= 0:
+            raise ValueError("Replay buffer capacity must be positive")
+        self._capacity = capacity
+        self._states = np.zeros((capacity, CELLS), np.uint8)
+        self._actions = np.zeros(capacity, np.uint8)
+        self._rewards = np.zeros(capacity, np.float32)
+        self._afterstates = np.zeros((capacity, CELLS), np.uint8)
+        self._next_states = np.zeros((capacity, CELLS), np.uint8)
+        # Position of the next write and number of valid transitions
+        self._pos = 0
+        self._size = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, state, action, reward, s_prime, s_dprime) -> int:
+        """
+        Stores one transition
+        Args:
+            state: Game state
+            action: Action taken from state
+            reward: Reward for taking action from state
+            s_prime: State after action but before random tile generation
+            s_dprime: Final state after action
+
+        Returns: Index the transition was stored at
+
+        """
+        idx = self._pos
+        self._states[idx] = state
+        self._actions[idx] = action
+        self._rewards[idx] = reward
+        self._afterstates[idx] = s_prime
+        self._next_states[idx] = s_dprime
+        self._pos = (self._pos + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+        return idx
+
+    def add_batch(self, states, actions, rewards, s_primes, s_dprimes):
+        """
+        Stores several transitions at once (e.g. one step of a VecBoard)
+        Returns: Array of the indices the transitions were stored at
+        """
+        idx = (self._pos + np.arange(len(actions))) % self._capacity
+        self._states[idx] = states
+        self._actions[idx] = actions
+        self._rewards[idx] = rewards
+        self._afterstates[idx] = s_primes
+        self._next_states[idx] = s_dprimes
+        self._pos = (self._pos + len(actions)) % self._capacity
+        self._size = min(self._size + len(actions), self._capacity)
+        return idx
+
+    def get(self, idx):
+        """
+        Gathers transitions by index
+        Args:
+            idx: Array of transition indices
+
+        Returns: Tuple of states, actions, rewards, afterstates and next states
+
+        """
+        return (self._states[idx], self._actions[idx], self._rewards[idx], self._afterstates[idx],
+                self._next_states[idx])
+
+    def sample(self, batch_size: int):
+        """
+        Samples a minibatch uniformly (with replacement)
+        Args:
+            batch_size: Number of transitions
+
+        Returns: Tuple of states, actions, rewards, afterstates and next states
+
+        """
+        if self._size == 0:
+            raise ValueError("Cannot sample from an empty replay buffer")
+        return self.get(self._rng.integers(0, self._size, batch_size))
+
+    def get_capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        return self._size
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    Replay buffer that samples transitions in proportion to their TD error (raised to alpha) instead of uniformly.
+    Priorities live in a sum tree, so sampling and priority updates stay O(log n) with millions of transitions. New
+    transitions get the largest priority seen so far so each is replayed at least once soon after it's stored.
+    """
+    def __init__(self, capacity: int, alpha: float = 0.6, beta: float = 0.4, epsilon: float = 1e-3, seed=None):
+        """
+        Initializer for the prioritized replay buffer
+        Args:
+            capacity: Maximum number of transitions stored, must be greater than 0
+            alpha: How strongly TD error skews sampling (0 is uniform)
+            beta: Importance sampling correction strength (1 fully corrects the sampling bias)
+            epsilon: Added to every TD error so no transition stops being sampled
+            seed: Seed for minibatch sampling (default None for a fresh seed)
+        """
+        super().__init__(capacity, seed)
+        self._tree = SumTree(capacity)
+        self._alpha = alpha
+        self._beta = beta
+        self._epsilon = epsilon
+        self._max_priority = 1.0
+
+    def add(self, state, action, reward, s_prime, s_dprime) -> int:
+        idx = super().add(state, action, reward, s_prime, s_dprime)
+        self._tree.update(idx, self._max_priority)
+        return idx
+
+    def add_batch(self, states, actions, rewards, s_primes, s_dprimes):
+        idx = super().add_batch(states, actions, rewards, s_primes, s_dprimes)
+        self._tree.update(idx, np.full(len(idx), self._max_priority))
+        return idx
+
+    def sample(self, batch_size: int):
+        """
+        Samples a minibatch in proportion to priority. The priority range is split into batch_size equal segments
+        with one sample drawn from each, which keeps a batch from piling onto a single large priority.
+        Args:
+            batch_size: Number of transitions
+
+        Returns: Tuple of states, actions, rewards, afterstates, next states, transition indices (for
+            update_priorities) and importance sampling weights (normalized so the largest is 1)
+
+        """
+        if self._size == 0:
+            raise ValueError("Cannot sample from an empty replay buffer")
+        total = self._tree.total()
+        segment = total / batch_size
+        values = (np.arange(batch_size) + self._rng.random(batch_size)) * segment
+        idx = np.minimum(self._tree.find(values), self._size - 1)
+        probs = self._tree.get(idx) / total
+        weights = (self._size * probs) ** -self._beta
+        weights /= weights.max()
+        return self.get(idx) + (idx, weights.astype(np.float32))
+
+    def update_priorities(self, idx, td_errors):
+        """
+        Sets the priorities of sampled transitions from their new TD errors
+        Args:
+            idx: Transition indices returned by sample
+            td_errors: TD error of each transition
+        """
+        priorities = (np.abs(td_errors) + self._epsilon) ** self._alpha
+        self._max_priority = max(self._max_priority, float(priorities.max()))
+        self._tree.update(idx, priorities)
+
+    def set_beta(self, beta: float):
+        """
+        Sets the importance sampling correction strength, usually annealed towards 1 over training
+        """
+        self._beta = beta
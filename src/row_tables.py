@@ -0,0 +1,286 @@
+"""
+file: row_tables.py
+copyright: Owen Siljander 2021
+"""
+
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+# A 4 cell row with 4 bits per tile exponent has 2 ** 16 possible values
+ROW_COUNT = 1 << 16
+# Board side length the tables apply to
+TABLE_SIZE = 4
+# Largest exponent a nibble can hold (32768 tile)
+MAX_EXPONENT = 15
+# Bump when the table layout or merge rules change so stale cache files get rebuilt
+TABLE_VERSION = 1
+# Tables are cached next to this file unless overridden
+TABLE_FILE = os.environ.get("ROW_TABLES_FILE",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "row_tables.npz"))
+# Multiplying a row of 4 exponents by this gives its packed row index (leftmost cell in the lowest nibble)
+ROW_WEIGHTS = np.array([1, 16, 256, 4096], np.int64)
+
+_TABLES = None
+
+
+def slide_row(row: int):
+    """
+    Slides and merges a single packed row to the left. Same rules as Board._combiner, except merges that would
+    overflow a nibble are not performed.
+    Args:
+        row: Packed row, leftmost cell in the lowest nibble
+
+    Returns: Tuple of the resulting packed row and the score gained by merging
+
+    """
+    tiles = [(row >> (4 * i)) & 0xF for i in range(TABLE_SIZE)]
+    tiles = [t for t in tiles if t != 0]
+    result = []
+    reward = 0
+    i = 0
+    while i < len(tiles):
+        if i + 1 < len(tiles) and tiles[i] == tiles[i + 1] and tiles[i] < MAX_EXPONENT:
+            result.append(tiles[i] + 1)
+            reward += 2 ** (tiles[i] + 1)
+            i += 2
+        else:
+            result.append(tiles[i])
+            i += 1
+    new_row = 0
+    for j, val in enumerate(result):
+        new_row |= val << (4 * j)
+    return new_row, reward
+
+
+def reverse_rows(rows):
+    """
+    Mirrors packed rows so that the leftmost cell becomes the rightmost. Works on ints and integer arrays.
+    """
+    return ((rows >> 12) | ((rows >> 4) & 0x00F0) | ((rows << 4) & 0x0F00) | (rows << 12)) & 0xFFFF
+
+
+def build_tables():
+    """
+    Computes the left and right transition of every possible row.
+    Returns: Dictionary of table name to array
+
+    """
+    left_row = np.zeros(ROW_COUNT, np.uint16)
+    left_reward = np.zeros(ROW_COUNT, np.uint32)
+    for row in range(ROW_COUNT):
+        left_row[row], left_reward[row] = slide_row(row)
+    rows = np.arange(ROW_COUNT, dtype=np.int64)
+    # Sliding right is sliding the mirrored row left and mirroring the result back
+    mirrored = reverse_rows(rows)
+    right_row = reverse_rows(left_row[mirrored].astype(np.int64)).astype(np.uint16)
+    right_reward = left_reward[mirrored]
+    return {
+        "version": np.array(TABLE_VERSION),
+        "left_row": left_row,
+        "left_reward": left_reward,
+        "left_moved": left_row != rows,
+        "right_row": right_row,
+        "right_reward": right_reward,
+        "right_moved": right_row != rows,
+    }
+
+
+class RowTables:
+    """
+    Row transition tables for both directions. Each table is indexed by packed row. Vertical moves use the same tables
+    on the transposed board (up is left, down is right).
+    """
+    def __init__(self, arrays):
+        self.left_row = arrays["left_row"]
+        self.left_reward = arrays["left_reward"]
+        self.left_moved = arrays["left_moved"]
+        self.right_row = arrays["right_row"]
+        self.right_reward = arrays["right_reward"]
+        self.right_moved = arrays["right_moved"]
+        # Unpacked result rows, so flat exponent boards can be updated without bit twiddling
+        shifts = np.array([0, 4, 8, 12])
+        self.left_cells = ((self.left_row[:, None] >> shifts) & 0xF).astype(np.uint8)
+        self.right_cells = ((self.right_row[:, None] >> shifts) & 0xF).astype(np.uint8)
+        # Both directions stacked (0 left, 1 right) so batches with mixed actions index once
+        self.cells = np.stack([self.left_cells, self.right_cells])
+        self.reward = np.stack([self.left_reward, self.right_reward])
+        self.moved = np.stack([self.left_moved, self.right_moved])
+        # Plain lists are much faster than arrays when indexed with Python ints (see bitboard.py)
+        self.left_row_list = self.left_row.tolist()
+        self.left_reward_list = self.left_reward.tolist()
+        self.right_row_list = self.right_row.tolist()
+        self.right_reward_list = self.right_reward.tolist()
+
+    def direction(self, action: int):
+        """
+        Args:
+            action: Action [0-3] (left, right, up, down)
+
+        Returns: Tuple of result cell, reward and moved tables for the row direction of the action
+
+        """
+        if action == 0 or action == 2:
+            return self.left_cells, self.left_reward, self.left_moved
+        return self.right_cells, self.right_reward, self.right_moved
+
+
+def save_tables(arrays, path: str = TABLE_FILE):
+    """
+    Writes tables to disk. The file is written to a temporary path first and renamed so readers never see a partial
+    file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_tables(path: str = TABLE_FILE) -> RowTables:
+    """
+    Loads the tables from disk, building (and caching) them if the file is missing or stale.
+    Args:
+        path: Cache file location
+
+    Returns: RowTables
+
+    """
+    try:
+        with np.load(path) as data:
+            if int(data["version"]) != TABLE_VERSION:
+                raise ValueError("Stale row tables")
+            arrays = {key: data[key] for key in data.files}
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        # Missing, stale, truncated or corrupt
+        arrays = build_tables()
+        try:
+            save_tables(arrays, path)
+        except OSError as e:
+            # Read-only checkout, the tables still work from memory
+            print("Unable to cache row tables: ", e)
+    return RowTables(arrays)
+
+
+def get_tables() -> RowTables:
+    """
+    Returns: The process wide tables, loaded on first use.
+    """
+    global _TABLES
+    if _TABLES is None:
+        _TABLES = load_tables()
+    return _TABLES
+
+
+def swipe(state, action: int):
+    """
+    Computes the afterstate of a 4x4 board using four row lookups. Pure function.
+    Args:
+        state: 16 tile exponents (row major)
+        action: Action [0-3] (left, right, up, down)
+
+    Returns: Tuple of the afterstate (uint8 array of 16 exponents), score gained by merging and whether anything moved
+
+    """
+    cells, rewards, moved = get_tables().direction(action)
+    grid = np.asarray(state, np.int64).reshape(TABLE_SIZE, TABLE_SIZE)
+    if action >= 2:
+        grid = grid.T
+    idx = grid @ ROW_WEIGHTS
+    result = cells[idx]
+    if action >= 2:
+        result = result.T
+    return result.reshape(TABLE_SIZE ** 2), int(rewards[idx].sum()), bool(moved[idx].any())
+
+
+def swipe_batch(boards, actions):
+    """
+    Computes the afterstates of a batch of 4x4 boards, each with its own action. Pure function.
+    Args:
+        boards: (N, 16) array of tile exponents
+        actions: (N,) array of actions [0-3] (left, right, up, down)
+
+    Returns: Tuple of the (N, 16) uint8 afterstates, (N,) merge scores and (N,) moved flags
+
+    """
+    tables = get_tables()
+    actions = np.asarray(actions)
+    grids = np.asarray(boards).reshape(-1, TABLE_SIZE, TABLE_SIZE)
+    vertical = (actions >= 2)[:, None, None]
+    grids = np.where(vertical, grids.transpose(0, 2, 1), grids)
+    idx = grids.astype(np.int64) @ ROW_WEIGHTS
+    # Up uses the left tables and down the right ones, so the direction is the low bit of the action
+    direction = (actions & 1)[:, None]
+    result = tables.cells[direction, idx]
+    result = np.where(vertical, result.transpose(0, 2, 1), result)
+    rewards = tables.reward[direction, idx].sum(axis=1, dtype=np.int64)
+    moved = tables.moved[direction, idx].any(axis=1)
+    return result.reshape(-1, TABLE_SIZE ** 2), rewards, moved
+
+
+def afterstates_batch(boards):
+    """
+    Computes the afterstates of all four actions for a batch of 4x4 boards in one pass. Pure function.
+    Args:
+        boards: (N, 16) array of tile exponents
+
+    Returns: Tuple of the (N, 4, 16) uint8 afterstates, (N, 4) merge scores and (N, 4) legal move mask, with actions
+        ordered left, right, up, down
+
+    """
+    tables = get_tables()
+    n = len(boards)
+    row_idx, col_idx = _line_indices(boards)
+    s_prime = np.empty((n, 4, TABLE_SIZE, TABLE_SIZE), np.uint8)
+    s_prime[:, 0] = tables.left_cells[row_idx]
+    s_prime[:, 1] = tables.right_cells[row_idx]
+    s_prime[:, 2] = tables.left_cells[col_idx].transpose(0, 2, 1)
+    s_prime[:, 3] = tables.right_cells[col_idx].transpose(0, 2, 1)
+    rewards = np.stack([tables.left_reward[row_idx], tables.right_reward[row_idx],
+                        tables.left_reward[col_idx], tables.right_reward[col_idx]], axis=1).sum(axis=2, dtype=np.int64)
+    return s_prime.reshape(n, 4, TABLE_SIZE ** 2), rewards, _legal(tables, row_idx, col_idx)
+
+
+def _line_indices(boards):
+    """
+    Returns: Tuple of the (N, 4) table indices of the rows and of the columns of a batch of 4x4 boards
+    """
+    grids = np.asarray(boards).reshape(-1, TABLE_SIZE, TABLE_SIZE).astype(np.int64)
+    return grids @ ROW_WEIGHTS, grids.transpose(0, 2, 1) @ ROW_WEIGHTS
+
+
+def _legal(tables, row_idx, col_idx):
+    return np.stack([tables.left_moved[row_idx], tables.right_moved[row_idx],
+                     tables.left_moved[col_idx], tables.right_moved[col_idx]], axis=1).any(axis=2)
+
+
+def legal_batch(boards):
+    """
+    Finds the legal moves of a batch of 4x4 boards without building the afterstates. Pure function.
+    A move is legal exactly when its table swipe changes the board, so a board is terminal when none is.
+    Args:
+        boards: (N, 16) array of tile exponents
+
+    Returns: (N, 4) legal move mask, with actions ordered left, right, up, down
+
+    """
+    return _legal(get_tables(), *_line_indices(boards))
+
+
+def afterstates(state):
+    """
+    Computes the afterstates of all four actions for one 4x4 board. Pure function.
+    Args:
+        state: 16 tile exponents (row major)
+
+    Returns: Tuple of the (4, 16) uint8 afterstates, (4,) merge scores and (4,) legal move mask
+
+    """
+    s_prime, rewards, legal = afterstates_batch(np.asarray(state)[None])
+    return s_prime[0], rewards[0], legal[0]
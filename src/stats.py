@@ -0,0 +1,174 @@
+"""
+file: stats.py
+copyright: Owen Siljander 2021
+"""
+
+import math
+from collections import Counter
+
+# Quantiles tracked by default
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile with the P-squared algorithm (Jain and Chlamtac, 1985). Keeps five markers
+    whose heights are adjusted with piecewise parabolic interpolation as values arrive, so memory and time per value
+    are constant no matter how many values are added.
+    """
+    def __init__(self, p: float):
+        """
+        Initializer for the estimator
+        Args:
+            p: Quantile to estimate, between 0 and 1
+        """
+        if not 0 <= p <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        self._p = p
+        # Marker heights, actual positions (1 based), desired positions and desired position increments
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float):
+        q = self._heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+        n = self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                        (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                        (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    # Parabolic estimate would break marker order, fall back to linear
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def value(self) -> float:
+        """
+        Returns: Current estimate (exact for fewer than five values, NaN for none)
+        """
+        q = self._heights
+        if not q:
+            return math.nan
+        if len(q) < 5:
+            # Linear interpolation between the sorted values, like numpy.percentile
+            pos = self._p * (len(q) - 1)
+            low = int(pos)
+            high = min(low + 1, len(q) - 1)
+            return q[low] + (q[high] - q[low]) * (pos - low)
+        return q[2]
+
+
+class ScoreStats:
+    """
+    Constant memory statistics of game results: running mean and variance (Welford), min/max, P-squared quantile
+    estimates and a histogram of the largest tile reached. Every value is available at any time during a run.
+    """
+    def __init__(self, quantiles=QUANTILES):
+        """
+        Initializer for the statistics
+        Args:
+            quantiles: Quantiles to estimate, between 0 and 1
+        """
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self._quantiles = {p: P2Quantile(p) for p in quantiles}
+        self.max_tiles = Counter()
+
+    def add(self, score, max_tile: int = None):
+        """
+        Adds the result of one game
+        Args:
+            score: Final score
+            max_tile: Largest tile on the final board (optional)
+        """
+        self.count += 1
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (score - self.mean)
+        self.min = score if self.min is None else min(self.min, score)
+        self.max = score if self.max is None else max(self.max, score)
+        for estimator in self._quantiles.values():
+            estimator.add(score)
+        if max_tile is not None:
+            self.max_tiles[int(max_tile)] += 1
+
+    def variance(self) -> float:
+        """
+        Returns: Population variance of the scores
+        """
+        return self._m2 / self.count if self.count else math.nan
+
+    def std(self) -> float:
+        return math.sqrt(self.variance())
+
+    def quantile(self, p: float) -> float:
+        """
+        Args:
+            p: One of the tracked quantiles
+
+        Returns: Estimated quantile of the scores
+
+        """
+        if p not in self._quantiles:
+            raise ValueError("Quantile " + str(p) + " is not tracked")
+        return self._quantiles[p].value()
+
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def reached(self):
+        """
+        Returns: Dictionary of tile to the share of games whose largest tile was at least that tile
+        """
+        total = sum(self.max_tiles.values())
+        reached = {}
+        at_least = 0
+        for tile in sorted(self.max_tiles, reverse=True):
+            at_least += self.max_tiles[tile]
+            reached[tile] = at_least / total
+        return dict(sorted(reached.items()))
+
+    def summary(self) -> dict:
+        """
+        Returns: Dictionary of every statistic, e.g. for logging
+        """
+        return {
+            "games": self.count,
+            "avg": self.mean if self.count else math.nan,
+            "std": self.std(),
+            "min": self.min,
+            "max": self.max,
+            "quantiles": {p: self.quantile(p) for p in self._quantiles},
+            "reached": self.reached(),
+        }
+
+    def __str__(self):
+        return "Games: {} Max: {} Min: {} Avg: {:.1f} STDEV: {:.1f} Median: {:.1f}".format(
+            self.count, self.max, self.min, self.mean, self.std(),
+            self.median() if 0.5 in self._quantiles else math.nan)
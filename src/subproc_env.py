@@ -0,0 +1,220 @@
+"""
+file: subproc_env.py
+copyright: Owen Siljander 2021
+"""
+
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from board import Board
+from env import ACTIONS, BoardEnv
+
+
+def buffer_layout(n: int, cells: int):
+    """
+    Arrays shared between the environment and its workers, as (name, dtype, shape)
+    """
+    return [
+        ("actions", np.uint8, (n,)),
+        ("observations", np.uint8, (n, cells)),
+        ("rewards", np.int64, (n,)),
+        ("terminated", np.bool_, (n,)),
+        ("truncated", np.bool_, (n,)),
+        ("moved", np.bool_, (n,)),
+        ("action_mask", np.bool_, (n, ACTIONS)),
+        ("final_observation", np.uint8, (n, cells)),
+        ("final_score", np.int64, (n,)),
+    ]
+
+
+class SharedBuffers:
+    """
+    The arrays of buffer_layout in one shared memory block, each aligned to 8 bytes
+    """
+    def __init__(self, n: int, cells: int, name: str = None):
+        """
+        Initializer for the buffers
+        Args:
+            n: Number of environments
+            cells: Cells per board
+            name: Name of an existing block to attach to (default None creates a new block)
+        """
+        self._n = n
+        self._cells = cells
+        self._owner = name is None
+        layout = buffer_layout(n, cells)
+        offsets = []
+        size = 0
+        for _, dtype, shape in layout:
+            offsets.append(size)
+            size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+        self._shm = shared_memory.SharedMemory(name=name, create=self._owner, size=max(size, 8))
+        self.arrays = {name: np.ndarray(shape, dtype, self._shm.buf, offset)
+                       for (name, dtype, shape), offset in zip(layout, offsets)}
+
+    def __getstate__(self):
+        # Workers attach to the same block by name
+        return {"n": self._n, "cells": self._cells, "name": self._shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["n"], state["cells"], state["name"])
+
+    def close(self):
+        self.arrays = None
+        self._shm.close()
+        # Only the creating process removes the block
+        if self._owner:
+            self._shm.unlink()
+
+
+def worker(conn, buffers: SharedBuffers, start: int, stop: int, size: int, board_cls, max_steps, seed):
+    """
+    Worker process stepping environments start to stop. Commands come through the pipe, all data goes through the
+    shared buffers, and each command is acknowledged once the buffers are written.
+    """
+    rng = np.random.default_rng(seed)
+    envs = [BoardEnv(size, seed=rng.integers(1 << 63), board_cls=board_cls, max_steps=max_steps)
+            for _ in range(start, stop)]
+    a = buffers.arrays
+    try:
+        while True:
+            command = conn.recv()
+            if command == "reset":
+                for i, env in enumerate(envs, start):
+                    a["observations"][i], info = env.reset()
+                    a["action_mask"][i] = info["action_mask"]
+            elif command == "step":
+                for i, env in enumerate(envs, start):
+                    obs, reward, terminated, truncated, info = env.step(int(a["actions"][i]))
+                    a["rewards"][i] = reward
+                    a["terminated"][i] = terminated
+                    a["truncated"][i] = truncated
+                    a["moved"][i] = info["moved"]
+                    if terminated or truncated:
+                        a["final_observation"][i] = obs
+                        a["final_score"][i] = info["score"]
+                        obs, info = env.reset()
+                    a["observations"][i] = obs
+                    a["action_mask"][i] = info["action_mask"]
+            elif command == "close":
+                break
+            conn.send(True)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        a = None
+        buffers.close()
+
+
+class SubprocVecEnv:
+    """
+    Vector environment whose games are split over worker processes, for policies that need per game Python work in
+    the environment. Actions, observations, rewards and flags live in one shared memory block, so a step only sends
+    a short command to each worker instead of pickling arrays. step_async starts a step and returns immediately, so
+    the caller can compute while the workers play; step_wait collects the results.
+    """
+    def __init__(self, n: int, workers: int = None, size: int = 4, seed=None, board_cls=Board, max_steps: int = None):
+        """
+        Initializer for the environment
+        Args:
+            n: Number of games
+            workers: Number of worker processes (default None for one per CPU, at most n)
+            size: Board size
+            seed: Seed for all games (default None for a fresh seed)
+            board_cls: Board class the games are played on
+            max_steps: Steps after which a game is truncated (default None for no limit)
+        """
+        workers = min(n, workers or os.cpu_count() or 1)
+        self.num_envs = n
+        self.observation_shape = (n, size * size)
+        self.num_actions = ACTIONS
+        self._buffers = SharedBuffers(n, size * size)
+        self._waiting = False
+        ctx = mp.get_context("spawn")
+        bounds = np.linspace(0, n, workers + 1).astype(int)
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        self._conns = []
+        self._procs = []
+        for w in range(workers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=worker, args=(child, self._buffers, int(bounds[w]), int(bounds[w + 1]), size,
+                                                    board_cls, max_steps, seeds[w]), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    def _send(self, command):
+        for conn in self._conns:
+            conn.send(command)
+
+    def _wait(self):
+        for conn in self._conns:
+            conn.recv()
+
+    def reset(self):
+        """
+        Starts new games in every environment
+        Returns: Tuple of the (N, cells) observations and an info dictionary (action_mask)
+        """
+        if self._waiting:
+            self.step_wait()
+        self._send("reset")
+        self._wait()
+        a = self._buffers.arrays
+        return a["observations"], {"action_mask": a["action_mask"]}
+
+    def step_async(self, actions):
+        """
+        Starts a move in every game. The actions are copied into shared memory before this returns.
+        Args:
+            actions: (N,) array of actions [0-3]
+        """
+        if self._waiting:
+            raise ValueError("step_wait must be called before the next step_async")
+        self._buffers.arrays["actions"][:] = actions
+        self._send("step")
+        self._waiting = True
+
+    def step_wait(self):
+        """
+        Waits for the step started by step_async
+        Returns: Tuple of the (N, cells) observations, (N,) rewards, (N,) terminated flags, (N,) truncated flags and
+            an info dictionary (action_mask, moved, final_observation, final_score), same as VecBoardEnv.step. All
+            arrays are views of the shared buffers and are overwritten by the next step.
+        """
+        self._wait()
+        self._waiting = False
+        a = self._buffers.arrays
+        info = {name: a[name] for name in ("action_mask", "moved", "final_observation", "final_score")}
+        return a["observations"], a["rewards"], a["terminated"], a["truncated"], info
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def action_masks(self):
+        return self._buffers.arrays["action_mask"]
+
+    def close(self):
+        try:
+            if self._waiting:
+                self.step_wait()
+            self._send("close")
+        except (EOFError, OSError):
+            # A worker already exited
+            pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        for conn in self._conns:
+            conn.close()
+        self._buffers.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,77 @@
+"""
+file: sum_tree.py
+copyright: Owen Siljander 2021
+"""
+
+import numpy as np
+
+
+class SumTree:
+    """
+    Binary segment tree over leaf priorities where every internal node holds the sum of its children. Stored as one
+    flat array (root at index 1, children of node i at 2i and 2i + 1), so updating a priority and finding the leaf
+    at a given prefix sum are both O(log n). Batches of updates and lookups walk all of their paths together, one
+    NumPy operation per tree level.
+    """
+    def __init__(self, capacity: int):
+        """
+        Initializer for the tree
+        Args:
+            capacity: Number of leaves, must be greater than 0
+        """
+        if capacity <= 0:
+            raise ValueError("Sum tree capacity must be positive")
+        self._capacity = capacity
+        # Leaves are padded up to a power of two so every leaf is at the same depth
+        self._leaves = 1 << int(np.ceil(np.log2(capacity))) if capacity > 1 else 1
+        self._depth = int(np.log2(self._leaves))
+        self._tree = np.zeros(2 * self._leaves, np.float64)
+
+    def update(self, idx, priorities):
+        """
+        Sets leaf priorities and recomputes the sums above them
+        Args:
+            idx: Leaf index or array of leaf indices
+            priorities: New priority for each index (non-negative)
+        """
+        nodes = np.atleast_1d(np.asarray(idx, np.int64)) + self._leaves
+        self._tree[nodes] = priorities
+        for _ in range(self._depth):
+            # Recompute parents from both children, so repeated indices in one batch can't double count
+            nodes = np.unique(nodes >> 1)
+            self._tree[nodes] = self._tree[2 * nodes] + self._tree[2 * nodes + 1]
+
+    def find(self, values):
+        """
+        Finds the leaves whose prefix sum ranges contain the given values
+        Args:
+            values: Array of values in [0, total)
+
+        Returns: Array of leaf indices
+
+        """
+        values = np.array(values, np.float64, ndmin=1)
+        nodes = np.ones(len(values), np.int64)
+        for _ in range(self._depth):
+            left = 2 * nodes
+            left_sum = self._tree[left]
+            go_right = values >= left_sum
+            values = np.where(go_right, values - left_sum, values)
+            nodes = np.where(go_right, left + 1, left)
+        # Rounding can push a value just past the last non-empty leaf
+        return np.minimum(nodes - self._leaves, self._capacity - 1)
+
+    def get(self, idx):
+        """
+        Returns: Priorities of the given leaves
+        """
+        return self._tree[np.asarray(idx, np.int64) + self._leaves]
+
+    def total(self) -> float:
+        """
+        Returns: Sum of all priorities
+        """
+        return float(self._tree[1])
+
+    def get_capacity(self):
+        return self._capacity
@@ -0,0 +1,216 @@
+"""
+file: trajectory_dataset.py
+copyright: Owen Siljander 2021
+"""
+
+import json
+import os
+
+import numpy as np
+
+import row_tables
+from game_record import read_records
+
+# Bump when the column layout changes
+DATASET_VERSION = 1
+META_FILE = "meta.json"
+# Number of board cells
+CELLS = 16
+# Column name to (dtype, values per transition). Boards are tile exponents, rewards use the scale of q-learn.py
+# (half of the game score).
+COLUMNS = {
+    "states": (np.uint8, CELLS),
+    "actions": (np.uint8, 1),
+    "rewards": (np.int32, 1),
+    "afterstates": (np.uint8, CELLS),
+    "next_states": (np.uint8, CELLS),
+}
+# Transitions buffered by DatasetWriter before a write
+BUFFER_SIZE = 1 << 16
+
+
+def column_file(path: str, name: str) -> str:
+    return os.path.join(path, name + ".bin")
+
+
+def read_meta(path: str) -> dict:
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get("version") != DATASET_VERSION:
+        raise ValueError("Dataset " + path + " is from a different version")
+    return meta
+
+
+def write_meta(path: str, count: int):
+    # Written after the columns and renamed into place, so the count never covers data that isn't on disk
+    tmp_path = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": DATASET_VERSION, "count": count, "columns": list(COLUMNS)}, f)
+    os.replace(tmp_path, os.path.join(path, META_FILE))
+
+
+class DatasetWriter:
+    """
+    Appends transitions to a dataset directory, one raw fixed width file per column. Transitions are buffered and
+    written in bulk; the transition count in meta.json is only advanced once the columns are written, so a crash
+    leaves a valid dataset (partial tails are truncated when the dataset is opened for writing again).
+    """
+    def __init__(self, path: str, buffer_size: int = BUFFER_SIZE):
+        """
+        Initializer for the writer
+        Args:
+            path: Dataset directory, created if missing
+            buffer_size: Transitions buffered before a write
+        """
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._count = read_meta(path)["count"] if os.path.exists(os.path.join(path, META_FILE)) else 0
+        self._files = {}
+        for name, (dtype, width) in COLUMNS.items():
+            f = open(column_file(path, name), "ab")
+            f.truncate(self._count * width * np.dtype(dtype).itemsize)
+            self._files[name] = f
+        self._buffer_size = buffer_size
+        self._buffer = {name: [] for name in COLUMNS}
+        self._buffered = 0
+        write_meta(path, self._count)
+
+    def add_batch(self, states, actions, rewards, afterstates, next_states):
+        """
+        Adds transitions (same arguments as ReplayBuffer.add_batch)
+        """
+        values = {"states": states, "actions": actions, "rewards": rewards, "afterstates": afterstates,
+                  "next_states": next_states}
+        for name, (dtype, width) in COLUMNS.items():
+            self._buffer[name].append(np.asarray(values[name], dtype).reshape(-1, width))
+        self._buffered += len(actions)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def add(self, state, action, reward, afterstate, next_state):
+        self.add_batch([state], [action], [reward], [afterstate], [next_state])
+
+    def flush(self):
+        if not self._buffered:
+            return
+        for name, f in self._files.items():
+            np.concatenate(self._buffer[name]).tofile(f)
+            f.flush()
+            self._buffer[name] = []
+        self._count += self._buffered
+        self._buffered = 0
+        write_meta(self._path, self._count)
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+    def __len__(self):
+        return self._count + self._buffered
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryDataset:
+    """
+    Read-only view of a dataset directory. Every column is a numpy memmap, so the dataset doesn't need to fit in
+    memory and batches are sliced straight out of the page cache without any per transition decoding.
+    """
+    def __init__(self, path: str):
+        """
+        Initializer for the dataset
+        Args:
+            path: Dataset directory written by DatasetWriter
+        """
+        self._count = read_meta(path)["count"]
+        self.columns = {}
+        for name, (dtype, width) in COLUMNS.items():
+            if self._count == 0:
+                # Empty files can't be memory mapped
+                self.columns[name] = np.zeros((0, width), dtype)
+            else:
+                self.columns[name] = np.memmap(column_file(path, name), dtype, "r", shape=(self._count, width))
+
+    def get(self, idx):
+        """
+        Gathers transitions
+        Args:
+            idx: Slice (returns views) or index array (returns copies)
+
+        Returns: Tuple of states, actions, rewards, afterstates and next states
+
+        """
+        c = self.columns
+        return (c["states"][idx], c["actions"][idx, 0], c["rewards"][idx, 0], c["afterstates"][idx],
+                c["next_states"][idx])
+
+    def batches(self, batch_size: int, shuffle: bool = True, seed=None, contiguous: bool = True):
+        """
+        Iterates over the dataset once in minibatches
+        Args:
+            batch_size: Transitions per batch
+            shuffle: Visit batches in random order
+            seed: Seed for shuffling
+            contiguous: Batches are consecutive transitions returned as zero-copy views and only the batch order is
+                shuffled. If False, every batch is a random sample gathered with one fancy index per column (a copy,
+                but still no per transition Python work), which decorrelates the transitions within a batch.
+
+        Returns: Generator of (states, actions, rewards, afterstates, next states) tuples
+
+        """
+        rng = np.random.default_rng(seed)
+        starts = np.arange(0, self._count, batch_size)
+        if not contiguous:
+            order = rng.permutation(self._count) if shuffle else np.arange(self._count)
+            for start in starts:
+                # Sorted indices read the memmap front to back
+                yield self.get(np.sort(order[start:start + batch_size]))
+            return
+        if shuffle:
+            rng.shuffle(starts)
+        for start in starts:
+            yield self.get(slice(start, start + batch_size))
+
+    def __len__(self):
+        return self._count
+
+
+def record_transitions(record):
+    """
+    Recreates the transitions of a recorded game
+    Args:
+        record: GameRecord
+
+    Returns: Tuple of states, actions, rewards (q-learn.py scale), afterstates and next states arrays
+
+    """
+    board = record.replay_board()
+    swipes = [board.swipe_left, board.swipe_right, board.swipe_up, board.swipe_down]
+    states = np.zeros((len(record.actions) + 1, CELLS), np.uint8)
+    states[0] = board.get_board_data()
+    for i, action in enumerate(record.actions):
+        swipes[action]()
+        states[i + 1] = board.get_board_data()
+    afterstates, rewards, _ = row_tables.swipe_batch(states[:-1], record.actions)
+    return states[:-1], record.actions, rewards // 2, afterstates, states[1:]
+
+
+def convert_records(records_path: str, path: str):
+    """
+    Builds a dataset from a game record file (see game_record.py)
+    Args:
+        records_path: Game record file
+        path: Dataset directory, appended to if it exists
+
+    Returns: Number of transitions in the dataset
+
+    """
+    with DatasetWriter(path) as writer:
+        for record in read_records(records_path):
+            writer.add_batch(*record_transitions(record))
+        return len(writer)
@@ -0,0 +1,146 @@
+"""
+file: value_net.py
+copyright: Owen Siljander 2021
+"""
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+# Number of actions (left, right, up, down)
+ACTIONS = 4
+# Number of board cells fed to the networks
+INPUTS = 16
+# Hidden units of each action network
+HIDDEN = 4
+# One network per action
+MODEL_FILES = ["tf_model0.h5", "tf_model1.h5", "tf_model2.h5", "tf_model3.h5"]
+# All four action networks as the heads of one model
+MULTIHEAD_FILE = "tf_model.h5"
+
+
+def build_model():
+    """
+    Builds the value network of a single action
+    Returns: Compiled keras model
+    """
+    model = keras.Sequential([
+        keras.layers.Dense(HIDDEN, activation='relu', input_shape=(INPUTS,)),
+        keras.layers.Dense(1)
+    ])
+    model.compile(optimizer='SGD', loss=tf.keras.losses.Hinge(), metrics=['accuracy'])
+    return model
+
+
+def load_models(files=MODEL_FILES):
+    """
+    Loads the per action value networks from disk, creating new ones if any of them can't be loaded
+    Args:
+        files: One model file per action
+
+    Returns: List of keras models, indexed by action
+
+    """
+    try:
+        return [keras.models.load_model(f) for f in files]
+    except BaseException as e:
+        print("\n\n!======== UNABLE TO LOAD MODELS - CREATING MODELS... ==========!\n\n")
+        return [build_model() for _ in range(ACTIONS)]
+
+
+def build_multihead_model():
+    """
+    Builds one model holding the four action networks side by side. Each head has the same Dense(4) -> Dense(1)
+    layout as build_model and only sees its own layers, so the heads train exactly like separate networks but are
+    all evaluated in one call.
+    Returns: Compiled keras model with one output per action
+    """
+    inputs = keras.Input(shape=(INPUTS,))
+    outputs = []
+    for a in range(ACTIONS):
+        hidden = keras.layers.Dense(HIDDEN, activation='relu', name="hidden" + str(a))(inputs)
+        outputs.append(keras.layers.Dense(1, name="value" + str(a))(hidden))
+    return compile_multihead_model(keras.Model(inputs=inputs, outputs=outputs))
+
+
+def compile_multihead_model(model):
+    """
+    Compiles a multi-head model with one loss per head
+    Returns: The compiled model
+    """
+    model.compile(optimizer='SGD', loss=[tf.keras.losses.Hinge() for _ in range(ACTIONS)])
+    return model
+
+
+def convert_models(models):
+    """
+    Copies the weights of the per action networks into the heads of a multi-head model
+    Args:
+        models: List of per action keras models (see build_model)
+
+    Returns: Multi-head keras model
+
+    """
+    multihead = build_multihead_model()
+    for a, model in enumerate(models):
+        multihead.get_layer("hidden" + str(a)).set_weights(model.layers[0].get_weights())
+        multihead.get_layer("value" + str(a)).set_weights(model.layers[1].get_weights())
+    return multihead
+
+
+def load_multihead_model(path: str = MULTIHEAD_FILE, files=MODEL_FILES):
+    """
+    Loads the multi-head model, converting it from the per action model files if it hasn't been saved yet
+    Args:
+        path: Multi-head model file
+        files: Per action model files to fall back to
+
+    Returns: Multi-head keras model
+
+    """
+    try:
+        # Recompiled instead of restoring the saved optimizer, which not every keras version can keep training with
+        return compile_multihead_model(keras.models.load_model(path, compile=False))
+    except BaseException as e:
+        return convert_models(load_models(files))
+
+
+def predict_all(model, states):
+    """
+    Estimates the value of every action for a batch of states in one forward pass
+    Args:
+        model: Multi-head keras model
+        states: Batch of game states
+
+    Returns: (N, 4) array of estimated values
+
+    """
+    heads = model.predict_on_batch(np.asarray(states, np.float32))
+    return np.hstack([np.asarray(h) for h in heads])
+
+
+def fit_actions(model, states, actions, targets, sample_weight=None):
+    """
+    Trains the heads of the taken actions towards their targets. Heads of other actions get zero sample weight, so
+    every head is only trained on its own samples.
+    Args:
+        model: Multi-head keras model
+        states: Batch of inputs (afterstates in q-learn.py)
+        actions: Action taken for each input
+        targets: Target value for each input
+        sample_weight: Optional weight of each input (e.g. importance sampling weights)
+
+    Returns: None
+
+    """
+    states = np.asarray(states, np.float32)
+    actions = np.asarray(actions)
+    targets = np.asarray(targets, np.float32).reshape(-1, 1)
+    scale = np.ones(len(actions), np.float32) if sample_weight is None else np.asarray(sample_weight, np.float32)
+    weights = [(actions == a).astype(np.float32) * scale for a in range(ACTIONS)]
+    model.train_on_batch(states, [targets] * ACTIONS, sample_weight=weights)
+
+
+if __name__ == "__main__":
+    # Converts the per action models in the working directory into a multi-head model
+    convert_models(load_models()).save(MULTIHEAD_FILE)
@@ -0,0 +1,143 @@
+"""
+file: vec_board.py
+copyright: Owen Siljander 2021
+"""
+
+import numpy as np
+
+from row_tables import TABLE_SIZE, afterstates_batch, legal_batch, swipe_batch
+
+CELLS = TABLE_SIZE ** 2
+
+
+def batch_is_terminal(boards):
+    """
+    Checks which games of a batch have ended. Pure function.
+    Args:
+        boards: (N, 16) array of tile exponents
+
+    Returns: (N,) bool array, True where no move is possible
+    """
+    return ~legal_batch(boards).any(axis=1)
+
+
+class VecBoard:
+    """
+    N independent 4x4 games stored as one (N, 16) uint8 array of tile exponents. Every step moves all games at once
+    with NumPy operations, and games that end are recorded and restarted automatically.
+    """
+    def __init__(self, n: int, seed=None):
+        """
+        Initializer for the batch of games
+        Args:
+            n: Number of games played in parallel, must be greater than 0
+            seed: Seed for the spawn RNG (default None for a fresh seed)
+        """
+        if n <= 0:
+            raise ValueError("Number of games must be positive")
+        self._rng = np.random.default_rng(seed)
+        self._boards = np.zeros((n, CELLS), np.uint8)
+        self._scores = np.zeros(n, np.int64)
+        self._moves = np.zeros(n, np.int64)
+        # Results of the games that ended on the last step (only valid where the returned done flag is set)
+        self.final_scores = np.zeros(n, np.int64)
+        self.final_moves = np.zeros(n, np.int64)
+        self.final_max_tiles = np.zeros(n, np.uint8)
+        self.final_boards = np.zeros((n, CELLS), np.uint8)
+        self._spawn_pieces(np.arange(n))
+
+    def _spawn_pieces(self, idx):
+        """
+        Spawns one piece on each of the given boards. A 2 with probability 0.9 and 4 with probability 0.1
+        Args:
+            idx: Indices of the boards to spawn on. Each must have at least one empty cell.
+        """
+        if len(idx) == 0:
+            return
+        boards = self._boards[idx]
+        # Random key per cell with filled cells pushed below every empty one, so argmax is a uniform empty cell
+        keys = self._rng.random((len(idx), CELLS))
+        keys[boards != 0] = -1
+        pos = keys.argmax(axis=1)
+        self._boards[idx, pos] = np.where(self._rng.random(len(idx)) < 0.9, 1, 2)
+
+    def reset(self, idx=None):
+        """
+        Restarts games
+        Args:
+            idx: Indices of the games to restart (default None restarts all of them)
+        """
+        if idx is None:
+            idx = np.arange(len(self._boards))
+        self._boards[idx] = 0
+        self._scores[idx] = 0
+        self._moves[idx] = 0
+        self._spawn_pieces(idx)
+
+    def step(self, actions):
+        """
+        Makes one move in every game. Games where the action does not move anything are left unchanged.
+        Args:
+            actions: (N,) array of actions [0-3] (left, right, up, down)
+
+        Returns: Tuple of (N,) rewards, (N,) moved flags and (N,) done flags. Games flagged done have already been
+            restarted; their results are in final_scores, final_moves, final_max_tiles and final_boards.
+
+        """
+        s_prime, rewards, moved = swipe_batch(self._boards, actions)
+        self._boards[moved] = s_prime[moved]
+        self._spawn_pieces(np.flatnonzero(moved))
+        self._scores += rewards
+        self._moves += moved
+        dones = batch_is_terminal(self._boards)
+        done_idx = np.flatnonzero(dones)
+        if len(done_idx):
+            self.final_scores[done_idx] = self._scores[done_idx]
+            self.final_moves[done_idx] = self._moves[done_idx]
+            self.final_max_tiles[done_idx] = self._boards[done_idx].max(axis=1)
+            self.final_boards[done_idx] = self._boards[done_idx]
+            self.reset(done_idx)
+        return rewards, moved, dones
+
+    def play(self, policy, games: int):
+        """
+        Plays until a number of games have finished. Illegal actions leave a game unchanged, so the policy has to pick
+        a legal move eventually (e.g. random or masked) for every game to end.
+        Args:
+            policy: Callable mapping the (N, 16) boards to an (N,) array of actions
+            games: Number of finished games to collect
+
+        Returns: Tuple of final scores, max tile exponents and move counts, one entry per finished game
+
+        """
+        scores, tiles, moves = [], [], []
+        finished = 0
+        while finished < games:
+            rewards, moved, dones = self.step(policy(self._boards))
+            if dones.any():
+                scores.append(self.final_scores[dones])
+                tiles.append(self.final_max_tiles[dones])
+                moves.append(self.final_moves[dones])
+                finished += int(dones.sum())
+        return np.concatenate(scores)[:games], np.concatenate(tiles)[:games], np.concatenate(moves)[:games]
+
+    def legal_moves(self):
+        """
+        Returns: Tuple of the (N, 4, 16) afterstates, (N, 4) rewards and (N, 4) legal move mask of every game
+        """
+        return afterstates_batch(self._boards)
+
+    def get_boards(self):
+        """
+        Returns: The (N, 16) array of tile exponents. This is the live array, not a copy.
+        """
+        return self._boards
+
+    def get_scores(self):
+        """
+        Returns: Scores of the games in progress
+        """
+        return self._scores
+
+    def __len__(self):
+        return len(self._boards)
@@ -0,0 +1,72 @@
+import importlib.util
+import multiprocessing as mp
+import pickle
+import threading
+import unittest
+
+import numpy as np
+
+from src.actor_learner import SharedWeights, actor, learn, receive
+from src.numpy_net import NumpyValueNet
+from src.replay import ReplayBuffer
+
+
+class DeadProcess:
+    exitcode = 1
+
+    def is_alive(self):
+        return False
+
+
+class SharedWeightsTest(unittest.TestCase):
+
+    def test_publish(self):
+        weights = SharedWeights()
+        try:
+            self.assertEqual(0, weights.get_version())
+            net = NumpyValueNet.random(seed=0)
+            weights.write(net.to_flat())
+            # A second handle attached by name (what an actor process gets) sees the same weights
+            reader = pickle.loads(pickle.dumps(weights))
+            flat, version = reader.read()
+            self.assertEqual(2, version)
+            states = np.eye(16)
+            self.assertTrue(np.array_equal(net.predict_all(states), NumpyValueNet.from_flat(flat).predict_all(states)))
+            reader.close()
+        finally:
+            weights.close()
+
+
+class ActorLearnerTest(unittest.TestCase):
+
+    def test_dead_actors(self):
+        transitions = mp.get_context("spawn").Queue()
+        with self.assertRaises(RuntimeError):
+            receive(transitions, [DeadProcess()], timeout=0.01)
+
+    @unittest.skipUnless(importlib.util.find_spec("tensorflow"), "needs tensorflow")
+    def test_actor_and_learner(self):
+        import value_net
+        model = value_net.build_multihead_model()
+        weights = SharedWeights()
+        weights.write(NumpyValueNet.from_keras(model).to_flat())
+        transitions = mp.get_context("spawn").Queue(maxsize=4)
+        stop = threading.Event()
+        # The actor runs on a thread here, it only needs the queue, the event and the shared weights
+        thread = threading.Thread(target=actor, args=(weights, transitions, stop, 4, 0.5, 0))
+        thread.start()
+        try:
+            scores = learn(model, weights, transitions, 6, ReplayBuffer(10000), batch_size=32, push_every=5,
+                           report_every=100)
+            # The learner published new weights after the initial ones
+            self.assertGreater(weights.get_version(), 2)
+        finally:
+            stop.set()
+            thread.join()
+            weights.close()
+        self.assertEqual(6, len(scores))
+        self.assertTrue((scores > 0).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
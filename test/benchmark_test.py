@@ -0,0 +1,31 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.benchmark import BENCHMARKS, compare, load_baseline, run, save_baseline
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_run_and_baseline(self):
+        results = run(["row_tables.swipe", "board.swipe_left"], min_time=0.001, repeat=2, verbose=False)
+        self.assertEqual({"row_tables.swipe", "board.swipe_left"}, set(results))
+        self.assertTrue(all(0 < s < 1 for s in results.values()))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            save_baseline(results, path)
+            self.assertEqual(results, load_baseline(path))
+            with open(path, "w") as f:
+                json.dump({"version": -1, "results": results}, f)
+            self.assertRaises(ValueError, load_baseline, path)
+
+    def test_compare(self):
+        baseline = {"a": 1.0, "b": 1.0, "c": 1.0}
+        regressions = compare({"a": 1.1, "b": 1.5, "d": 9.0}, baseline, threshold=0.2)
+        self.assertEqual([("b", 1.0, 1.5, 1.5)], regressions)
+
+    def test_registered(self):
+        for name in ["board._combiner", "board.swipe_down", "game.random_agent", "game.dr_agent",
+                     "q_learn.play_step_numpy"]:
+            self.assertIn(name, BENCHMARKS)
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from src.bitboard import BitBoard, pack, unpack, transpose, move_left, move_right, move_up, move_down
+from reference_swipe import combiner_swipe
+
+
+class BitBoardTest(unittest.TestCase):
+
+    def test_pack_round_trip(self):
+        state = np.arange(16) % 16
+        self.assertEqual(list(state), list(unpack(pack(state))))
+        grid = np.arange(16).reshape(4, 4)
+        self.assertEqual(list(grid.T.flatten()), list(unpack(transpose(pack(grid.flatten())))))
+
+    def test_moves_match_board(self):
+        rng = np.random.RandomState(0)
+        for _ in range(200):
+            state = rng.choice([0, 0, 1, 1, 2, 3], size=16)
+            for action, move in enumerate([move_left, move_right, move_up, move_down]):
+                expected, score, moved = combiner_swipe(state, action)
+                result, reward = move(pack(state))
+                self.assertEqual(list(expected), list(unpack(result)))
+                self.assertEqual(score, reward)
+                self.assertEqual(moved, result != pack(state))
+
+    def test_game_end(self):
+        b = BitBoard()
+        b._bits = pack([
+            2, 4, 2, 4,
+            4, 2, 4, 2,
+            2, 4, 2, 4,
+            4, 2, 4, 2
+        ])
+        self.assertEqual(True, b.is_terminal())
+        b._bits = pack([
+            2, 4, 2, 4,
+            4, 2, 4, 2,
+            2, 4, 8, 4,
+            4, 2, 8, 2
+        ])
+        self.assertEqual(False, b.is_terminal())
+
+    def test_play(self):
+        b = BitBoard()
+        while not b.is_terminal():
+            b.swipe_down() or b.swipe_right() or b.swipe_left() or b.swipe_up()
+        self.assertGreater(b.get_score(), 0)
+        self.assertEqual(16, np.count_nonzero(b.get_board_data()))
+        snapshot = b.get_snapshot()
+        self.assertEqual(b.get_bits(), snapshot.get_bits())
+        self.assertEqual(b.get_move_count() + 1, snapshot.get_version())
+        np.testing.assert_array_equal(b.get_board_data(), snapshot.get_board_data())
+
+
+if __name__ == '__main__':
+    unittest.main()
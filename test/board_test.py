@@ -1,6 +1,10 @@
 import unittest
 
+import numpy as np
+
 from src.board import Board
+from src.dr_agent import DRAgent
+from src.random_agent import RandomAgent
 
 
 class BoardTest(unittest.TestCase):
@@ -40,6 +44,19 @@ class BoardTest(unittest.TestCase):
         ]
         self.assertEqual(False, b.is_terminal())
 
+    def test_capped_merge_is_terminal(self):
+        # Two 2^15 tiles don't merge, so no swipe moves and the game is over
+        board = [15, 15, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14]
+        b = Board()
+        b._board = np.array(board)
+        self.assertEqual([False] * 4, [b.swipe_left(), b.swipe_right(), b.swipe_up(), b.swipe_down()])
+        self.assertEqual(True, b.is_terminal())
+        # The agents stop instead of retrying moves forever
+        for agent in (RandomAgent, DRAgent):
+            b._board = np.array(board)
+            agent(b).play()
+            self.assertEqual(board, list(b.get_board_data()))
+
     def test_combine(self):
         # Individual checks of squares are needed because of the stochastic elements
         b = Board()
@@ -98,6 +115,31 @@ class BoardTest(unittest.TestCase):
         self.assertEqual(3, b._board[15])
         self.assertEqual(2, b._board[11])
 
+    def test_snapshots(self):
+        for size in (4, 5):
+            b = Board(size, seed=1)
+            first = b.get_snapshot()
+            self.assertEqual(list(b.get_board_data()), list(first.get_board_data()))
+            while not (b.swipe_left() or b.swipe_right() or b.swipe_up() or b.swipe_down()):
+                pass
+            latest = b.get_snapshot()
+            # Published without a copy
+            self.assertIs(b.get_board_data(), latest.get_board_data())
+            self.assertEqual(first.get_version() + 1, latest.get_version())
+            self.assertEqual(1, latest.get_move_count())
+            self.assertEqual(b.get_score(), latest.get_score())
+            # Published snapshots don't follow the board and can't be written to
+            self.assertNotEqual(list(first.get_board_data()), list(latest.get_board_data()))
+            with self.assertRaises(ValueError):
+                latest.get_board_data()[0] = 1
+            data = list(latest.get_board_data())
+            while not (b.swipe_left() or b.swipe_right() or b.swipe_up() or b.swipe_down()):
+                pass
+            self.assertEqual(data, list(latest.get_board_data()))
+            version = b.get_snapshot().get_version()
+            b.reset()
+            self.assertEqual(version + 1, b.get_snapshot().get_version())
+
 
 if __name__ == '__main__':
     unittest.main()
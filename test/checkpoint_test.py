@@ -0,0 +1,80 @@
+import os
+import random
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from src.checkpoint import Checkpointer, load_latest, restore_rng_state, rng_state
+
+# Released by the test to let a blocked checkpoint write finish
+RELEASE = threading.Event()
+
+
+class SlowState:
+    def __reduce__(self):
+        RELEASE.wait(5)
+        return int, (0,)
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def test_resume_latest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpointer = Checkpointer(directory, every_games=10, keep=2)
+            self.assertFalse(checkpointer.due(5))
+            self.assertTrue(checkpointer.due(10))
+            for games in (10, 20, 30):
+                checkpointer.save(games, dict(rng_state(), weights=[np.full(3, games)]))
+            checkpointer.close()
+            # Only the two most recent checkpoints are kept
+            self.assertEqual(2, len(os.listdir(directory)))
+            # A truncated newer file is skipped
+            with open(os.path.join(directory, "checkpoint-0000000040.pkl"), "wb") as f:
+                f.write(b"\x80\x05")
+            state = load_latest(directory)
+            self.assertEqual(30, state["games"])
+            self.assertEqual([30, 30, 30], list(state["weights"][0]))
+
+    def test_async_and_rng(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpointer = Checkpointer(directory, every_games=None, every_seconds=None)
+            self.assertFalse(checkpointer.due(1000))
+            random.seed(1)
+            np.random.seed(1)
+            checkpointer.save_async(7, rng_state())
+            checkpointer.close()
+            expected = (random.random(), np.random.random())
+            restore_rng_state(load_latest(directory))
+            self.assertEqual(expected, (random.random(), np.random.random()))
+
+    def test_skipped_save_stays_due(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpointer = Checkpointer(directory, every_games=10)
+            RELEASE.clear()
+            # The first checkpoint is being written, the second is queued, the third doesn't fit
+            self.assertTrue(checkpointer.save_async(10, {"slow": SlowState()}))
+            checkpointer.save_async(20, {})
+            self.assertFalse(checkpointer.save_async(30, {}))
+            self.assertTrue(checkpointer.due(30))
+            RELEASE.set()
+            checkpointer.close()
+            self.assertTrue(checkpointer.save_async(30, {}))
+            self.assertFalse(checkpointer.due(35))
+            checkpointer.close()
+
+    def test_corrupt_newer_checkpoints(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpointer = Checkpointer(directory)
+            checkpointer.save(10, {"weights": [np.zeros(3)]})
+            checkpointer.close()
+            # Bad protocol (ValueError), missing module (ImportError) and missing class (AttributeError)
+            for games, data in ((20, b"\x80\x09"), (30, b"cnope\nmissing\n."), (40, b"cbuiltins\nnope\n.")):
+                with open(os.path.join(directory, "checkpoint-{:010d}.pkl".format(games)), "wb") as f:
+                    f.write(data)
+            self.assertEqual(10, load_latest(directory)["games"])
+
+    def test_empty(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertIsNone(load_latest(directory))
@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+
+from src.bitboard import BitBoard
+from src.board import Board
+from src.env import BoardEnv, VecBoardEnv, action_masks
+
+
+def brute_force_mask(state, size):
+    # Swipe a copy of the board in every direction and see what changes
+    board = Board(size, seed=0)
+    mask = []
+    for a in range(4):
+        board._board = np.array(state)
+        mask.append([board.swipe_left, board.swipe_right, board.swipe_up, board.swipe_down][a]())
+    return mask
+
+
+class EnvTest(unittest.TestCase):
+
+    def test_action_masks(self):
+        rng = np.random.RandomState(3)
+        for size in (3, 4, 5):
+            boards = rng.randint(0, 4, (200, size * size))
+            # Mostly full boards so that some moves are illegal
+            boards[rng.rand(*boards.shape) < 0.7] += 4
+            masks = action_masks(boards, size)
+            for b, m in zip(boards, masks):
+                self.assertEqual(brute_force_mask(b, size), list(m))
+
+    def test_board_env(self):
+        for board_cls in (Board, BitBoard):
+            env = BoardEnv(seed=0, board_cls=board_cls)
+            obs, info = env.reset()
+            self.assertEqual((16,), obs.shape)
+            total, terminated = 0, False
+            while not terminated:
+                action = int(np.flatnonzero(info["action_mask"])[0])
+                obs, reward, terminated, truncated, info = env.step(action)
+                self.assertTrue(info["moved"])
+                self.assertFalse(truncated)
+                total += reward
+            self.assertEqual(env.get_board().get_score(), total)
+            self.assertTrue(env.get_board().is_terminal())
+        env = BoardEnv(seed=1, max_steps=3)
+        env.reset()
+        truncated = [env.step(s % 4)[3] for s in range(3)]
+        self.assertEqual([False, False, True], truncated)
+
+    def test_vec_env(self):
+        env = VecBoardEnv(32, seed=0, max_steps=50)
+        obs, info = env.reset()
+        rng = np.random.default_rng(0)
+        ended = 0
+        previous = None
+        for _ in range(300):
+            keys = np.where(info["action_mask"], rng.random((32, 4)), -1)
+            obs, rewards, terminated, truncated, info = env.step(np.argmax(keys, axis=1))
+            # Final results handed out earlier aren't overwritten by later steps
+            if previous is not None:
+                np.testing.assert_array_equal(previous[1], previous[0]["final_observation"])
+            previous = info, info["final_observation"].copy()
+            self.assertTrue(info["moved"].all())
+            self.assertFalse((terminated & truncated).any())
+            ended += int((terminated | truncated).sum())
+            # Truncated games hold the board they were stopped at
+            for i in np.flatnonzero(truncated):
+                self.assertGreater(info["final_observation"][i].sum(), 0)
+        # Every game is cut off after 50 steps at the latest
+        self.assertGreaterEqual(ended, 32 * 300 // 50)
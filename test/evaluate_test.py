@@ -0,0 +1,53 @@
+import random
+import unittest
+
+import numpy as np
+
+from src.bitboard import BitBoard
+from src.board import Board
+from src.dr_agent import DRAgent
+from src.evaluate import Summary, evaluate, play_one
+from src.random_agent import RandomAgent
+
+
+class EvaluateTest(unittest.TestCase):
+
+    def test_seeded_boards(self):
+        for board_cls in (Board, BitBoard):
+            boards = [board_cls(seed=7), board_cls(seed=7)]
+            for b in boards:
+                DRAgent(b).play()
+            self.assertEqual(boards[0].get_score(), boards[1].get_score())
+            self.assertEqual(list(boards[0].get_board_data()), list(boards[1].get_board_data()))
+            self.assertGreater(boards[0].get_move_count(), 0)
+
+    def test_play_one(self):
+        result = play_one((RandomAgent, Board, 4, 3, 11, False))
+        self.assertEqual(result, dict(play_one((RandomAgent, Board, 4, 3, 11, False)), time=result["time"]))
+        self.assertEqual((3, 11), (result["game"], result["seed"]))
+        self.assertGreaterEqual(result["max_tile"], 8)
+
+    def test_pool_matches_serial(self):
+        serial, pooled = [], []
+        evaluate(RandomAgent, 20, workers=0, seed=5, on_result=serial.append)
+        summary = evaluate(RandomAgent, 20, workers=2, seed=5, chunksize=3, on_result=pooled.append)
+        key = lambda r: (r["game"], r["score"], r["moves"])
+        self.assertEqual(sorted(map(key, serial)), sorted(map(key, pooled)))
+        report = summary.report()
+        scores = [r["score"] for r in serial]
+        self.assertEqual(20, report["games"])
+        self.assertAlmostEqual(np.mean(scores), report["avg_score"])
+        self.assertAlmostEqual(np.std(scores), report["std_score"])
+        self.assertEqual(1.0, report["reached"][min(r["max_tile"] for r in serial)])
+
+    def test_keeps_global_rng(self):
+        random.seed(3)
+        np.random.seed(3)
+        expected = (random.random(), np.random.random())
+        random.seed(3)
+        np.random.seed(3)
+        evaluate(RandomAgent, 3, workers=0, seed=1)
+        self.assertEqual(expected, (random.random(), np.random.random()))
+
+    def test_empty_summary(self):
+        self.assertEqual(0, Summary().report()["games"])
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.bitboard import BitBoard
+from src.board import Board
+from src.dr_agent import DRAgent
+from src.evaluate import evaluate
+from src.game_record import GameRecord, RecordWriter, pack_actions, read_records, unpack_actions
+from src.random_agent import RandomAgent
+
+
+class GameRecordTest(unittest.TestCase):
+
+    def test_pack_actions(self):
+        for n in (0, 1, 4, 7):
+            actions = np.arange(n) % 4
+            packed = pack_actions(actions)
+            self.assertEqual(-(-n // 4), len(packed))
+            self.assertEqual(list(actions), list(unpack_actions(packed, n)))
+
+    def test_replay_seeded(self):
+        for board_cls in (Board, BitBoard):
+            board = board_cls(seed=21)
+            RandomAgent(board).play()
+            record, end = GameRecord.decode(GameRecord.from_board(board).encode())
+            replayed = record.replay(board_cls)
+            self.assertEqual(board.get_score(), replayed.get_score())
+            self.assertEqual(list(board.get_board_data()), list(replayed.get_board_data()))
+            # About a quarter byte per move
+            self.assertLess(end, 20 + board.get_move_count() // 4)
+
+    def test_replay_spawns(self):
+        # First spawn a 2 in the corner, then a 4 after moving right
+        record = GameRecord(4, 0, [1], 4, [(0, 1), (5, 2)])
+        decoded, _ = GameRecord.decode(record.encode())
+        self.assertEqual([[0, 1], [5, 2]], decoded.spawns.tolist())
+        expected = np.zeros(16, int)
+        expected[3] = 1
+        expected[5] = 2
+        self.assertEqual(list(expected), list(decoded.replay().get_board_data()))
+        self.assertRaises(ValueError, GameRecord, 4, 0, [1, 2], 4, [(0, 1)])
+
+    def test_writer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.rec")
+            boards = [Board(seed=i) for i in range(5)]
+            with RecordWriter(path, buffer_size=64) as writer:
+                for b in boards[:3]:
+                    DRAgent(b).play()
+                    writer.write(GameRecord.from_board(b))
+            # Appending keeps the existing records
+            with RecordWriter(path) as writer:
+                for b in boards[3:]:
+                    DRAgent(b).play()
+                    writer.write(GameRecord.from_board(b).encode())
+            records = list(read_records(path))
+            self.assertEqual([b.get_score() for b in boards], [r.score for r in records])
+            self.assertEqual([b.get_seed() for b in boards], [r.seed for r in records])
+            evaluate(RandomAgent, 6, workers=0, seed=1, record_path=path)
+            self.assertTrue(all(r.replay().get_score() == r.score for r in read_records(path)))
+            self.assertEqual(11, len(list(read_records(path))))
@@ -0,0 +1,57 @@
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from src.checkpoint import Checkpointer
+from src.hot_reload import WeightWatcher
+from src.numpy_net import NumpyValueNet
+
+
+class HotReloadTest(unittest.TestCase):
+
+    def test_weight_layouts(self):
+        net = NumpyValueNet.random(seed=0)
+        boards = np.random.default_rng(0).integers(0, 12, (5, 16))
+        expected = net.predict_all(boards)
+        hk, hb, vk, vb = net.get_weights().values()
+        per_action = [[hk[i], hb[i], vk[i], vb[i]] for i in range(4)]
+        multihead = [w for i in range(4) for w in (hk[i], hb[i])] + [w for i in range(4) for w in (vk[i], vb[i])]
+        for weights in (net.to_flat(), per_action, multihead):
+            np.testing.assert_allclose(expected, NumpyValueNet.from_weight_list(weights).predict_all(boards))
+        with self.assertRaises(ValueError):
+            NumpyValueNet.from_weight_list([hk])
+
+    def test_swap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpointer = Checkpointer(directory)
+            first, second = NumpyValueNet.random(seed=1), NumpyValueNet.random(seed=2)
+            checkpointer.save(10, {"weights": first.to_flat()})
+            swapped = []
+            with WeightWatcher(directory, interval=60, on_swap=lambda state: swapped.append(state["games"])) as w:
+                model = w.current()
+                np.testing.assert_array_equal(first.to_flat(), model.to_flat())
+                self.assertFalse(w.poll())
+                checkpointer.save(20, {"weights": second.to_flat()})
+                self.assertTrue(w.poll())
+                # The model fetched earlier is untouched by the swap
+                np.testing.assert_array_equal(first.to_flat(), model.to_flat())
+                np.testing.assert_array_equal(second.to_flat(), w.current().to_flat())
+                self.assertEqual(2, w.get_version())
+            self.assertEqual([10, 20], swapped)
+
+    def test_background_thread(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with WeightWatcher(directory, interval=0.01) as w:
+                self.assertIsNone(w.current())
+                Checkpointer(directory).save(5, {"weights": NumpyValueNet.random(seed=3).to_flat()})
+                for _ in range(500):
+                    if w.current() is not None:
+                        break
+                    time.sleep(0.01)
+                self.assertIsNotNone(w.current())
+
+
+if __name__ == '__main__':
+    unittest.main()
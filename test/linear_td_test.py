@@ -0,0 +1,46 @@
+import importlib.util
+import os
+import unittest
+
+import numpy as np
+
+Q_LEARN_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "2048-linear_paramaterized",
+                            "q-learn.py")
+
+
+def load_learner():
+    spec = importlib.util.spec_from_file_location("linear_q_learn", Q_LEARN_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class LinearTDTest(unittest.TestCase):
+
+    def test_traces(self):
+        m = load_learner()
+        board = np.zeros(16, np.uint8)
+        board[0] = 3
+        history = np.zeros((m.TRACE_LENGTH, 2, len(m.TUPLES)), np.int64)
+        valid = np.zeros((m.TRACE_LENGTH, 2), bool)
+        history[:2, 0] = m.features(board)
+        valid[:2, 0] = True
+        m.learn(history, valid, np.array([2.0, 5.0]), alpha=0.5, lam=0.5)
+        # Both entries are the same afterstate, so its weights get 0.5 * 2 * (1 + 0.5) each; the game without history
+        # changes nothing
+        np.testing.assert_allclose(1.5 * len(m.TUPLES), m.evaluate(board))
+        self.assertEqual(len(m.TUPLES), np.count_nonzero(m.THETA))
+
+    def test_train(self):
+        m = load_learner()
+        scores = m.train(games=40, parallel=16, seed=0, report_every=0)
+        self.assertEqual(40, scores.count)
+        self.assertGreater(np.count_nonzero(m.THETA), 0)
+        actions, rewards, feats, values = m.choose_moves(np.array([[1, 1] + [0] * 14], np.uint8))
+        # Up doesn't move anything
+        self.assertNotEqual(2, actions[0])
+        self.assertEqual(len(m.TUPLES), feats.shape[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import unittest
+
+import numpy as np
+
+from src.move_server import start_server
+
+
+class MoveServerTest(unittest.TestCase):
+
+    def test_batched_requests(self):
+        calls = []
+
+        def predict(boards):
+            calls.append(len(boards))
+            # Prefers right, then up, then down, whatever the board
+            return np.tile([0.0, 3.0, 2.0, 1.0], (len(boards), 1))
+
+        async def run():
+            server, batcher = await start_server(predict, port=0, max_batch=8, max_wait=0.05)
+            host, port = server.sockets[0].getsockname()[:2]
+            reader, writer = await asyncio.open_connection(host, port)
+            # Tile in the top right corner, so right is illegal
+            corner = [0, 0, 0, 1] + [0] * 12
+            requests = [{"id": i, "board": corner} for i in range(20)]
+            requests.append({"id": "tiles", "tiles": [2, 0, 0, 0] + [0] * 12})
+            requests.append({"id": "bad", "board": [1, 2]})
+            requests.append({"id": "huge", "tiles": [2 ** 70] + [0] * 15})
+            requests.append({"id": "uint64", "tiles": [2 ** 63] + [0] * 15})
+            requests.append({"id": "float", "board": [1.5] * 16})
+            requests.append({"id": "full", "board": [1, 2, 3, 4, 2, 3, 4, 5, 3, 4, 5, 6, 4, 5, 6, 7]})
+            writer.write(b"".join(json.dumps(r).encode() + b"\n" for r in requests))
+            await writer.drain()
+            responses = {}
+            for _ in requests:
+                response = json.loads(await reader.readline())
+                responses[response["id"]] = response
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            await batcher.stop()
+            return responses, batcher
+
+        responses, batcher = asyncio.run(run())
+        # Right and up can't move the corner tile, down is the best legal move
+        for i in range(20):
+            self.assertEqual(3, responses[i]["action"])
+        self.assertEqual([True, False, False, True], responses[0]["legal"])
+        self.assertEqual(1, responses["tiles"]["action"])
+        for bad in ("bad", "huge", "uint64", "float"):
+            self.assertIn("error", responses[bad])
+        self.assertIsNone(responses["full"]["action"])
+        # 22 valid boards in batches of at most 8
+        self.assertEqual(22, sum(calls))
+        self.assertLessEqual(max(calls), 8)
+        self.assertLess(len(calls), 22)
+        self.assertEqual(len(calls), batcher.batches)
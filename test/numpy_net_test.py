@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from src.numpy_net import NumpyValueNet
+
+
+def write_keras_h5(path, layers, model_weights=True):
+    """
+    Writes layer weights in the keras h5 layout: a model file (weights under "model_weights") or a save_weights file
+    Args:
+        path: File to write
+        layers: List of (layer name, {weight name: array}) in layer order
+        model_weights: Nest the layers in a "model_weights" group like a full model file
+    """
+    with h5py.File(path, "w") as f:
+        group = f.create_group("model_weights") if model_weights else f
+        group.attrs["layer_names"] = [name.encode("utf8") for name, _ in layers]
+        for name, weights in layers:
+            layer = group.create_group(name)
+            names = [name + "/" + w + ":0" for w in weights]
+            layer.attrs["weight_names"] = [n.encode("utf8") for n in names]
+            for n, w in zip(names, weights.values()):
+                layer.create_dataset(n, data=w)
+
+
+class NumpyValueNetTest(unittest.TestCase):
+
+    def test_predict_all_matches_per_action(self):
+        net = NumpyValueNet.random(seed=0)
+        # Make sure every hidden unit is active for some input
+        net = NumpyValueNet(net.hidden_kernel, net.hidden_bias + 0.5, net.value_kernel, net.value_bias + 1)
+        states = np.random.RandomState(0).randint(0, 10, size=(32, 16))
+        values = net.predict_all(states)
+        for a in range(4):
+            hidden = np.maximum(states @ net.hidden_kernel[a] + net.hidden_bias[a], 0)
+            expected = hidden @ net.value_kernel[a][:, 0] + net.value_bias[a, 0]
+            self.assertTrue(np.allclose(expected, values[:, a], atol=1e-4))
+            self.assertTrue(np.allclose(expected, net.predict(states, a), atol=1e-4))
+
+    def test_save_load(self):
+        net = NumpyValueNet.random(seed=1)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "weights.npz")
+            net.save(path)
+            loaded = NumpyValueNet.load(path)
+        states = np.eye(16)
+        self.assertTrue(np.array_equal(net.predict_all(states), loaded.predict_all(states)))
+
+    def test_from_h5(self):
+        net = NumpyValueNet.random(seed=2)
+        net = NumpyValueNet(net.hidden_kernel, net.hidden_bias + 0.5, net.value_kernel, net.value_bias)
+        states = np.random.RandomState(2).randint(0, 10, size=(8, 16))
+        expected = net.predict_all(states)
+
+        def hidden(a):
+            return {"kernel": net.hidden_kernel[a], "bias": net.hidden_bias[a]}
+
+        def value(a):
+            return {"kernel": net.value_kernel[a], "bias": net.value_bias[a]}
+
+        with tempfile.TemporaryDirectory() as d:
+            files = [os.path.join(d, "tf_model" + str(a) + ".h5") for a in range(4)]
+            for a, path in enumerate(files):
+                # Layers without weights are skipped, whatever the file layout
+                layers = [("input", {}), ("dense", hidden(a)), ("dense_1", value(a))]
+                write_keras_h5(path, layers, model_weights=a % 2 == 0)
+            np.testing.assert_allclose(expected, NumpyValueNet.from_h5(files).predict_all(states), rtol=1e-6)
+            # Multi-head layers are found by name, not by order
+            path = os.path.join(d, "tf_model.h5")
+            layers = [("input", {})]
+            for a in reversed(range(4)):
+                layers += [("hidden" + str(a), hidden(a)), ("value" + str(a), value(a))]
+            write_keras_h5(path, layers)
+            np.testing.assert_allclose(expected, NumpyValueNet.from_multihead_h5(path).predict_all(states), rtol=1e-6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import time
+import unittest
+from threading import Thread
+
+from src.board import Board
+from src.dr_agent import DRAgent
+from src.playback import Playback
+from src.random_agent import RandomAgent
+
+
+class PlaybackTest(unittest.TestCase):
+
+    def test_skip_to_end(self):
+        board = Board(seed=1)
+        playback = Playback(board, speed=None)
+        RandomAgent(board).play_graphics(playback)
+        self.assertTrue(board.is_terminal())
+        # The viewer only sees the final board, everything in between is dropped
+        snapshot = playback.sample()
+        self.assertEqual(list(board.get_board_data()), list(snapshot.get_board_data()))
+        self.assertEqual(board.get_score(), snapshot.get_score())
+        self.assertEqual(board.get_move_count(), playback.dropped)
+
+    def test_paced(self):
+        board = Board(seed=2)
+        playback = Playback(board, speed=2.0, move_rate=50.0)
+        thread = Thread(target=DRAgent(board).play_graphics, args=[playback])
+        thread.start()
+        time.sleep(0.2)
+        playback.stop()
+        thread.join()
+        # About 100 moves per second, not the engine's full speed
+        self.assertLess(board.get_move_count(), 40)
+        self.assertFalse(board.is_terminal())
+
+    def test_every_frame(self):
+        board = Board(seed=3)
+        playback = Playback(board, speed=None, move_rate=1000.0, drop_frames=False)
+        playback.set_speed(1000.0)
+        thread = Thread(target=RandomAgent(board).play_graphics, args=[playback])
+        thread.start()
+        for _ in range(5):
+            time.sleep(0.02)
+            playback.sample()
+        playback.stop()
+        thread.join()
+        # The agent waits for each move to be shown
+        self.assertEqual(0, playback.dropped)
+        self.assertLessEqual(board.get_move_count(), playback.sampled)
+
+    def test_speed_steps(self):
+        playback = Playback(Board(seed=4))
+        playback.faster()
+        self.assertEqual(2.0, playback.get_speed())
+        playback.slower()
+        playback.slower()
+        self.assertEqual(0.5, playback.get_speed())
+        playback.skip_to_end()
+        self.assertIsNone(playback.get_speed())
+        playback.faster()
+        self.assertIsNone(playback.get_speed())
+        playback.slower()
+        self.assertEqual(128.0, playback.get_speed())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+from src.board import Board
+
+
+def combiner_swipe(state, action):
+    """
+    Reference swipe through Board._combiner, independent of the row tables
+    """
+    b = Board()
+    b._board = state.copy()
+    b._score = 0
+    blocks = [
+        [range(i, 4 + i) for i in range(0, 16, 4)],
+        [range(i, i - 4, -1) for i in range(3, 16, 4)],
+        [range(i, 16, 4) for i in range(4)],
+        [range(i, -1, -4) for i in range(12, 16)],
+    ]
+    moved = False
+    for block in blocks[action]:
+        moved = b._combiner(block) or moved
+    return b._board, b.get_score(), moved
@@ -0,0 +1,32 @@
+import unittest
+
+import numpy as np
+
+from src.replay import ReplayBuffer
+
+
+class ReplayBufferTest(unittest.TestCase):
+
+    def test_ring(self):
+        buf = ReplayBuffer(4, seed=0)
+        for i in range(6):
+            buf.add(np.full(16, i), i % 4, float(i), np.full(16, i + 1), np.full(16, i + 2))
+        self.assertEqual(4, len(buf))
+        states, actions, rewards, s_primes, s_dprimes = buf.get(np.arange(4))
+        # The two oldest transitions were overwritten
+        self.assertEqual([4, 5, 2, 3], list(rewards))
+        self.assertEqual(np.uint8, states.dtype)
+        self.assertEqual([6, 7, 4, 5], list(s_dprimes[:, 0]))
+
+    def test_sample(self):
+        buf = ReplayBuffer(100, seed=0)
+        with self.assertRaises(ValueError):
+            buf.sample(1)
+        buf.add_batch(np.zeros((10, 16)), np.arange(10) % 4, np.arange(10), np.zeros((10, 16)), np.zeros((10, 16)))
+        states, actions, rewards, s_primes, s_dprimes = buf.sample(32)
+        self.assertEqual((32, 16), states.shape)
+        self.assertTrue((rewards < 10).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
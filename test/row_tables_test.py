@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.row_tables import load_tables, slide_row, swipe
+from reference_swipe import combiner_swipe
+
+
+class RowTablesTest(unittest.TestCase):
+
+    def test_slide_row(self):
+        # [2, 2, 4, 0] -> [4, 4, 0, 0]
+        self.assertEqual((0x22, 4), slide_row(0x211))
+        # [4, 0, 0, 4] -> [8, 0, 0, 0]
+        self.assertEqual((0x3, 8), slide_row(0x2002))
+        # [2, 2, 2, 2] -> [4, 4, 0, 0]
+        self.assertEqual((0x22, 8), slide_row(0x1111))
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "row_tables.npz")
+            built = load_tables(path)
+            self.assertTrue(os.path.exists(path))
+            cached = load_tables(path)
+            self.assertTrue(np.array_equal(built.right_row, cached.right_row))
+            self.assertTrue(np.array_equal(built.left_reward, cached.left_reward))
+            # Truncated or corrupt caches are rebuilt
+            size = os.path.getsize(path)
+            for length in (size // 2, 2):
+                with open(path, "r+b") as f:
+                    f.truncate(length)
+                rebuilt = load_tables(path)
+                self.assertTrue(np.array_equal(built.right_row, rebuilt.right_row))
+
+    def test_swipe_matches_combiner(self):
+        rng = np.random.RandomState(1)
+        for _ in range(200):
+            state = rng.choice([0, 0, 1, 1, 2, 3, 4], size=16)
+            for action in range(4):
+                expected, score, moved = combiner_swipe(state, action)
+                result, reward, m = swipe(state, action)
+                self.assertEqual(list(expected), list(result))
+                self.assertEqual((score, moved), (reward, m))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import math
+import unittest
+
+import numpy as np
+
+from src.stats import P2Quantile, ScoreStats
+
+
+class StatsTest(unittest.TestCase):
+
+    def test_moments(self):
+        rng = np.random.default_rng(0)
+        scores = rng.normal(3000, 800, 5000)
+        stats = ScoreStats()
+        for s in scores:
+            stats.add(s)
+        self.assertEqual(5000, stats.count)
+        self.assertAlmostEqual(np.mean(scores), stats.mean, places=6)
+        self.assertAlmostEqual(np.std(scores), stats.std(), places=6)
+        self.assertEqual((np.min(scores), np.max(scores)), (stats.min, stats.max))
+
+    def test_quantiles(self):
+        rng = np.random.default_rng(1)
+        # Skewed like game scores
+        scores = rng.lognormal(8, 0.5, 20000)
+        stats = ScoreStats()
+        for s in scores:
+            stats.add(s)
+        for p in (0.1, 0.5, 0.9, 0.99):
+            exact = np.quantile(scores, p)
+            self.assertLess(abs(stats.quantile(p) - exact) / exact, 0.03)
+        self.assertRaises(ValueError, stats.quantile, 0.42)
+
+    def test_few_values(self):
+        estimator = P2Quantile(0.5)
+        self.assertTrue(math.isnan(estimator.value()))
+        for x in (4, 1, 3):
+            estimator.add(x)
+        self.assertEqual(3, estimator.value())
+
+    def test_max_tiles(self):
+        stats = ScoreStats()
+        for score, tile in [(100, 128), (300, 256), (200, 128), (900, 512)]:
+            stats.add(score, tile)
+        self.assertEqual({128: 1.0, 256: 0.5, 512: 0.25}, stats.reached())
+        self.assertEqual(4, stats.summary()["games"])
@@ -0,0 +1,32 @@
+import unittest
+
+import numpy as np
+
+from src.subproc_env import SubprocVecEnv
+
+
+class SubprocVecEnvTest(unittest.TestCase):
+
+    def test_step(self):
+        with SubprocVecEnv(6, workers=2, seed=0, max_steps=40) as env:
+            obs, info = env.reset()
+            self.assertEqual((6, 16), obs.shape)
+            self.assertTrue(((obs > 0).sum(axis=1) == 1).all())
+            rng = np.random.default_rng(0)
+            scores = np.zeros(6, np.int64)
+            games = 0
+            for _ in range(100):
+                keys = np.where(info["action_mask"], rng.random((6, 4)), -1)
+                env.step_async(np.argmax(keys, axis=1))
+                # The caller may work while the workers step
+                self.assertRaises(ValueError, env.step_async, np.zeros(6))
+                obs, rewards, terminated, truncated, info = env.step_wait()
+                self.assertTrue(info["moved"].all())
+                scores += rewards
+                ended = terminated | truncated
+                np.testing.assert_array_equal(scores[ended], info["final_score"][ended])
+                scores[ended] = 0
+                games += int(ended.sum())
+                self.assertTrue(((obs[ended] > 0).sum(axis=1) == 1).all())
+            # Games are truncated after 40 steps at the latest
+            self.assertGreaterEqual(games, 12)
@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+from src.sum_tree import SumTree
+from src.replay import PrioritizedReplayBuffer
+
+
+class SumTreeTest(unittest.TestCase):
+
+    def test_total_and_find(self):
+        tree = SumTree(5)
+        tree.update(np.arange(5), [1, 2, 3, 4, 0])
+        self.assertEqual(10, tree.total())
+        # Prefix sums: [0, 1) -> 0, [1, 3) -> 1, [3, 6) -> 2, [6, 10) -> 3
+        self.assertEqual([0, 1, 1, 2, 3, 3], list(tree.find([0, 1, 2.9, 3, 6, 9.99])))
+        tree.update([3, 3], [1, 1])
+        self.assertEqual(7, tree.total())
+
+    def test_matches_cumsum(self):
+        rng = np.random.RandomState(0)
+        tree = SumTree(1000)
+        priorities = rng.random_sample(1000)
+        tree.update(np.arange(1000), priorities)
+        values = rng.random_sample(200) * priorities.sum()
+        expected = np.searchsorted(np.cumsum(priorities), values, side='right')
+        self.assertEqual(list(expected), list(tree.find(values)))
+
+    def test_prioritized_sampling(self):
+        buf = PrioritizedReplayBuffer(8, seed=0)
+        for i in range(8):
+            buf.add(np.zeros(16), 0, float(i), np.zeros(16), np.zeros(16))
+        # Only transition 5 has a meaningful TD error
+        buf.update_priorities(np.arange(8), [0, 0, 0, 0, 0, 100, 0, 0])
+        states, actions, rewards, s_primes, s_dprimes, idx, weights = buf.sample(64)
+        self.assertGreater(np.mean(idx == 5), 0.9)
+        self.assertAlmostEqual(1.0, weights.max())
+        # Frequently sampled transitions get the smallest importance weights
+        self.assertAlmostEqual(weights.min(), weights[idx == 5].max())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import io
+import json
+import time
+import unittest
+
+from src.throughput import PhaseTimer
+
+
+class PhaseTimerTest(unittest.TestCase):
+
+    def test_record(self):
+        stream = io.StringIO()
+        timer = PhaseTimer(interval=3600, stream=stream)
+        for _ in range(3):
+            timer.start()
+            time.sleep(0.002)
+            timer.mark("evaluate")
+            timer.mark("fit")
+            timer.end_move()
+        timer.end_game()
+        self.assertIsNone(timer.emit())
+        record = timer.emit(force=True)
+        self.assertEqual(record, json.loads(stream.getvalue()))
+        self.assertEqual((1, 3), (record["games"], record["moves"]))
+        self.assertAlmostEqual(100.0, sum(record["phases"].values()))
+        self.assertGreater(record["phases"]["evaluate"], record["phases"]["fit"])
+        # Totals carry over into the next interval, rates and phases don't
+        timer.end_game()
+        record = timer.record()
+        self.assertEqual((2, 3, {}), (record["games"], record["moves"], record["phases"]))
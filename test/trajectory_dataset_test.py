@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.board import Board
+from src.game_record import GameRecord, RecordWriter
+from src.random_agent import RandomAgent
+from src.row_tables import swipe
+from src.trajectory_dataset import DatasetWriter, TrajectoryDataset, convert_records
+
+
+def transitions(n, offset=0):
+    states = (np.arange(n)[:, None] + offset + np.zeros(16, int)) % 256
+    return states, np.arange(n) % 4, np.arange(n) + offset, states + 1, states + 2
+
+
+class TrajectoryDatasetTest(unittest.TestCase):
+
+    def test_write_and_batches(self):
+        with tempfile.TemporaryDirectory() as path:
+            with DatasetWriter(path, buffer_size=8) as writer:
+                writer.add_batch(*transitions(10))
+                writer.add(*[t[0] for t in transitions(1, 10)])
+            # Reopening appends
+            with DatasetWriter(path) as writer:
+                writer.add_batch(*transitions(9, 11))
+            dataset = TrajectoryDataset(path)
+            self.assertEqual(20, len(dataset))
+            self.assertEqual(np.uint8, dataset.columns["states"].dtype)
+            seen = []
+            for states, actions, rewards, afterstates, next_states in dataset.batches(6, seed=0):
+                # Contiguous batches are views of the memory map
+                self.assertIsInstance(states.base, np.memmap)
+                self.assertEqual(list(states[:, 0] + 1), list(afterstates[:, 0]))
+                seen.extend(rewards)
+            self.assertEqual(list(range(20)), sorted(seen))
+            seen = [r for batch in dataset.batches(6, seed=0, contiguous=False) for r in batch[2]]
+            self.assertEqual(list(range(20)), sorted(seen))
+            self.assertNotEqual(list(range(20)), seen)
+
+    def test_truncates_partial_write(self):
+        with tempfile.TemporaryDirectory() as path:
+            with DatasetWriter(path) as writer:
+                writer.add_batch(*transitions(3))
+            # A crash after writing a column but before the metadata leaves a partial tail
+            with open(os.path.join(path, "states.bin"), "ab") as f:
+                f.write(bytes(16))
+            with DatasetWriter(path) as writer:
+                writer.add_batch(*transitions(2, 3))
+            self.assertEqual([0, 1, 2, 3, 4], list(TrajectoryDataset(path).get(slice(None))[0][:, 0]))
+
+    def test_convert_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            records = os.path.join(directory, "games.rec")
+            board = Board(seed=4)
+            RandomAgent(board).play()
+            with RecordWriter(records) as writer:
+                writer.write(GameRecord.from_board(board))
+            path = os.path.join(directory, "dataset")
+            self.assertEqual(board.get_move_count(), convert_records(records, path))
+            states, actions, rewards, afterstates, next_states = TrajectoryDataset(path).get(slice(None))
+            self.assertEqual(board.get_history(), list(actions))
+            self.assertEqual(list(board.get_board_data()), list(next_states[-1]))
+            self.assertEqual(list(states[1:].ravel()), list(next_states[:-1].ravel()))
+            s_prime, reward, _ = swipe(states[5], actions[5])
+            self.assertEqual((list(s_prime), reward // 2), (list(afterstates[5]), rewards[5]))
+            self.assertEqual(board.get_score() // 2, rewards.sum())
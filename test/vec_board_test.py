@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from src.row_tables import afterstates, afterstates_batch, swipe, swipe_batch
+from src.vec_board import VecBoard, batch_is_terminal
+
+
+class VecBoardTest(unittest.TestCase):
+
+    def test_swipe_batch_matches_swipe(self):
+        rng = np.random.RandomState(2)
+        boards = rng.choice([0, 0, 1, 1, 2, 3], size=(64, 16)).astype(np.uint8)
+        actions = rng.randint(0, 4, size=64)
+        s_prime, rewards, moved = swipe_batch(boards, actions)
+        for i in range(64):
+            expected, reward, m = swipe(boards[i], actions[i])
+            self.assertEqual(list(expected), list(s_prime[i]))
+            self.assertEqual((reward, m), (rewards[i], moved[i]))
+
+    def test_afterstates(self):
+        rng = np.random.RandomState(3)
+        boards = rng.choice([0, 1, 1, 2, 3], size=(16, 16)).astype(np.uint8)
+        s_prime, rewards, legal = afterstates_batch(boards)
+        for i in range(16):
+            for action in range(4):
+                expected, reward, moved = swipe(boards[i], action)
+                self.assertEqual(list(expected), list(s_prime[i, action]))
+                self.assertEqual((reward, moved), (rewards[i, action], legal[i, action]))
+        single = afterstates(boards[0])
+        self.assertTrue(np.array_equal(s_prime[0], single[0]))
+        self.assertTrue(np.array_equal(legal[0], single[2]))
+
+    def test_game_end(self):
+        boards = np.array([
+            [2, 4, 2, 4, 4, 2, 4, 2, 2, 4, 2, 4, 4, 2, 4, 2],
+            [2, 4, 2, 4, 4, 2, 4, 2, 2, 4, 2, 4, 4, 2, 0, 2],
+            [2, 4, 2, 4, 4, 2, 4, 2, 2, 4, 8, 4, 4, 2, 2, 2],
+            [2, 4, 2, 4, 4, 2, 4, 2, 2, 4, 8, 4, 4, 2, 8, 2],
+            # 2^15 tiles don't merge
+            [15, 15, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14],
+        ], np.uint8)
+        self.assertEqual([True, False, False, False, True], list(batch_is_terminal(boards)))
+
+    def test_play(self):
+        games = VecBoard(32, seed=0)
+        rng = np.random.default_rng(0)
+        scores, tiles, moves = games.play(lambda boards: rng.integers(0, 4, len(boards)), 50)
+        self.assertEqual(50, len(scores))
+        self.assertTrue((scores > 0).all())
+        self.assertTrue((moves > 0).all())
+        self.assertTrue((tiles >= 3).all())
+        # Finished games were restarted with a single piece
+        self.assertTrue((np.count_nonzero(games.get_boards(), axis=1) >= 1).all())
+
+
+if __name__ == '__main__':
+    unittest.main()